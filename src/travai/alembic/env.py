@@ -1,3 +1,4 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -14,6 +15,10 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# Migrate the database the app uses when it is configured through the environment
+if os.getenv("TRAVAI_DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", os.environ["TRAVAI_DATABASE_URL"])
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -0,0 +1,38 @@
+"""Add daily intake
+
+Revision ID: 0aa8dd9a3e57
+Revises: 9d549cf61825
+Create Date: 2026-10-17 11:48:20.519637
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0aa8dd9a3e57'
+down_revision: Union[str, None] = '9d549cf61825'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Filled by `python -m travai.backend.maintenance daily-intake` (macros need the Ciqual nutrient store)
+    op.create_table('daily_intake',
+    sa.Column('patient_id', sa.Integer(), nullable=False),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('meals', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('kcal', sa.Float(), server_default='0', nullable=False),
+    sa.Column('proteins_g', sa.Float(), server_default='0', nullable=False),
+    sa.Column('carbs_g', sa.Float(), server_default='0', nullable=False),
+    sa.Column('fats_g', sa.Float(), server_default='0', nullable=False),
+    sa.Column('sugars_g', sa.Float(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['patient_id'], ['patients.patient_id'], ),
+    sa.PrimaryKeyConstraint('patient_id', 'date')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_intake')
@@ -0,0 +1,29 @@
+"""Add meal_id to the meals date index
+
+Revision ID: 193e166f79ba
+Revises: 0aa8dd9a3e57
+Create Date: 2026-10-17 12:21:36.104582
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '193e166f79ba'
+down_revision: Union[str, None] = '0aa8dd9a3e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # meal_id breaks date ties in the keyset pagination of list_meals
+    op.create_index('ix_meals_patient_id_date_start_meal_id', 'meals', ['patient_id', 'date_start', 'meal_id'], unique=False)
+    op.drop_index('ix_meals_patient_id_date_start', table_name='meals')
+
+
+def downgrade() -> None:
+    op.create_index('ix_meals_patient_id_date_start', 'meals', ['patient_id', 'date_start'], unique=False)
+    op.drop_index('ix_meals_patient_id_date_start_meal_id', table_name='meals')
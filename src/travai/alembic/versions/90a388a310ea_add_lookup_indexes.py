@@ -0,0 +1,50 @@
+"""Add lookup indexes
+
+Revision ID: 90a388a310ea
+Revises: 187445375526
+Create Date: 2026-10-17 10:12:03.418205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '90a388a310ea'
+down_revision: Union[str, None] = '187445375526'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _check_unique_emails(table: str) -> None:
+    duplicates = op.get_bind().execute(
+        sa.text(f"SELECT email FROM {table} GROUP BY email HAVING COUNT(*) > 1")
+    ).scalars().all()
+    if duplicates:
+        raise RuntimeError(
+            f"Cannot add a unique index on {table}.email, these emails are used more than once: {duplicates}"
+        )
+
+
+def upgrade() -> None:
+    _check_unique_emails('doctors')
+    _check_unique_emails('patients')
+    op.create_index(op.f('ix_doctors_email'), 'doctors', ['email'], unique=True)
+    op.create_index(op.f('ix_patients_email'), 'patients', ['email'], unique=True)
+    op.create_index('ix_meals_patient_id_date_start', 'meals', ['patient_id', 'date_start'], unique=False)
+    op.create_index(op.f('ix_detected_ingredients_meal_id'), 'detected_ingredients', ['meal_id'], unique=False)
+    op.create_index(op.f('ix_modified_ingredients_meal_id'), 'modified_ingredients', ['meal_id'], unique=False)
+    op.create_index(op.f('ix_modified_ingredients_detected_ingredient_id'), 'modified_ingredients', ['detected_ingredient_id'], unique=False)
+    op.create_index(op.f('ix_goals_patient_id'), 'goals', ['patient_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_goals_patient_id'), table_name='goals')
+    op.drop_index(op.f('ix_modified_ingredients_detected_ingredient_id'), table_name='modified_ingredients')
+    op.drop_index(op.f('ix_modified_ingredients_meal_id'), table_name='modified_ingredients')
+    op.drop_index(op.f('ix_detected_ingredients_meal_id'), table_name='detected_ingredients')
+    op.drop_index('ix_meals_patient_id_date_start', table_name='meals')
+    op.drop_index(op.f('ix_patients_email'), table_name='patients')
+    op.drop_index(op.f('ix_doctors_email'), table_name='doctors')
@@ -0,0 +1,37 @@
+"""Add meal calorie totals
+
+Revision ID: 9d549cf61825
+Revises: 90a388a310ea
+Create Date: 2026-10-17 11:02:47.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d549cf61825'
+down_revision: Union[str, None] = '90a388a310ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('meals', sa.Column('total_detected_kcal', sa.Float(), server_default='0', nullable=False))
+    op.add_column('meals', sa.Column('total_modified_kcal', sa.Float(), server_default='0', nullable=False))
+    # Backfill from the existing ingredients
+    op.execute(
+        "UPDATE meals SET "
+        "total_detected_kcal = COALESCE((SELECT SUM(calculated_calories) FROM detected_ingredients "
+        "WHERE detected_ingredients.meal_id = meals.meal_id), 0), "
+        "total_modified_kcal = COALESCE((SELECT SUM(calculated_calories) FROM modified_ingredients "
+        "WHERE modified_ingredients.meal_id = meals.meal_id), 0)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('meals') as batch_op:
+        batch_op.drop_column('total_modified_kcal')
+        batch_op.drop_column('total_detected_kcal')
@@ -0,0 +1,31 @@
+"""Add ingredient alim codes
+
+Revision ID: e84cc5e6be2e
+Revises: 193e166f79ba
+Create Date: 2026-10-17 05:07:11.096612
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e84cc5e6be2e'
+down_revision: Union[str, None] = '193e166f79ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows keep a NULL code and are matched by name
+    op.add_column('detected_ingredients', sa.Column('alim_code', sa.Integer(), nullable=True))
+    op.add_column('modified_ingredients', sa.Column('alim_code', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('modified_ingredients') as batch_op:
+        batch_op.drop_column('alim_code')
+    with op.batch_alter_table('detected_ingredients') as batch_op:
+        batch_op.drop_column('alim_code')
@@ -5,54 +5,55 @@ import os
 import chromadb
 from copy import deepcopy
 from dotenv import load_dotenv
-import base64
-from pydantic import BaseModel
-from travai.model.inference import get_structured_answer, get_client
-from datetime import datetime
-from travai.backend.vector_db.query import query_food
-from travai.backend.services.meal_service import create_meal, get_meals_by_patient
+import uuid
+import numpy as np
+from travai.model.inference import stream_dish_suggestion, get_client, preprocess_image
+from travai.model.response_cache import get_response_cache
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from travai.tracing import Trace, set_attributes, trace
+from travai.backend.vector_db.query import match_foods, prefetch_foods
+from travai.backend.nutrient_store import get_nutrient_store
+from travai.backend.services.meal_service import persist_meal_analysis, list_meals
 from travai.backend.services.patient_service import get_patient_by_email, authenticate_user
-from travai.backend.services.detected_ingredient_service import create_detected_ingredient, get_detected_ingredients_by_meal
-from travai.backend.utils import get_sum_calories_per_meal_detected, get_sum_calories_per_meal_modified
-from travai.backend.services.modified_ingredient_service import create_modified_ingredient, update_modified_ingredient, delete_modified_ingredient
+from travai.backend.services.detected_ingredient_service import get_detected_ingredients_by_meal
+from travai.backend.services.nutrition_service import compute_meal_nutrients
+from travai.backend.services.daily_intake_service import get_daily_intake
+from travai.backend.services.modified_ingredient_service import update_modified_ingredient, delete_modified_ingredient
 import torch
 
 
 st.set_page_config(layout="wide")
 torch.classes.__path__ = []
-# region Pydantic Models
 
-class Ingredient(BaseModel):
-    """
-    Represents an ingredient used in a dish.
 
-    Attributes:
-        ingredient_name (str): The name of the ingredient.
-        quantity_grams (float): The quantity of the ingredient in grams.
+@st.cache_resource
+def get_prefetch_pool() -> ThreadPoolExecutor:
     """
-    ingredient_name: str
-    quantity_grams: float
-
-class Dish(BaseModel):
+    Returns the worker pool used to warm ingredient lookups while the VLM is still streaming.
     """
-    Represents a dish composed of multiple ingredients.
+    return ThreadPoolExecutor(max_workers=2)
 
-    Attributes:
-        dish_name (Optional[str]): The name of the dish (can be None).
-        ingredients (List[Ingredient]): A list of ingredients required to prepare the dish.
-            Must contain at least one ingredient.
-    """
-    dish_name: str
-    ingredients: list[Ingredient]
 
-class DishSuggestion(BaseModel):
+def remember_trace(current_trace: Trace) -> None:
     """
-    Represents a suggestion of possible dishes.
+    Keeps the last few pipeline traces of the session for the debug panel.
+    """
+    st.session_state["traces"] = (st.session_state.get("traces", []) + [current_trace])[-5:]
+
 
-    Attributes:
-        possible_dishes (List[Dish]): A list of suggested dishes.
+def show_debug_panel():
     """
-    possible_dishes: list[Dish]
+    Shows the per-stage timings of the last analyses (enabled with TRAVAI_DEBUG=1).
+    """
+    if os.getenv("TRAVAI_DEBUG") != "1" or not st.session_state.get("traces"):
+        return
+    import pandas as pd
+    with st.expander("Debug: pipeline timings"):
+        for current_trace in reversed(st.session_state["traces"]):
+            st.write(f"**{current_trace.name}** (trace {current_trace.trace_id[:8]})")
+            st.dataframe(pd.DataFrame(current_trace.summary()), use_container_width=True)
+
 
 def save_uploaded_image(uploaded_file):
     """
@@ -123,23 +124,40 @@ def show_meal_analysis_page():
             return
 
         if st.button("Analyze Image"):
-            with st.spinner("Analyzing image..."):
+            with st.spinner("Analyzing image..."), trace("meal_analysis") as analysis_trace:
+                remember_trace(analysis_trace)
                 try:
-                    raw_result = get_structured_answer(
+                    base64_image, mime_type = preprocess_image(uploaded_file.getvalue())
+                    live_ingredients = st.empty()
+                    streamed_ingredients = []
+                    parsed_result = None
+                    for kind, _, item in stream_dish_suggestion(
                         client=st.session_state["client"],
                         model_name="pixtral-12b-2409",
                         prompt=(
                             "Describe the list of ingredients required to make this dish "
                             "using the classes Ingredient and Dish"
                         ),
-                        base64_image=base64.b64encode(uploaded_file.getvalue()).decode("utf-8"),
-                        response_format=DishSuggestion,
-                    )
-                    # Convert the result (JSON string) to a Python dict
-                    parsed_result = json.loads(raw_result)['possible_dishes']
+                        base64_image=base64_image,
+                        cache=get_response_cache(),
+                        mime_type=mime_type,
+                    ):
+                        if kind == "ingredient":
+                            streamed_ingredients.append(f"{item.ingredient_name} ({item.quantity_grams:g} g)")
+                            live_ingredients.write("Detected so far: " + ", ".join(streamed_ingredients))
+                            # Start retrieval work while the model is still generating
+                            get_prefetch_pool().submit(prefetch_foods, [item.ingredient_name])
+                        elif kind == "suggestion":
+                            parsed_result = item.model_dump()['possible_dishes']
+                    live_ingredients.empty()
+                    if parsed_result is None:
+                        raise ValueError("The model answer was incomplete.")
+                    set_attributes(dishes=len(parsed_result), ingredients=len(streamed_ingredients))
                     st.session_state['parsed_result'] = parsed_result
                     dish2id = {dish['dish_name']: i for i, dish in enumerate(parsed_result)}
                     st.session_state['dish2id'] = dish2id
+                    # Identifies this analysis, so that its meal is saved only once across reruns
+                    st.session_state['analysis_id'] = uuid.uuid4().hex
                     st.success("Analysis complete!")
                     # Initialize session state for dish name and ingredients
                 except Exception as e:
@@ -154,44 +172,52 @@ def show_meal_analysis_page():
             ) if len(st.session_state['dish2id']) > 1 else st.session_state['parsed_result'][0]['dish_name']
             # Here vectorization + detected food + copy modified food = detected food at this time
             if choice is not None:
-                patient = get_patient_by_email(email=st.session_state["email"])
-                meal = create_meal(
-                    patient_id=patient.patient_id,
-                    date_start=datetime.now(),
-                    image_path=save_uploaded_image(uploaded_file=uploaded_file),
-                    name=choice,
-                )
-                st.subheader("Edit Dish and Ingredients Before Saving")
-
-                # Edit the dish name
-                st.session_state["edit_dish_name"] = st.text_input(
-                    "Dish Name",
-                    value=choice,
-                )
-
-                # Editable table for ingredients
-                ingredients_data = st.session_state['parsed_result'][st.session_state['dish2id'][choice]].get('ingredients')
-                print([ingredient['ingredient_name'] for ingredient in ingredients_data])
-                if 'chroma_db_client' not in st.session_state:
-                    st.session_state['chroma_db_client'] = chromadb.PersistentClient(path="./chroma_db/")
-                closest_food_names, closest_calories = query_food(client=st.session_state['chroma_db_client'], foods=deepcopy([ingredient['ingredient_name'] for ingredient in ingredients_data]))
-                modified_foods = []
-                modified_calories = []
-                for food_name, calories, quantity in zip(closest_food_names, closest_calories, [ingredient['quantity_grams'] for ingredient in ingredients_data]):
-                    try:
-                        final_cal = float(calories.replace(',', '.'))
-                    except Exception as e:
-                        print(str(e))
-                        final_cal = 0
-                    new_detected_ingredient = create_detected_ingredient(
-                        meal_id=meal.meal_id,
-                        ingredient_name=food_name,
-                        quantity_grams=quantity,
-                        calculated_calories=float(final_cal)*quantity/100
+                with trace("meal_lookup") as lookup_trace:
+                    remember_trace(lookup_trace)
+                    patient = get_patient_by_email(email=st.session_state["email"])
+                    st.subheader("Edit Dish and Ingredients Before Saving")
+
+                    # Edit the dish name
+                    st.session_state["edit_dish_name"] = st.text_input(
+                        "Dish Name",
+                        value=choice,
                     )
-                    new_modified = create_modified_ingredient(meal_id=meal.meal_id, detected_ingredient_id=new_detected_ingredient.detected_ingredient_id, ingredient_name=food_name, quantity_grams=quantity, calculated_calories=float(final_cal)*quantity/100)
-                    modified_foods.append(new_modified.modified_ingredient_id)
-                    modified_calories.append(final_cal)
+
+                    # Editable table for ingredients
+                    ingredients_data = st.session_state['parsed_result'][st.session_state['dish2id'][choice]].get('ingredients')
+                    print([ingredient['ingredient_name'] for ingredient in ingredients_data])
+                    if 'chroma_db_client' not in st.session_state:
+                        st.session_state['chroma_db_client'] = chromadb.PersistentClient(path="./chroma_db/")
+                    matches = match_foods(client=st.session_state['chroma_db_client'], foods=deepcopy([ingredient['ingredient_name'] for ingredient in ingredients_data]))
+                    # kcal/100g of every matched food in one lookup (missing values count as 0)
+                    nutrient_store = get_nutrient_store()
+                    closest_calories = np.nan_to_num(
+                        nutrient_store.lookup([match.hit.alim_code for match in matches])[:, nutrient_store.column("Energie (kcal/100 g)")]
+                    ).tolist()
+                    quantities = [ingredient['quantity_grams'] for ingredient in ingredients_data]
+                    # The meal, its detected ingredients and their modified copies are saved in one transaction,
+                    # once per analysis and dish: widget edits rerun this script but must not save it again
+                    saved_key = (st.session_state.get('analysis_id'), choice)
+                    if st.session_state.get('saved_meal_key') != saved_key:
+                        saved = persist_meal_analysis(
+                            patient_id=patient.patient_id,
+                            dish=choice,
+                            ingredients=[
+                                {"ingredient_name": match.hit.name, "alim_code": match.hit.alim_code, "quantity_grams": quantity, "calculated_calories": float(final_cal)*quantity/100}
+                                for match, final_cal, quantity in zip(matches, closest_calories, quantities)
+                            ],
+                            image_path=save_uploaded_image(uploaded_file=uploaded_file),
+                            date_start=datetime.now(),
+                        )
+                        if saved is None:
+                            st.error("The meal could not be saved, please try again.")
+                            return
+                        st.session_state['saved_meal_key'] = saved_key
+                        st.session_state['saved_meal'] = saved
+                        # The history page reloads its first page to show the new meal
+                        st.session_state.pop("history_patient_id", None)
+                    modified_foods = st.session_state['saved_meal']["modified_ingredient_ids"]
+                    modified_calories = closest_calories
                 # Use a while loop to safely remove items without messing up indexing
                 i = 0
                 while i < len(ingredients_data):
@@ -211,7 +237,8 @@ def show_meal_analysis_page():
                             key=f"qty_{i}"
                         )
                         if new_qty != float(row["quantity_grams"]):
-                            update_modified_ingredient(modified_ingredient_id=modified_foods[i], ingredient_name=new_name, quantity_grams=new_qty, calculated_calories=float(modified_calories[i])*new_qty/100)
+                            # Only a name the user edited replaces the matched food name
+                            update_modified_ingredient(modified_ingredient_id=modified_foods[i], ingredient_name=new_name if new_name != row["ingredient_name"] else None, quantity_grams=new_qty, calculated_calories=float(modified_calories[i])*new_qty/100)
                     with c3:
                         # Minus button to remove the row
                         remove_btn_label = f"Remove {i}"
@@ -263,6 +290,8 @@ def show_meal_analysis_page():
 
 #region history_page 
 
+HISTORY_PAGE_SIZE = 20
+
 def show_history_page():
     """
     Renders the History page with the histogram and metrics displayed at the top,
@@ -273,12 +302,21 @@ def show_history_page():
 
     # Afficher les métriques et l'histogramme uniquement s'il y a des entrées dans le journal
     patient = get_patient_by_email(st.session_state['email'])
-    patient_meals = get_meals_by_patient(patient.patient_id)
+
+    # Meals are listed most recent first, one page at a time; the chart and the nutrient table
+    # only cover the loaded pages, so a render never reads the whole history
+    if st.session_state.get("history_patient_id") != patient.patient_id:
+        st.session_state["history_patient_id"] = patient.patient_id
+        st.session_state["history_meals"], st.session_state["history_cursor"] = list_meals(patient.patient_id, limit=HISTORY_PAGE_SIZE)
+        st.session_state["history_nutrients"] = compute_meal_nutrients(
+            [meal.meal_id for meal in st.session_state["history_meals"]], source="detected"
+        )
+    # Oldest loaded meal first
+    patient_meals = st.session_state["history_meals"][::-1]
     # --- Calcul de la quantité totale par repas ---
-    total_kcal_list = []
-    for meal in patient_meals:
-        total = get_sum_calories_per_meal_detected(meal.meal_id)
-        total_kcal_list.append(total)
+    total_kcal_list = [meal.total_detected_kcal for meal in patient_meals]
+    # All nutrients of the loaded meals, computed once per page in one query and one matrix product
+    meal_nutrients = st.session_state["history_nutrients"]
 
     # Créer un DataFrame avec un identifiant pour chaque repas
     import pandas as pd
@@ -303,6 +341,35 @@ def show_history_page():
 
     st.altair_chart(bar_chart, use_container_width=True)
 
+    # --- Calories et macronutriments par jour (90 derniers jours) ---
+    daily_intake = get_daily_intake(patient.patient_id, start=datetime.now().date() - timedelta(days=90))
+    if daily_intake:
+        df_days = pd.DataFrame({
+            "Jour": [day.date for day in daily_intake],
+            "Calories (kcal)": [day.kcal for day in daily_intake],
+            "Protéines (g)": [day.proteins_g for day in daily_intake],
+            "Glucides (g)": [day.carbs_g for day in daily_intake],
+            "Lipides (g)": [day.fats_g for day in daily_intake],
+        }).set_index("Jour")
+        st.line_chart(df_days["Calories (kcal)"])
+        st.bar_chart(df_days[["Protéines (g)", "Glucides (g)", "Lipides (g)"]])
+
+    # --- Macronutriments et micronutriments par repas ---
+    if meal_nutrients is not None and len(meal_nutrients):
+        df_nutrients = meal_nutrients[[
+            "Protéines (g/100 g)", "Glucides (g/100 g)", "Lipides (g/100 g)", "Sucres (g/100 g)", "Fer (mg/100 g)"
+        ]].rename(columns={
+            "Protéines (g/100 g)": "Protéines (g)",
+            "Glucides (g/100 g)": "Glucides (g)",
+            "Lipides (g/100 g)": "Lipides (g)",
+            "Sucres (g/100 g)": "Sucres (g)",
+            "Fer (mg/100 g)": "Fer (mg)",
+        })
+        # Rows are indexed by meal_id
+        meal_names = {meal.meal_id: meal.name for meal in st.session_state["history_meals"]}
+        df_nutrients.index = [meal_names.get(meal_id, meal_id) for meal_id in df_nutrients.index]
+        st.dataframe(df_nutrients.round(1), use_container_width=True)
+
     # --- Affichage des métriques ---
     # Ici, on utilise des valeurs fixes pour l'instant
     col1, col2, col3 = st.columns(3)
@@ -327,7 +394,7 @@ def show_history_page():
         st.session_state["show_ingredients_for"] = None
 
     # Parcourir chaque entrée du journal et afficher une ligne par repas
-    for i, meal in enumerate(patient_meals):
+    for i, meal in enumerate(st.session_state["history_meals"]):
         col1, col2, col3, col4 = st.columns([2, 2, 2, 1])
         
         # 1) Date
@@ -378,6 +445,19 @@ def show_history_page():
             st.table(ingredients)
             st.write("---")
 
+    if st.session_state["history_cursor"] is not None and st.button("Charger plus"):
+        meals, st.session_state["history_cursor"] = list_meals(
+            patient.patient_id, after_cursor=st.session_state["history_cursor"], limit=HISTORY_PAGE_SIZE
+        )
+        st.session_state["history_meals"] += meals
+        page_nutrients = compute_meal_nutrients([meal.meal_id for meal in meals], source="detected")
+        if st.session_state["history_nutrients"] is not None and page_nutrients is not None:
+            st.session_state["history_nutrients"] = pd.concat([st.session_state["history_nutrients"], page_nutrients])
+        else:
+            # A table missing a page would no longer line up with the loaded meals: hide it instead
+            st.session_state["history_nutrients"] = None
+        st.rerun()
+
 
 #region Authentication Page
 
@@ -427,6 +507,7 @@ def main():
             tab1, tab2 = st.tabs(["Take Photo", "History"])
             with tab1:
                 show_meal_analysis_page()
+                show_debug_panel()
             with tab2:
                 show_history_page()
 
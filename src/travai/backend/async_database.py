@@ -0,0 +1,47 @@
+import os
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from travai.backend.database import DATABASE_URL, apply_sqlite_pragmas, pool_settings, sqlite_pragmas
+
+# Async driver used for each database of the sync layer
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+
+def async_url(url: str) -> str:
+    """
+    Maps a sync database URL to the same database through its async driver.
+
+    :param url: SQLAlchemy database URL, e.g. sqlite:///src/travai/nutrition.db
+    :return: The async URL, e.g. sqlite+aiosqlite:///src/travai/nutrition.db
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver known for {backend} databases, set TRAVAI_ASYNC_DATABASE_URL")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("TRAVAI_ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+
+def create_app_async_engine(url: str = ASYNC_DATABASE_URL, pragmas: dict = None) -> AsyncEngine:
+    """
+    Async counterpart of create_app_engine, with the same SQLite PRAGMAs and pool settings.
+
+    :param url: SQLAlchemy async database URL
+    :param pragmas: (Optional) SQLite PRAGMAs replacing sqlite_pragmas(), {} for the SQLite defaults
+    :return: The async engine
+    """
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_async_engine(url)
+        apply_sqlite_pragmas(engine.sync_engine, sqlite_pragmas() if pragmas is None else pragmas)
+        return engine
+
+    return create_async_engine(url, **pool_settings())
+
+
+async_engine = create_app_async_engine()
+# Objects stay usable after commit, since they cannot lazy-load once the session is closed
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
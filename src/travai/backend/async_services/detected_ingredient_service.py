@@ -0,0 +1,164 @@
+from sqlalchemy import select
+from travai.backend.async_database import AsyncSessionLocal
+from travai.backend.models import DetectedIngredient, Meal, ModifiedIngredient
+from travai.backend.nutrient_store import aget_nutrient_store
+from travai.backend.services.daily_intake_service import add_ingredients_to_daily_intake
+from travai.backend.services.meal_service import add_to_meal_totals
+from travai.tracing import traced
+
+@traced("db.create_detected_ingredient")
+async def create_detected_ingredient(meal_id: int, ingredient_name: str, quantity_grams: float, calculated_calories: float, alim_code: int = None):
+    """
+    Creates a new detected ingredient and assigns it to a meal.
+
+    :param meal_id: ID of the meal where the ingredient was detected
+    :param ingredient_name: Name of the detected ingredient
+    :param quantity_grams: Quantity of the ingredient in grams
+    :param calculated_calories: Calories of the ingredient
+    :param alim_code: (Optional) Code of the matched Ciqual food
+    :return: The created DetectedIngredient object or None if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            # Verify that the meal exists
+            meal = await session.get(Meal, meal_id)
+            if not meal:
+                print("Meal ID does not exist.")
+                return None
+
+            new_detected_ingredient = DetectedIngredient(
+                meal_id=meal_id,
+                ingredient_name=ingredient_name,
+                quantity_grams=quantity_grams,
+                calculated_calories=calculated_calories,
+                alim_code=alim_code,
+            )
+
+            session.add(new_detected_ingredient)
+            await session.run_sync(add_to_meal_totals, meal_id, detected_kcal=calculated_calories)
+            await session.commit()
+            await session.refresh(new_detected_ingredient)  # Refresh instance with DB values
+
+            print(f"Detected ingredient created: {new_detected_ingredient.ingredient_name} ({new_detected_ingredient.quantity_grams}g) in Meal ID {new_detected_ingredient.meal_id}")
+            return new_detected_ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while adding the detected ingredient: {e}")
+            return None
+
+
+async def get_detected_ingredient_by_id(detected_ingredient_id: int):
+    """
+    Retrieves a detected ingredient from the database using its ID.
+
+    :param detected_ingredient_id: The ID of the detected ingredient to retrieve
+    :return: The DetectedIngredient object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            detected_ingredient = await session.get(DetectedIngredient, detected_ingredient_id)
+            if detected_ingredient:
+                print(f"Detected ingredient found: {detected_ingredient.ingredient_name} ({detected_ingredient.quantity_grams}g)")
+            return detected_ingredient
+        except Exception as e:
+            print(f"Error retrieving detected ingredient: {e}")
+            return None
+
+
+async def get_detected_ingredients_by_meal(meal_id: int):
+    """
+    Retrieves all detected ingredients for a specific meal.
+
+    :param meal_id: The ID of the meal whose detected ingredients are to be retrieved
+    :return: A list of DetectedIngredient objects or an empty list if none found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            detected_ingredients = (await session.scalars(
+                select(DetectedIngredient).where(DetectedIngredient.meal_id == meal_id)
+            )).all()
+            print(f"{len(detected_ingredients)} detected ingredients found for Meal ID {meal_id}")
+            return detected_ingredients
+        except Exception as e:
+            print(f"Error retrieving detected ingredients: {e}")
+            return []
+
+
+async def update_detected_ingredient(detected_ingredient_id: int, ingredient_name: str = None, quantity_grams: float = None, calculated_calories: float = None):
+    """
+    Updates details of a detected ingredient in the database.
+
+    :param detected_ingredient_id: The ID of the detected ingredient to update
+    :param ingredient_name: (Optional) New name of the detected ingredient
+    :param quantity_grams: (Optional) New quantity in grams
+    :param calculated_calories: (Optional) New calories
+    :return: The updated DetectedIngredient object or None if not found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            detected_ingredient = await session.get(DetectedIngredient, detected_ingredient_id)
+            if not detected_ingredient:
+                print("Detected ingredient not found.")
+                return None
+
+            # Update fields if new values are provided
+            if ingredient_name:
+                detected_ingredient.ingredient_name = ingredient_name
+            if quantity_grams is not None:
+                detected_ingredient.quantity_grams = quantity_grams
+            if calculated_calories is not None:
+                await session.run_sync(add_to_meal_totals, detected_ingredient.meal_id,
+                                       detected_kcal=calculated_calories - (detected_ingredient.calculated_calories or 0))
+                detected_ingredient.calculated_calories = calculated_calories
+
+            await session.commit()
+            await session.refresh(detected_ingredient)
+
+            print(f"Detected ingredient updated: {detected_ingredient.ingredient_name} ({detected_ingredient.quantity_grams}g)")
+            return detected_ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error updating detected ingredient: {e}")
+            return None
+
+
+async def delete_detected_ingredient(detected_ingredient_id: int):
+    """
+    Deletes a detected ingredient from the database and removes all associated modified ingredients.
+
+    :param detected_ingredient_id: The ID of the detected ingredient to delete
+    :return: True if deleted successfully, False otherwise
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            detected_ingredient = await session.get(DetectedIngredient, detected_ingredient_id)
+            if not detected_ingredient:
+                print("Detected ingredient not found.")
+                return False
+
+            # Remove its modified ingredients first, from the meal totals and the daily intake too
+            modified_ingredients = (await session.scalars(
+                select(ModifiedIngredient).where(ModifiedIngredient.detected_ingredient_id == detected_ingredient_id)
+            )).all()
+            await session.run_sync(add_ingredients_to_daily_intake, detected_ingredient.meal_id, modified_ingredients, sign=-1)
+            for modified_ingredient in modified_ingredients:
+                await session.delete(modified_ingredient)
+
+            await session.delete(detected_ingredient)
+            await session.run_sync(
+                add_to_meal_totals, detected_ingredient.meal_id,
+                detected_kcal=-(detected_ingredient.calculated_calories or 0),
+                modified_kcal=-sum(modified_ingredient.calculated_calories or 0 for modified_ingredient in modified_ingredients),
+            )
+            await session.commit()
+
+            print(f"Detected ingredient deleted: {detected_ingredient.ingredient_name} (All associated modified ingredients removed)")
+            return True
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error deleting detected ingredient: {e}")
+            return False
@@ -0,0 +1,153 @@
+from sqlalchemy import select
+from travai.backend.async_database import AsyncSessionLocal
+from travai.backend.models import Ingredient
+
+async def create_ingredient(name: str, calories_per_100g: float):
+    """
+    Creates a new ingredient in the database.
+
+    :param name: Name of the ingredient
+    :param calories_per_100g: Number of calories per 100 grams
+    :return: The created Ingredient object or None if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            # Check if an ingredient with the same name already exists
+            existing_ingredient = await session.scalar(select(Ingredient).where(Ingredient.name == name))
+            if existing_ingredient:
+                print("An ingredient with this name already exists.")
+                return None
+
+            new_ingredient = Ingredient(
+                name=name,
+                calories_per_100g=calories_per_100g
+            )
+
+            session.add(new_ingredient)
+            await session.commit()
+            await session.refresh(new_ingredient)  # Refresh the instance with DB values
+
+            print(f"Ingredient created: {new_ingredient.name} ({new_ingredient.calories_per_100g} kcal/100g)")
+            return new_ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while adding the ingredient: {e}")
+            return None
+
+
+async def get_ingredient_by_id(ingredient_id: int):
+    """
+    Retrieves an ingredient from the database using its ID.
+
+    :param ingredient_id: The ID of the ingredient to retrieve
+    :return: The Ingredient object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            ingredient = await session.get(Ingredient, ingredient_id)
+            if ingredient:
+                print(f"Ingredient found: {ingredient.name} ({ingredient.calories_per_100g} kcal/100g)")
+            return ingredient
+        except Exception as e:
+            print(f"Error retrieving ingredient: {e}")
+            return None
+
+
+async def get_ingredient_by_name(name: str):
+    """
+    Retrieves an ingredient from the database using its name.
+
+    :param name: The name of the ingredient to retrieve
+    :return: The Ingredient object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            ingredient = await session.scalar(select(Ingredient).where(Ingredient.name == name))
+            if ingredient:
+                print(f"Ingredient found: {ingredient.name} ({ingredient.calories_per_100g} kcal/100g)")
+            return ingredient
+        except Exception as e:
+            print(f"Error retrieving ingredient: {e}")
+            return None
+
+
+async def get_all_ingredients():
+    """
+    Retrieves all ingredients from the database.
+
+    :return: A list of Ingredient objects or an empty list if none found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            ingredients = (await session.scalars(select(Ingredient))).all()
+            print(f"{len(ingredients)} ingredients found.")
+            return ingredients
+        except Exception as e:
+            print(f"Error retrieving ingredients: {e}")
+            return []
+
+
+async def update_ingredient(ingredient_id: int, name: str = None, calories_per_100g: float = None):
+    """
+    Updates ingredient details in the database.
+
+    :param ingredient_id: The ID of the ingredient to update
+    :param name: (Optional) New name of the ingredient
+    :param calories_per_100g: (Optional) New calorie value per 100g
+    :return: The updated Ingredient object or None if not found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            ingredient = await session.get(Ingredient, ingredient_id)
+            if not ingredient:
+                print("Ingredient not found.")
+                return None
+
+            # Check if the new name is already taken by another ingredient
+            if name and name != ingredient.name:
+                existing_ingredient = await session.scalar(select(Ingredient).where(Ingredient.name == name))
+                if existing_ingredient:
+                    print("Another ingredient with this name already exists.")
+                    return None
+                ingredient.name = name
+
+            if calories_per_100g is not None:
+                ingredient.calories_per_100g = calories_per_100g
+
+            await session.commit()
+            await session.refresh(ingredient)
+
+            print(f"Ingredient updated: {ingredient.name} ({ingredient.calories_per_100g} kcal/100g)")
+            return ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error updating ingredient: {e}")
+            return None
+
+
+async def delete_ingredient(ingredient_id: int):
+    """
+    Deletes an ingredient from the database.
+
+    :param ingredient_id: The ID of the ingredient to delete
+    :return: True if deleted successfully, False otherwise
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            ingredient = await session.get(Ingredient, ingredient_id)
+            if not ingredient:
+                print("Ingredient not found.")
+                return False
+
+            await session.delete(ingredient)
+            await session.commit()
+
+            print(f"Ingredient deleted: {ingredient.name}")
+            return True
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error deleting ingredient: {e}")
+            return False
@@ -0,0 +1,316 @@
+from sqlalchemy import delete, select, tuple_
+from travai.backend.async_database import AsyncSessionLocal
+from travai.backend.models import Meal, Patient, DetectedIngredient, ModifiedIngredient
+from travai.backend.nutrient_store import aget_nutrient_store
+from travai.backend.services.daily_intake_service import (
+    add_ingredients_to_daily_intake, add_to_daily_intake, ingredients_intake, move_meal_in_daily_intake
+)
+from travai.backend.services.meal_service import _decode_cursor, _encode_cursor
+from datetime import datetime
+from travai.tracing import set_attributes, traced
+
+@traced("db.create_meal")
+async def create_meal(patient_id: int, date_start: datetime, image_path: str, name: str):
+    """
+    Creates a new meal and assigns it to a patient.
+
+    :param patient_id: ID of the patient who consumed the meal
+    :param date_start: Date and time when the meal was consumed
+    :param image_path: Path to the image of the meal
+    :param name: Name of the meal
+    :return: The created Meal object or None if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            # Verify that the patient exists before creating the meal
+            patient = await session.get(Patient, patient_id)
+            if not patient:
+                print("Patient ID does not exist.")
+                return None
+
+            new_meal = Meal(
+                patient_id=patient_id,
+                date_start=date_start,
+                image_path=image_path,
+                name=name
+            )
+
+            session.add(new_meal)
+            await session.run_sync(add_to_daily_intake, patient_id, date_start.date(), meals=1)
+            await session.commit()
+            await session.refresh(new_meal)  # Refresh instance with DB values
+
+            print(f"Meal created: {new_meal.name} for Patient ID {new_meal.patient_id}")
+            return new_meal
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while adding the meal: {e}")
+            return None
+
+
+@traced("db.persist_meal_analysis")
+async def persist_meal_analysis(patient_id: int, dish: str, ingredients: list[dict], image_path: str, date_start: datetime = None):
+    """
+    Saves an analyzed meal with all its detected ingredients, and their editable modified copies,
+    in a single transaction.
+
+    :param patient_id: ID of the patient who consumed the meal
+    :param dish: Name of the meal
+    :param ingredients: One dict per ingredient with keys ingredient_name, quantity_grams, calculated_calories
+        and (optionally) alim_code, the matched Ciqual food
+    :param image_path: Path to the image of the meal
+    :param date_start: (Optional) Date and time when the meal was consumed, defaults to now
+    :return: A dict with the meal_id and the lists of detected_ingredient_ids and modified_ingredient_ids
+        (in the order of ingredients), or None if an error occurs
+    """
+    await aget_nutrient_store()  # Loaded off the event loop, the intake lookups below are then in memory
+    async with AsyncSessionLocal() as session:
+        try:
+            # Verify that the patient exists before creating the meal
+            patient = await session.get(Patient, patient_id)
+            if not patient:
+                print("Patient ID does not exist.")
+                return None
+
+            # The modified ingredients start as copies of the detected ones
+            total_kcal = sum(ingredient.get("calculated_calories") or 0 for ingredient in ingredients)
+            new_meal = Meal(
+                patient_id=patient_id,
+                date_start=date_start or datetime.now(),
+                image_path=image_path,
+                name=dish,
+                total_detected_kcal=total_kcal,
+                total_modified_kcal=total_kcal,
+            )
+            session.add(new_meal)
+            await session.flush()  # Assigns meal_id
+
+            detected = [
+                DetectedIngredient(
+                    meal_id=new_meal.meal_id,
+                    ingredient_name=ingredient["ingredient_name"],
+                    alim_code=ingredient.get("alim_code"),
+                    quantity_grams=ingredient["quantity_grams"],
+                    calculated_calories=ingredient.get("calculated_calories", 0),
+                )
+                for ingredient in ingredients
+            ]
+            session.add_all(detected)
+            await session.flush()  # Assigns the detected_ingredient_ids
+
+            modified = [
+                ModifiedIngredient(
+                    meal_id=new_meal.meal_id,
+                    detected_ingredient_id=detected_ingredient.detected_ingredient_id,
+                    ingredient_name=detected_ingredient.ingredient_name,
+                    alim_code=detected_ingredient.alim_code,
+                    quantity_grams=detected_ingredient.quantity_grams,
+                    calculated_calories=detected_ingredient.calculated_calories,
+                )
+                for detected_ingredient in detected
+            ]
+            session.add_all(modified)
+            await session.flush()
+            await session.run_sync(add_to_daily_intake, patient_id, new_meal.date_start.date(), meals=1, **ingredients_intake(
+                [row.ingredient_name for row in modified],
+                [row.quantity_grams for row in modified],
+                [row.calculated_calories for row in modified],
+                [row.alim_code for row in modified],
+            ))
+
+            ids = {
+                "meal_id": new_meal.meal_id,
+                "detected_ingredient_ids": [row.detected_ingredient_id for row in detected],
+                "modified_ingredient_ids": [row.modified_ingredient_id for row in modified],
+            }
+            await session.commit()
+            set_attributes(rows=1 + len(detected) + len(modified))
+
+            print(f"Meal created: {dish} for Patient ID {patient_id} with {len(detected)} ingredients")
+            return ids
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while saving the meal analysis: {e}")
+            return None
+
+
+async def get_meal_by_id(meal_id: int):
+    """
+    Retrieves a meal from the database using its ID.
+
+    :param meal_id: The ID of the meal to retrieve
+    :return: The Meal object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            meal = await session.get(Meal, meal_id)
+            if meal:
+                print(f"Meal found: {meal.name} (Meal ID: {meal.meal_id})")
+            return meal
+        except Exception as e:
+            print(f"Error retrieving meal: {e}")
+            return None
+
+
+@traced("db.get_meals_by_patient")
+async def get_meals_by_patient(patient_id: int):
+    """
+    Retrieves all meals associated with a specific patient.
+
+    :param patient_id: The ID of the patient whose meals are to be retrieved
+    :return: A list of Meal objects or an empty list if none found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            meals = (await session.scalars(select(Meal).where(Meal.patient_id == patient_id))).all()
+            set_attributes(rows=len(meals))
+            print(f"{len(meals)} meals found for Patient ID {patient_id}")
+            return meals
+        except Exception as e:
+            print(f"Error retrieving meals: {e}")
+            return []
+
+
+def _meal_rows(patient_id: int, start: datetime = None, end: datetime = None):
+    statement = select(
+        Meal.meal_id,
+        Meal.date_start,
+        Meal.name,
+        Meal.image_path,
+        Meal.total_detected_kcal,
+        Meal.total_modified_kcal,
+    ).where(Meal.patient_id == patient_id)
+    if start is not None:
+        statement = statement.where(Meal.date_start >= start)
+    if end is not None:
+        statement = statement.where(Meal.date_start < end)
+    return statement.order_by(Meal.date_start.desc(), Meal.meal_id.desc())
+
+
+@traced("db.get_meal_calorie_totals")
+async def get_meal_calorie_totals(patient_id: int, start: datetime = None, end: datetime = None, limit: int = None):
+    """
+    Retrieves the meals of a patient with their detected and modified calorie totals, in a single query.
+
+    :param patient_id: The ID of the patient whose meals are to be retrieved
+    :param start: (Optional) Only keep meals consumed at or after this date
+    :param end: (Optional) Only keep meals consumed before this date
+    :param limit: (Optional) Only keep the most recent meals
+    :return: A list of rows (meal_id, date_start, name, image_path, total_detected_kcal, total_modified_kcal)
+        ordered by date, or an empty list if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            rows = (await session.execute(_meal_rows(patient_id, start, end).limit(limit))).all()
+            rows.reverse()
+            set_attributes(rows=len(rows))
+            return rows
+        except Exception as e:
+            print(f"Error retrieving meal calorie totals: {e}")
+            return []
+
+
+@traced("db.list_meals")
+async def list_meals(patient_id: int, start: datetime = None, end: datetime = None, after_cursor: str = None, limit: int = 20):
+    """
+    Retrieves one page of the meals of a patient, most recent first (see the sync list_meals).
+
+    :param patient_id: The ID of the patient whose meals are to be retrieved
+    :param start: (Optional) Only keep meals consumed at or after this date
+    :param end: (Optional) Only keep meals consumed before this date
+    :param after_cursor: (Optional) The next_cursor of the previous page
+    :param limit: Number of meals per page
+    :return: A tuple (rows, next_cursor), next_cursor is None on the last page. ([], None) if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            statement = _meal_rows(patient_id, start, end)
+            if after_cursor is not None:
+                statement = statement.where(tuple_(Meal.date_start, Meal.meal_id) < _decode_cursor(after_cursor))
+
+            # One extra row tells whether another page follows
+            rows = (await session.execute(statement.limit(limit + 1))).all()
+            next_cursor = _encode_cursor(rows[limit - 1].date_start, rows[limit - 1].meal_id) if len(rows) > limit else None
+            set_attributes(rows=min(len(rows), limit))
+            return rows[:limit], next_cursor
+        except Exception as e:
+            print(f"Error listing meals: {e}")
+            return [], None
+
+
+async def update_meal(meal_id: int, date_start: datetime = None, image_path: str = None, name: str = None):
+    """
+    Updates meal details in the database.
+
+    :param meal_id: The ID of the meal to update
+    :param date_start: (Optional) New date and time for the meal
+    :param image_path: (Optional) New image path
+    :param name: (Optional) New meal name
+    :return: The updated Meal object or None if not found
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            meal = await session.get(Meal, meal_id)
+            if not meal:
+                print("Meal not found.")
+                return None
+
+            # Update fields if new values are provided
+            if date_start:
+                await session.run_sync(move_meal_in_daily_intake, meal_id, meal.date_start, date_start)
+                meal.date_start = date_start
+            if image_path:
+                meal.image_path = image_path
+            if name:
+                meal.name = name
+
+            await session.commit()
+            await session.refresh(meal)
+
+            print(f"Meal updated: {meal.name} (Meal ID: {meal.meal_id})")
+            return meal
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error updating meal: {e}")
+            return None
+
+
+async def delete_meal(meal_id: int):
+    """
+    Deletes a meal from the database and removes all associated detected ingredients.
+
+    :param meal_id: The ID of the meal to delete
+    :return: True if deleted successfully, False otherwise
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            meal = await session.get(Meal, meal_id)
+            if not meal:
+                print("Meal not found.")
+                return False
+
+            # Remove the meal and its modified ingredients from the daily intake
+            modified_ingredients = (await session.scalars(
+                select(ModifiedIngredient).where(ModifiedIngredient.meal_id == meal_id)
+            )).all()
+            await session.run_sync(add_ingredients_to_daily_intake, meal_id, modified_ingredients, sign=-1)
+            await session.run_sync(add_to_daily_intake, meal.patient_id, meal.date_start.date(), meals=-1)
+
+            # Delete all detected and modified ingredients linked to this meal, then the meal
+            await session.execute(delete(ModifiedIngredient).where(ModifiedIngredient.meal_id == meal_id))
+            await session.execute(delete(DetectedIngredient).where(DetectedIngredient.meal_id == meal_id))
+            await session.delete(meal)
+            await session.commit()
+
+            print(f"Meal deleted: {meal.name} (All associated detected ingredients removed)")
+            return True
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error deleting meal: {e}")
+            return False
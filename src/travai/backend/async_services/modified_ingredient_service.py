@@ -0,0 +1,183 @@
+from sqlalchemy import select
+from travai.backend.async_database import AsyncSessionLocal
+from travai.backend.models import ModifiedIngredient, DetectedIngredient
+from travai.backend.nutrient_store import aget_nutrient_store
+from travai.backend.services.daily_intake_service import add_ingredients_to_daily_intake
+from travai.backend.services.meal_service import add_to_meal_totals
+from travai.tracing import traced
+
+@traced("db.create_modified_ingredient")
+async def create_modified_ingredient(detected_ingredient_id: int, meal_id: int, ingredient_name: str, quantity_grams: float, calculated_calories: float, alim_code: int = None):
+    """
+    Creates a new modified ingredient and associates it with a detected ingredient.
+
+    :param detected_ingredient_id: ID of the detected ingredient being modified
+    :param meal_id: ID of the meal of the ingredient
+    :param ingredient_name: Name of the ingredient
+    :param quantity_grams: Updated quantity of the ingredient in grams
+    :param calculated_calories: Updated calories of the ingredient
+    :param alim_code: (Optional) Code of the matched Ciqual food, defaults to the one of the detected ingredient
+    :return: The created ModifiedIngredient object or None if an error occurs
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            # Verify that the detected ingredient exists
+            detected_ingredient = await session.get(DetectedIngredient, detected_ingredient_id)
+            if not detected_ingredient:
+                print("Detected Ingredient ID does not exist.")
+                return None
+
+            new_modified_ingredient = ModifiedIngredient(
+                detected_ingredient_id=detected_ingredient_id,
+                meal_id=meal_id,
+                ingredient_name=ingredient_name,
+                quantity_grams=quantity_grams,
+                calculated_calories=calculated_calories,
+                alim_code=alim_code if alim_code is not None else detected_ingredient.alim_code
+            )
+
+            session.add(new_modified_ingredient)
+            await session.run_sync(add_to_meal_totals, meal_id, modified_kcal=calculated_calories)
+            await session.run_sync(add_ingredients_to_daily_intake, meal_id, [new_modified_ingredient])
+            await session.commit()
+            await session.refresh(new_modified_ingredient)  # Refresh instance with DB values
+
+            print(f"Modified ingredient created: {new_modified_ingredient.quantity_grams}g for Detected Ingredient ID {new_modified_ingredient.detected_ingredient_id}")
+            return new_modified_ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while adding the modified ingredient: {e}")
+            return None
+
+
+async def get_modified_ingredient_by_id(modified_ingredient_id: int):
+    """
+    Retrieves a modified ingredient from the database using its ID.
+
+    :param modified_ingredient_id: The ID of the modified ingredient to retrieve
+    :return: The ModifiedIngredient object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            modified_ingredient = await session.get(ModifiedIngredient, modified_ingredient_id)
+            if modified_ingredient:
+                print(f"Modified ingredient found: {modified_ingredient.quantity_grams}g (Modified ID: {modified_ingredient.modified_ingredient_id})")
+            return modified_ingredient
+        except Exception as e:
+            print(f"Error retrieving modified ingredient: {e}")
+            return None
+
+
+async def get_modified_ingredients_by_detected_ingredient(detected_ingredient_id: int):
+    """
+    Retrieves all modified ingredients linked to a specific detected ingredient.
+
+    :param detected_ingredient_id: The ID of the detected ingredient
+    :return: A list of ModifiedIngredient objects or an empty list if none found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            modified_ingredients = (await session.scalars(
+                select(ModifiedIngredient).where(ModifiedIngredient.detected_ingredient_id == detected_ingredient_id)
+            )).all()
+            print(f"{len(modified_ingredients)} modified ingredients found for Detected Ingredient ID {detected_ingredient_id}")
+            return modified_ingredients
+        except Exception as e:
+            print(f"Error retrieving modified ingredients: {e}")
+            return []
+
+
+async def get_modified_ingredients_by_meal_id(meal_id: int):
+    """
+    Retrieves all modified ingredients of a specific meal.
+
+    :param meal_id: The ID of the meal
+    :return: A list of ModifiedIngredient objects or an empty list if none found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            modified_ingredients = (await session.scalars(
+                select(ModifiedIngredient).where(ModifiedIngredient.meal_id == meal_id)
+            )).all()
+            print(f"{len(modified_ingredients)} modified ingredients found for Meal ID {meal_id}")
+            return modified_ingredients
+        except Exception as e:
+            print(f"Error retrieving modified ingredients: {e}")
+            return []
+
+
+@traced("db.update_modified_ingredient")
+async def update_modified_ingredient(modified_ingredient_id: int, ingredient_name: str = None, quantity_grams: float = None, calculated_calories: float = None):
+    """
+    Updates details of a modified ingredient in the database.
+
+    :param modified_ingredient_id: The ID of the modified ingredient to update
+    :param ingredient_name: (Optional) New name of the ingredient
+    :param quantity_grams: (Optional) New quantity in grams
+    :param calculated_calories: (Optional) New calories
+    :return: The updated ModifiedIngredient object or None if not found
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            modified_ingredient = await session.get(ModifiedIngredient, modified_ingredient_id)
+            if not modified_ingredient:
+                print("Modified ingredient not found.")
+                return None
+
+            # The daily intake gets the old values removed and the new ones added
+            await session.run_sync(add_ingredients_to_daily_intake, modified_ingredient.meal_id, [modified_ingredient], sign=-1)
+
+            # Update fields if new values are provided
+            if quantity_grams is not None:
+                modified_ingredient.quantity_grams = quantity_grams
+            if calculated_calories is not None:
+                await session.run_sync(add_to_meal_totals, modified_ingredient.meal_id,
+                                       modified_kcal=calculated_calories - (modified_ingredient.calculated_calories or 0))
+                modified_ingredient.calculated_calories = calculated_calories
+            if ingredient_name:
+                modified_ingredient.ingredient_name = ingredient_name
+            await session.run_sync(add_ingredients_to_daily_intake, modified_ingredient.meal_id, [modified_ingredient])
+
+            await session.commit()
+            await session.refresh(modified_ingredient)
+
+            print(f"Modified ingredient updated: {modified_ingredient.quantity_grams}g (Modified ID: {modified_ingredient.modified_ingredient_id})")
+            return modified_ingredient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error updating modified ingredient: {e}")
+            return None
+
+
+async def delete_modified_ingredient(modified_ingredient_id: int):
+    """
+    Deletes a modified ingredient from the database.
+
+    :param modified_ingredient_id: The ID of the modified ingredient to delete
+    :return: True if deleted successfully, False otherwise
+    """
+    await aget_nutrient_store()
+    async with AsyncSessionLocal() as session:
+        try:
+            modified_ingredient = await session.get(ModifiedIngredient, modified_ingredient_id)
+            if not modified_ingredient:
+                print("Modified ingredient not found.")
+                return False
+
+            await session.delete(modified_ingredient)
+            await session.run_sync(add_to_meal_totals, modified_ingredient.meal_id,
+                                   modified_kcal=-(modified_ingredient.calculated_calories or 0))
+            await session.run_sync(add_ingredients_to_daily_intake, modified_ingredient.meal_id, [modified_ingredient], sign=-1)
+            await session.commit()
+
+            print(f"Modified ingredient deleted (ID: {modified_ingredient.modified_ingredient_id})")
+            return True
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error deleting modified ingredient: {e}")
+            return False
@@ -0,0 +1,164 @@
+from sqlalchemy import delete, select
+from travai.backend.async_database import AsyncSessionLocal
+from travai.backend.models import Patient, Doctor, Goal
+
+async def create_patient(first_name: str, last_name: str, email: str, password: str, doctor_id: int = None):
+    """
+    Creates a new patient and adds them to the database.
+
+    :param first_name: Patient's first name
+    :param last_name: Patient's last name
+    :param email: Patient's email (must be unique)
+    :param password: Password (should be hashed before storage)
+    :param doctor_id: (Optional) ID of the doctor assigned to this patient
+    :return: The created patient object or None if an error occurs
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            existing_patient = await session.scalar(select(Patient).where(Patient.email == email))
+            if existing_patient:
+                print("A patient with this email already exists.")
+                return None
+
+            if doctor_id:
+                doctor = await session.get(Doctor, doctor_id)
+                if not doctor:
+                    print("Doctor ID does not exist.")
+                    return None
+
+            new_patient = Patient(
+                first_name=first_name,
+                last_name=last_name,
+                email=email,
+                password=password,  # TODO: Hash password before storage
+                doctor_id=doctor_id
+            )
+
+            session.add(new_patient)
+            await session.commit()
+            await session.refresh(new_patient)
+
+            print(f"Patient created: {new_patient.first_name} {new_patient.last_name} ({new_patient.email})")
+            return new_patient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error while adding the patient: {e}")
+            return None
+
+
+async def get_patient_by_email(email: str):
+    """
+    Retrieves a patient from the database using their email.
+
+    :param email: The email of the patient to retrieve
+    :return: The Patient object if found, else None
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            return await session.scalar(select(Patient).where(Patient.email == email))
+        except Exception as e:
+            print(f"Error retrieving patient: {e}")
+            return None
+
+
+async def update_patient(email: str, first_name: str = None, last_name: str = None, doctor_id: int = None):
+    """
+    Updates patient details in the database.
+
+    :param email: The email of the patient to update
+    :param first_name: (Optional) New first name
+    :param last_name: (Optional) New last name
+    :param doctor_id: (Optional) ID of the newly assigned doctor
+    :return: The updated patient object or None if not found
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            patient = await session.scalar(select(Patient).where(Patient.email == email))
+            if not patient:
+                print("Patient not found.")
+                return None
+
+            # Update fields if new values are provided
+            if first_name:
+                patient.first_name = first_name
+            if last_name:
+                patient.last_name = last_name
+
+            # Update doctor assignment if doctor_id is provided
+            if doctor_id is not None:
+                doctor = await session.get(Doctor, doctor_id)
+                if not doctor:
+                    print("Doctor ID does not exist.")
+                    return None
+                patient.doctor_id = doctor_id
+
+            await session.commit()
+            await session.refresh(patient)
+
+            print(f"Patient updated: {patient.first_name} {patient.last_name}")
+            return patient
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error updating patient: {e}")
+            return None
+
+
+async def delete_patient(email: str):
+    """
+    Deletes a patient from the database.
+
+    :param email: The email of the patient to delete
+    :return: True if deleted successfully, False otherwise
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            patient = await session.scalar(select(Patient).where(Patient.email == email))
+            if not patient:
+                print("Patient not found.")
+                return False
+
+            # Delete all goals linked to this patient
+            await session.execute(delete(Goal).where(Goal.patient_id == patient.patient_id))
+
+            await session.delete(patient)
+            await session.commit()
+
+            print(f"Patient deleted: {patient.first_name} {patient.last_name}")
+            return True
+
+        except Exception as e:
+            await session.rollback()
+            print(f"Error deleting patient: {e}")
+            return False
+
+
+async def authenticate_user(email: str, password: str):
+    """
+    Checks if the given email and password match either a doctor or a patient.
+
+    :param email: The email of the user
+    :param password: The password entered by the user (stored as plain text for demo)
+    :return: (doctor, "doctor") or (patient, "patient"), None if invalid credentials
+    """
+    async with AsyncSessionLocal() as session:
+        try:
+            # Check if the user is a doctor
+            doctor = await session.scalar(select(Doctor).where(Doctor.email == email, Doctor.password == password))
+            if doctor:
+                print("User authenticated as a doctor.")
+                return doctor, "doctor"
+
+            # Check if the user is a patient
+            patient = await session.scalar(select(Patient).where(Patient.email == email, Patient.password == password))
+            if patient:
+                print("User authenticated as a patient.")
+                return patient, "patient"
+
+            print("Invalid credentials.")
+            return None
+
+        except Exception as e:
+            print(f"Error during authentication: {e}")
+            return None
@@ -0,0 +1,77 @@
+import argparse
+
+from sqlalchemy import func, or_, select, update
+
+from travai.backend.database import SessionLocal
+from travai.backend.models import DetectedIngredient, Meal, ModifiedIngredient
+from travai.backend.services.daily_intake_service import rebuild_daily_intake
+
+
+def _ingredient_sum(model):
+    # Correlated subquery: sum of the ingredient calories of the outer meal
+    return func.coalesce(
+        select(func.sum(model.calculated_calories)).where(model.meal_id == Meal.meal_id).scalar_subquery(),
+        0,
+    )
+
+
+def check_meal_totals(repair: bool = False, tolerance: float = 1e-3):
+    """
+    Compares the stored meal calorie totals with the sums of their ingredients.
+
+    :param repair: Whether to overwrite the drifted totals with the recomputed sums
+    :param tolerance: Largest difference (in kcal) not reported as a drift
+    :return: A list of (meal_id, stored detected, actual detected, stored modified, actual modified)
+        for every drifted meal, or None if an error occurs
+    """
+    detected_sum = _ingredient_sum(DetectedIngredient)
+    modified_sum = _ingredient_sum(ModifiedIngredient)
+    session = SessionLocal()
+    try:
+        drifted = session.query(
+            Meal.meal_id, Meal.total_detected_kcal, detected_sum, Meal.total_modified_kcal, modified_sum,
+        ).filter(or_(
+            func.abs(Meal.total_detected_kcal - detected_sum) > tolerance,
+            func.abs(Meal.total_modified_kcal - modified_sum) > tolerance,
+        )).all()
+        drifted = [tuple(row) for row in drifted]
+
+        if repair and drifted:
+            session.execute(
+                update(Meal).where(Meal.meal_id.in_([row[0] for row in drifted])).values(
+                    total_detected_kcal=detected_sum,
+                    total_modified_kcal=modified_sum,
+                ),
+                execution_options={"synchronize_session": False},
+            )
+            session.commit()
+
+        print(f"{len(drifted)} meals with drifted calorie totals{' (repaired)' if repair and drifted else ''}")
+        return drifted
+    except Exception as e:
+        session.rollback()
+        print(f"Error checking meal totals: {e}")
+        return None
+    finally:
+        session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consistency checks and rebuilds of the denormalized tables")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    meal_totals = subparsers.add_parser("meal-totals", help="check the calorie totals stored on meals")
+    meal_totals.add_argument("--repair", action="store_true", help="rewrite the drifted totals")
+    daily_intake = subparsers.add_parser("daily-intake", help="rebuild the per-patient daily intake rollup")
+    daily_intake.add_argument("--patient-id", type=int, default=None, help="only rebuild this patient")
+    args = parser.parse_args()
+
+    if args.command == "meal-totals":
+        for meal_id, detected, actual_detected, modified, actual_modified in check_meal_totals(repair=args.repair) or []:
+            print(f"Meal {meal_id}: detected {detected:.1f} (actual {actual_detected:.1f}), "
+                  f"modified {modified:.1f} (actual {actual_modified:.1f})")
+    elif args.command == "daily-intake":
+        rebuild_daily_intake(patient_id=args.patient_id)
+
+
+if __name__ == "__main__":
+    main()
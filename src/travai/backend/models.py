@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Date, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from travai.backend.database import Base
@@ -11,7 +11,7 @@ class Doctor(Base):
     doctor_id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True, index=True)
     password = Column(String, nullable=False)
 
 class Patient(Base):
@@ -20,18 +20,23 @@ class Patient(Base):
     patient_id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
-    email = Column(String, nullable=False)
+    email = Column(String, nullable=False, unique=True, index=True)
     password = Column(String, nullable=False)
     doctor_id = Column(Integer, ForeignKey("doctors.doctor_id"), nullable=True)
 
 class Meal(Base):
     __tablename__ = "meals"
+    # Serves the patient_id-only filters, date ranges and the keyset pagination of list_meals
+    __table_args__ = (Index("ix_meals_patient_id_date_start_meal_id", "patient_id", "date_start", "meal_id"),)
 
     meal_id = Column(Integer, primary_key=True, index=True)
     patient_id = Column(Integer, ForeignKey("patients.patient_id"), nullable=False)
     date_start = Column(DateTime, nullable=False)
     image_path = Column(String, nullable=False)
     name = Column(String, nullable=False)
+    # Sums of calculated_calories of the meal's ingredients, kept up to date by the ingredient services
+    total_detected_kcal = Column(Float, nullable=False, default=0, server_default="0")
+    total_modified_kcal = Column(Float, nullable=False, default=0, server_default="0")
 
 class Ingredient(Base):
     __tablename__ = "ingredients"
@@ -44,8 +49,10 @@ class DetectedIngredient(Base):
     __tablename__ = "detected_ingredients"
 
     detected_ingredient_id = Column(Integer, primary_key=True, index=True)
-    meal_id = Column(Integer, ForeignKey("meals.meal_id"), nullable=False)
+    meal_id = Column(Integer, ForeignKey("meals.meal_id"), nullable=False, index=True)
     ingredient_name = Column(String, nullable=False)
+    # Ciqual food the ingredient was matched to, kept when the user renames it
+    alim_code = Column(Integer, nullable=True)
     quantity_grams = Column(Float, nullable=False)
     calculated_calories = Column(Float, nullable=True, default=0)
 
@@ -53,9 +60,10 @@ class ModifiedIngredient(Base):
     __tablename__ = "modified_ingredients"
 
     modified_ingredient_id = Column(Integer, primary_key=True, index=True)
-    meal_id = Column(Integer, ForeignKey("meals.meal_id"), nullable=False)
+    meal_id = Column(Integer, ForeignKey("meals.meal_id"), nullable=False, index=True)
     ingredient_name = Column(String, nullable=False)
-    detected_ingredient_id = Column(Integer, ForeignKey("detected_ingredients.detected_ingredient_id"), nullable=True)
+    alim_code = Column(Integer, nullable=True)
+    detected_ingredient_id = Column(Integer, ForeignKey("detected_ingredients.detected_ingredient_id"), nullable=True, index=True)
     quantity_grams = Column(Float, nullable=False)
     calculated_calories = Column(Float, nullable=True, default=0)
 
@@ -64,7 +72,21 @@ class Goal(Base):
     __tablename__ = "goals"
 
     goal_id = Column(Integer, primary_key=True, index=True)
-    patient_id = Column(Integer, ForeignKey("patients.patient_id"), nullable=False)
+    patient_id = Column(Integer, ForeignKey("patients.patient_id"), nullable=False, index=True)
     date_start = Column(DateTime, nullable=False)
     date_end = Column(DateTime, nullable=False)
-    calories_in_grams_per_day = Column(Float, nullable=False)
\ No newline at end of file
+    calories_in_grams_per_day = Column(Float, nullable=False)
+
+
+class DailyIntake(Base):
+    __tablename__ = "daily_intake"
+    # Per-patient daily sums of the modified ingredients, kept up to date by the meal and ingredient services
+
+    patient_id = Column(Integer, ForeignKey("patients.patient_id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    meals = Column(Integer, nullable=False, default=0, server_default="0")
+    kcal = Column(Float, nullable=False, default=0, server_default="0")
+    proteins_g = Column(Float, nullable=False, default=0, server_default="0")
+    carbs_g = Column(Float, nullable=False, default=0, server_default="0")
+    fats_g = Column(Float, nullable=False, default=0, server_default="0")
+    sugars_g = Column(Float, nullable=False, default=0, server_default="0")
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from travai.backend.vector_db.ciqual import CIQUAL_CSV_PATH, NUTRIENT_COLUMNS, load_ciqual, parse_nutrient_value
+
+DEFAULT_NUTRIENT_STORE_DIR = os.getenv("TRAVAI_NUTRIENT_STORE_DIR", "./nutrient_store")
+
+
+def build_nutrient_store(csv_path: str = CIQUAL_CSV_PATH, store_dir: str = DEFAULT_NUTRIENT_STORE_DIR) -> int:
+    """
+    Converts the Ciqual CSV into a typed columnar store that can be memory-mapped.
+
+    The store directory holds values.npy (float32, one row per food and one column per
+    nutrient, NaN for missing values), alim_codes.npy (int32) and meta.json (column and
+    food names, and the hash of the CSV the store was built from).
+
+    :param csv_path: Path to the processed Ciqual CSV
+    :param store_dir: Directory to write the store to
+    :return: The number of foods written
+    """
+    food_dataset = load_ciqual(csv_path)
+    values = np.array(
+        [[parse_nutrient_value(value) for value in food_dataset[column]] for column in NUTRIENT_COLUMNS],
+        dtype=np.float32,
+    ).T
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, "values.npy"), np.ascontiguousarray(values))
+    np.save(os.path.join(store_dir, "alim_codes.npy"), food_dataset["alim_code"].to_numpy(dtype=np.int32))
+    with open(os.path.join(store_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "columns": NUTRIENT_COLUMNS,
+            "names": food_dataset["alim_nom_en"].tolist(),
+            "csv_sha256": file_digest(csv_path),
+        }, f, ensure_ascii=False)
+    return len(food_dataset)
+
+
+def file_digest(path: str) -> str:
+    """
+    :param path: Path of a file
+    :return: The hex SHA-256 of its content
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def is_stale(store_dir: str = DEFAULT_NUTRIENT_STORE_DIR, csv_path: str = CIQUAL_CSV_PATH) -> bool:
+    """
+    Tells whether the store in store_dir is missing or was built from another version of the CSV.
+
+    A store shipped without its CSV is considered up to date.
+
+    :param store_dir: Directory of the store
+    :param csv_path: Path to the processed Ciqual CSV
+    :return: True if the store must be (re)built
+    """
+    meta_path = os.path.join(store_dir, "meta.json")
+    if not os.path.exists(os.path.join(store_dir, "values.npy")) or not os.path.exists(meta_path):
+        return True
+    if not os.path.exists(csv_path):
+        return False
+    with open(meta_path, encoding="utf-8") as f:
+        built_from = json.load(f).get("csv_sha256")
+    return built_from != file_digest(csv_path)
+
+
+class NutrientStore:
+    """
+    Read-only view over a nutrient store written by build_nutrient_store.
+    """
+
+    def __init__(self, store_dir: str = DEFAULT_NUTRIENT_STORE_DIR):
+        self.values = np.load(os.path.join(store_dir, "values.npy"), mmap_mode="r")
+        self.alim_codes = np.load(os.path.join(store_dir, "alim_codes.npy"), mmap_mode="r")
+        with open(os.path.join(store_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.columns: list[str] = meta["columns"]
+        self.names: list[str] = meta["names"]
+        self.row_by_code = {int(alim_code): row for row, alim_code in enumerate(self.alim_codes)}
+        self.row_by_name = {}
+        for row, name in enumerate(self.names):
+            self.row_by_name.setdefault(name, row)
+
+    def column(self, name: str) -> int:
+        """
+        :param name: Nutrient column name, e.g. "Energie (kcal/100 g)"
+        :return: Its position in the nutrient vectors
+        """
+        return self.columns.index(name)
+
+    def rows_for_codes(self, alim_codes: list[int]) -> np.ndarray:
+        """
+        :param alim_codes: Ciqual food codes
+        :return: The row index of every code, -1 for unknown codes
+        """
+        return np.array([self.row_by_code.get(int(code), -1) for code in alim_codes], dtype=np.int64)
+
+    def rows_for_names(self, names: list[str]) -> np.ndarray:
+        """
+        :param names: English Ciqual names (alim_nom_en)
+        :return: The row index of every name, -1 for unknown names
+        """
+        return np.array([self.row_by_name.get(name, -1) for name in names], dtype=np.int64)
+
+    def rows_for_foods(self, alim_codes: list, names: list[str]) -> np.ndarray:
+        """
+        :param alim_codes: Ciqual food codes, None where the food was not matched to a code
+        :param names: English Ciqual names (alim_nom_en), used where the code is None
+        :return: The row index of every food, -1 for unknown foods
+        """
+        return np.array([
+            self.row_by_code.get(int(code), -1) if code is not None else self.row_by_name.get(name, -1)
+            for code, name in zip(alim_codes, names)
+        ], dtype=np.int64)
+
+    def lookup_rows(self, rows: np.ndarray) -> np.ndarray:
+        """
+        :param rows: Row indices, -1 for unknown foods
+        :return: A float32 array of shape (len(rows), n_nutrients), NaN for unknown foods
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        result = np.full((len(rows), len(self.columns)), np.nan, dtype=np.float32)
+        known = rows >= 0
+        result[known] = self.values[rows[known]]
+        return result
+
+    def lookup(self, alim_codes: list[int]) -> np.ndarray:
+        """
+        :param alim_codes: Ciqual food codes
+        :return: Nutrient values per 100g, shape (len(alim_codes), n_nutrients), NaN when missing
+        """
+        return self.lookup_rows(self.rows_for_codes(alim_codes))
+
+    def totals(self, rows: np.ndarray, quantities_grams: np.ndarray) -> np.ndarray:
+        """
+        Sums the nutrients of a set of foods eaten in the given quantities.
+
+        Missing values count as 0, so one unknown vitamin does not blank the whole total.
+
+        :param rows: Row indices of the foods, -1 for unknown foods
+        :param quantities_grams: Quantity eaten of each food, in grams
+        :return: A float32 vector of length n_nutrients
+        """
+        per_100g = np.nan_to_num(self.lookup_rows(rows))
+        return (np.asarray(quantities_grams, dtype=np.float32) / 100) @ per_100g
+
+
+_stores: dict[str, NutrientStore] = {}
+_lock = threading.Lock()
+
+
+def get_nutrient_store(store_dir: str = DEFAULT_NUTRIENT_STORE_DIR) -> NutrientStore:
+    """
+    Returns the process-wide NutrientStore, building it from the Ciqual CSV on first use if it is
+    missing or older than the CSV (see is_stale).
+
+    :param store_dir: Directory of the store
+    :return: The shared NutrientStore
+    """
+    with _lock:
+        if store_dir not in _stores:
+            if is_stale(store_dir):
+                print(f"Nutrient store in {store_dir} missing or out of date, building it from the Ciqual CSV")
+                build_nutrient_store(store_dir=store_dir)
+            _stores[store_dir] = NutrientStore(store_dir)
+        return _stores[store_dir]
+
+
+async def aget_nutrient_store(store_dir: str = DEFAULT_NUTRIENT_STORE_DIR) -> NutrientStore:
+    """
+    Async counterpart of get_nutrient_store: the first call loads (or builds) the store in a worker thread.
+
+    The async services await it before computing an intake, so the event loop never waits on the CSV.
+
+    :param store_dir: Directory of the store
+    :return: The shared NutrientStore
+    """
+    if store_dir in _stores:
+        return _stores[store_dir]
+    return await asyncio.to_thread(get_nutrient_store, store_dir)
+
+
+if __name__ == "__main__":
+    n_foods = build_nutrient_store()
+    print(f"Nutrient store written to {DEFAULT_NUTRIENT_STORE_DIR} ({n_foods} foods, {len(NUTRIENT_COLUMNS)} nutrients) 🥦")
@@ -0,0 +1,208 @@
+from datetime import date, datetime
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from travai.backend.database import SessionLocal
+from travai.backend.models import DailyIntake, Meal, ModifiedIngredient
+from travai.backend.nutrient_store import get_nutrient_store
+from travai.tracing import set_attributes, traced
+
+# daily_intake column -> Ciqual nutrient column (per 100 g)
+MACRO_COLUMNS = {
+    "proteins_g": "Protéines (g/100 g)",
+    "carbs_g": "Glucides (g/100 g)",
+    "fats_g": "Lipides (g/100 g)",
+    "sugars_g": "Sucres (g/100 g)",
+}
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def ingredients_intake(ingredient_names: list[str], quantities_grams: list[float], calculated_calories: list[float],
+                       alim_codes: list = None) -> dict:
+    """
+    Sums the calories and macros of a set of ingredients.
+
+    Calories are the stored calculated_calories, macros come from the Ciqual nutrient store, looked up
+    by alim_code (by name for ingredients saved without one); unmatched ingredients add no macros.
+
+    :return: A dict with the kcal and every MACRO_COLUMNS key
+    """
+    store = get_nutrient_store()
+    if alim_codes is None:
+        alim_codes = [None] * len(ingredient_names)
+    totals = store.totals(store.rows_for_foods(alim_codes, ingredient_names), quantities_grams)
+    intake = {column: float(totals[store.column(nutrient)]) for column, nutrient in MACRO_COLUMNS.items()}
+    intake["kcal"] = float(sum(kcal or 0 for kcal in calculated_calories))
+    return intake
+
+
+def _increment(session: Session, values: dict):
+    # INSERT ... ON CONFLICT DO UPDATE SET column = column + excluded.column
+    dialect = session.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise ValueError(f"The daily intake upsert is not supported on {dialect} databases (only {', '.join(UPSERT_INSERTS)})")
+    insert = UPSERT_INSERTS[dialect]
+    statement = insert(DailyIntake).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=["patient_id", "date"],
+        set_={
+            column: getattr(DailyIntake, column) + statement.excluded[column]
+            for column in ["meals", "kcal", *MACRO_COLUMNS]
+        },
+    )
+
+
+def add_to_daily_intake(session: Session, patient_id: int, day: date, sign: int = 1, meals: int = 0, **intake):
+    """
+    Adds (or, with sign=-1, removes) an intake to the day of a patient, within the caller's transaction.
+
+    :param session: Session of the transaction writing the meal or ingredients
+    :param patient_id: ID of the patient
+    :param day: Date of the meal
+    :param sign: 1 to add the intake, -1 to remove it
+    :param meals: Change of the number of meals of the day
+    :param intake: kcal and macros (see ingredients_intake)
+    """
+    values = {column: sign * intake.get(column, 0) for column in ["kcal", *MACRO_COLUMNS]}
+    values["meals"] = meals
+    if not any(values.values()):
+        return
+    session.execute(_increment(session, {"patient_id": patient_id, "date": day, **values}))
+    if meals < 0:
+        # The last meal of the day is gone: drop the day instead of keeping a row of zeros
+        session.query(DailyIntake).filter(
+            DailyIntake.patient_id == patient_id, DailyIntake.date == day, DailyIntake.meals <= 0,
+        ).delete(synchronize_session=False)
+
+
+def add_ingredients_to_daily_intake(session: Session, meal_id: int, ingredients: list, sign: int = 1):
+    """
+    Adds (or, with sign=-1, removes) modified ingredients of a meal to the daily intake of its patient.
+
+    :param session: Session of the transaction writing the ingredients
+    :param meal_id: ID of the meal the ingredients belong to
+    :param ingredients: Objects with ingredient_name, alim_code, quantity_grams and calculated_calories attributes
+    :param sign: 1 to add the ingredients, -1 to remove them
+    """
+    if not ingredients:
+        return
+    meal = session.query(Meal.patient_id, Meal.date_start).filter(Meal.meal_id == meal_id).first()
+    if meal is None:
+        return
+    intake = ingredients_intake(
+        [ingredient.ingredient_name for ingredient in ingredients],
+        [ingredient.quantity_grams for ingredient in ingredients],
+        [ingredient.calculated_calories for ingredient in ingredients],
+        [ingredient.alim_code for ingredient in ingredients],
+    )
+    add_to_daily_intake(session, meal.patient_id, meal.date_start.date(), sign=sign, **intake)
+
+
+def move_meal_in_daily_intake(session: Session, meal_id: int, old_date_start: datetime, new_date_start: datetime):
+    """
+    Moves the intake of a meal from its old day to its new one, within the caller's transaction.
+    """
+    if old_date_start.date() == new_date_start.date():
+        return
+    meal = session.query(Meal.patient_id).filter(Meal.meal_id == meal_id).first()
+    ingredients = session.query(ModifiedIngredient).filter(ModifiedIngredient.meal_id == meal_id).all()
+    intake = ingredients_intake(
+        [ingredient.ingredient_name for ingredient in ingredients],
+        [ingredient.quantity_grams for ingredient in ingredients],
+        [ingredient.calculated_calories for ingredient in ingredients],
+        [ingredient.alim_code for ingredient in ingredients],
+    )
+    add_to_daily_intake(session, meal.patient_id, old_date_start.date(), sign=-1, meals=-1, **intake)
+    add_to_daily_intake(session, meal.patient_id, new_date_start.date(), meals=1, **intake)
+
+
+@traced("db.get_daily_intake")
+def get_daily_intake(patient_id: int, start: date = None, end: date = None):
+    """
+    Retrieves the daily intake of a patient, one index range scan on (patient_id, date).
+
+    :param patient_id: The ID of the patient
+    :param start: (Optional) First day to include
+    :param end: (Optional) Last day to include
+    :return: A list of DailyIntake objects ordered by date, or an empty list if an error occurs
+    """
+    session = SessionLocal()
+    try:
+        query = session.query(DailyIntake).filter(DailyIntake.patient_id == patient_id)
+        if start is not None:
+            query = query.filter(DailyIntake.date >= start)
+        if end is not None:
+            query = query.filter(DailyIntake.date <= end)
+        days = query.order_by(DailyIntake.date).all()
+        set_attributes(rows=len(days))
+        return days
+    except Exception as e:
+        print(f"Error retrieving daily intake: {e}")
+        return []
+    finally:
+        session.close()
+
+
+def rebuild_daily_intake(patient_id: int = None):
+    """
+    Recomputes the daily intake from the meals and their modified ingredients.
+
+    :param patient_id: (Optional) Only rebuild the days of this patient
+    :return: The number of days written, or None if an error occurs
+    """
+    store = get_nutrient_store()
+    session = SessionLocal()
+    try:
+        meals = session.query(Meal.meal_id, Meal.patient_id, Meal.date_start)
+        ingredients = session.query(
+            Meal.patient_id, Meal.date_start, ModifiedIngredient.ingredient_name, ModifiedIngredient.alim_code,
+            ModifiedIngredient.quantity_grams, ModifiedIngredient.calculated_calories,
+        ).join(Meal, Meal.meal_id == ModifiedIngredient.meal_id)
+        deleted = session.query(DailyIntake)
+        if patient_id is not None:
+            meals = meals.filter(Meal.patient_id == patient_id)
+            ingredients = ingredients.filter(Meal.patient_id == patient_id)
+            deleted = deleted.filter(DailyIntake.patient_id == patient_id)
+        meals = meals.all()
+        ingredients = ingredients.all()
+
+        # One row per (patient, day) holding a meal
+        days = sorted({(meal.patient_id, meal.date_start.date()) for meal in meals})
+        position = {day: i for i, day in enumerate(days)}
+        meal_counts = np.bincount(
+            np.array([position[(meal.patient_id, meal.date_start.date())] for meal in meals], dtype=np.int64), minlength=len(days)
+        )
+
+        day_index = np.array([position[(row.patient_id, row.date_start.date())] for row in ingredients], dtype=np.int64)
+        rows = store.rows_for_foods([row.alim_code for row in ingredients], [row.ingredient_name for row in ingredients])
+        per_100g = np.nan_to_num(store.lookup_rows(rows)[:, [store.column(nutrient) for nutrient in MACRO_COLUMNS.values()]])
+        macros = np.zeros((len(days), len(MACRO_COLUMNS)), dtype=np.float64)
+        np.add.at(macros, day_index, per_100g * np.array([row.quantity_grams for row in ingredients], dtype=np.float32)[:, None] / 100)
+        kcal = np.bincount(
+            day_index, weights=np.array([row.calculated_calories or 0 for row in ingredients], dtype=np.float64), minlength=len(days)
+        )
+
+        deleted.delete(synchronize_session=False)
+        session.bulk_insert_mappings(DailyIntake, [
+            {
+                "patient_id": day_patient_id,
+                "date": day,
+                "meals": int(meal_counts[i]),
+                "kcal": float(kcal[i]),
+                **{column: float(macros[i, j]) for j, column in enumerate(MACRO_COLUMNS)},
+            }
+            for i, (day_patient_id, day) in enumerate(days)
+        ])
+        session.commit()
+        print(f"Daily intake rebuilt: {len(days)} days from {len(meals)} meals")
+        return len(days)
+    except Exception as e:
+        session.rollback()
+        print(f"Error rebuilding daily intake: {e}")
+        return None
+    finally:
+        session.close()
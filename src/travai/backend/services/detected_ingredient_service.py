@@ -1,8 +1,12 @@
 from sqlalchemy.orm import Session
 from travai.backend.database import SessionLocal
 from travai.backend.models import DetectedIngredient, Meal, Ingredient, ModifiedIngredient
+from travai.backend.services.daily_intake_service import add_ingredients_to_daily_intake
+from travai.backend.services.meal_service import add_to_meal_totals
+from travai.tracing import traced
 
-def create_detected_ingredient(meal_id: int, ingredient_name: str, quantity_grams: float, calculated_calories:float):
+@traced("db.create_detected_ingredient")
+def create_detected_ingredient(meal_id: int, ingredient_name: str, quantity_grams: float, calculated_calories:float, alim_code: int = None):
     """
     Creates a new detected ingredient and assigns it to a meal.
 
@@ -10,6 +14,7 @@ def create_detected_ingredient(meal_id: int, ingredient_name: str, quantity_gram
     :param ingredient_id: ID of the detected ingredient
     :param ingredient_name: Name of the detected ingredient
     :param quantity_grams: Quantity of the ingredient in grams
+    :param alim_code: (Optional) Code of the matched Ciqual food
     :return: The created DetectedIngredient object or None if an error occurs
     """
     session = SessionLocal()
@@ -28,10 +33,12 @@ def create_detected_ingredient(meal_id: int, ingredient_name: str, quantity_gram
             ingredient_name=ingredient_name,
             quantity_grams=quantity_grams,
             calculated_calories=calculated_calories,
+            alim_code=alim_code,
         )
 
         # Add the detected ingredient to the database
         session.add(new_detected_ingredient)
+        add_to_meal_totals(session, meal_id, detected_kcal=calculated_calories)
         session.commit()
         session.refresh(new_detected_ingredient)  # Refresh instance with DB values
 
@@ -108,6 +115,8 @@ def update_detected_ingredient(detected_ingredient_id: int, ingredient_name: str
         if quantity_grams is not None:
             detected_ingredient.quantity_grams = quantity_grams
         if calculated_calories is not None:
+            add_to_meal_totals(session, detected_ingredient.meal_id,
+                               detected_kcal=calculated_calories - (detected_ingredient.calculated_calories or 0))
             detected_ingredient.calculated_calories = calculated_calories
 
         session.commit()
@@ -139,8 +148,19 @@ def delete_detected_ingredient(detected_ingredient_id: int):
             print("Detected ingredient not found.")
             return False
 
+        # Remove its modified ingredients first, from the meal totals and the daily intake too
+        modified_ingredients = session.query(ModifiedIngredient).filter(ModifiedIngredient.detected_ingredient_id == detected_ingredient_id).all()
+        add_ingredients_to_daily_intake(session, detected_ingredient.meal_id, modified_ingredients, sign=-1)
+        for modified_ingredient in modified_ingredients:
+            session.delete(modified_ingredient)
+
         # Now delete the detected ingredient
         session.delete(detected_ingredient)
+        add_to_meal_totals(
+            session, detected_ingredient.meal_id,
+            detected_kcal=-(detected_ingredient.calculated_calories or 0),
+            modified_kcal=-sum(modified_ingredient.calculated_calories or 0 for modified_ingredient in modified_ingredients),
+        )
         session.commit()
 
         print(f"Detected ingredient deleted: {detected_ingredient.ingredient_name} (All associated modified ingredients removed)")
@@ -1,8 +1,36 @@
+from sqlalchemy import tuple_, update
 from sqlalchemy.orm import Session
 from travai.backend.database import SessionLocal
 from travai.backend.models import Meal, Patient, DetectedIngredient, ModifiedIngredient
+from travai.backend.services.daily_intake_service import (
+    add_ingredients_to_daily_intake, add_to_daily_intake, ingredients_intake, move_meal_in_daily_intake
+)
 from datetime import datetime
+from travai.tracing import set_attributes, traced
 
+def add_to_meal_totals(session: Session, meal_id: int, detected_kcal: float = 0, modified_kcal: float = 0):
+    """
+    Shifts the stored calorie totals of a meal, within the caller's transaction.
+
+    The increment is done by the database (total = total + delta), so concurrent writers do not
+    overwrite each other's changes.
+
+    :param session: Session of the transaction writing the ingredients
+    :param meal_id: ID of the meal
+    :param detected_kcal: Change of the detected ingredients calories
+    :param modified_kcal: Change of the modified ingredients calories
+    """
+    if not detected_kcal and not modified_kcal:
+        return
+    session.execute(
+        update(Meal).where(Meal.meal_id == meal_id).values(
+            total_detected_kcal=Meal.total_detected_kcal + (detected_kcal or 0),
+            total_modified_kcal=Meal.total_modified_kcal + (modified_kcal or 0),
+        )
+    )
+
+
+@traced("db.create_meal")
 def create_meal(patient_id: int, date_start: datetime, image_path: str, name: str):
     """
     Creates a new meal and assigns it to a patient.
@@ -32,6 +60,7 @@ def create_meal(patient_id: int, date_start: datetime, image_path: str, name: st
 
         # Add the meal to the database
         session.add(new_meal)
+        add_to_daily_intake(session, patient_id, date_start.date(), meals=1)
         session.commit()
         session.refresh(new_meal)  # Refresh instance with DB values
 
@@ -47,6 +76,96 @@ def create_meal(patient_id: int, date_start: datetime, image_path: str, name: st
         session.close()
 
 
+@traced("db.persist_meal_analysis")
+def persist_meal_analysis(patient_id: int, dish: str, ingredients: list[dict], image_path: str, date_start: datetime = None):
+    """
+    Saves an analyzed meal with all its detected ingredients, and their editable modified copies,
+    in a single transaction.
+
+    :param patient_id: ID of the patient who consumed the meal
+    :param dish: Name of the meal
+    :param ingredients: One dict per ingredient with keys ingredient_name, quantity_grams, calculated_calories
+        and (optionally) alim_code, the matched Ciqual food
+    :param image_path: Path to the image of the meal
+    :param date_start: (Optional) Date and time when the meal was consumed, defaults to now
+    :return: A dict with the meal_id and the lists of detected_ingredient_ids and modified_ingredient_ids
+        (in the order of ingredients), or None if an error occurs
+    """
+    session = SessionLocal()
+
+    try:
+        # Verify that the patient exists before creating the meal
+        patient = session.query(Patient).filter(Patient.patient_id == patient_id).first()
+        if not patient:
+            print("Patient ID does not exist.")
+            return None
+
+        # The modified ingredients start as copies of the detected ones
+        total_kcal = sum(ingredient.get("calculated_calories") or 0 for ingredient in ingredients)
+        new_meal = Meal(
+            patient_id=patient_id,
+            date_start=date_start or datetime.now(),
+            image_path=image_path,
+            name=dish,
+            total_detected_kcal=total_kcal,
+            total_modified_kcal=total_kcal,
+        )
+        session.add(new_meal)
+        session.flush()  # Assigns meal_id
+
+        detected = [
+            DetectedIngredient(
+                meal_id=new_meal.meal_id,
+                ingredient_name=ingredient["ingredient_name"],
+                alim_code=ingredient.get("alim_code"),
+                quantity_grams=ingredient["quantity_grams"],
+                calculated_calories=ingredient.get("calculated_calories", 0),
+            )
+            for ingredient in ingredients
+        ]
+        session.add_all(detected)
+        session.flush()  # Assigns the detected_ingredient_ids (one INSERT per row on SQLite, same transaction)
+
+        modified = [
+            ModifiedIngredient(
+                meal_id=new_meal.meal_id,
+                detected_ingredient_id=detected_ingredient.detected_ingredient_id,
+                ingredient_name=detected_ingredient.ingredient_name,
+                alim_code=detected_ingredient.alim_code,
+                quantity_grams=detected_ingredient.quantity_grams,
+                calculated_calories=detected_ingredient.calculated_calories,
+            )
+            for detected_ingredient in detected
+        ]
+        session.add_all(modified)
+        session.flush()
+        add_to_daily_intake(session, patient_id, new_meal.date_start.date(), meals=1, **ingredients_intake(
+            [row.ingredient_name for row in modified],
+            [row.quantity_grams for row in modified],
+            [row.calculated_calories for row in modified],
+            [row.alim_code for row in modified],
+        ))
+
+        ids = {
+            "meal_id": new_meal.meal_id,
+            "detected_ingredient_ids": [row.detected_ingredient_id for row in detected],
+            "modified_ingredient_ids": [row.modified_ingredient_id for row in modified],
+        }
+        session.commit()
+        set_attributes(rows=1 + len(detected) + len(modified))
+
+        print(f"Meal created: {dish} for Patient ID {patient_id} with {len(detected)} ingredients")
+        return ids
+
+    except Exception as e:
+        session.rollback()
+        print(f"Error while saving the meal analysis: {e}")
+        return None
+
+    finally:
+        session.close()
+
+
 def get_meal_by_id(meal_id: int):
     """
     Retrieves a meal from the database using its ID.
@@ -67,6 +186,7 @@ def get_meal_by_id(meal_id: int):
         session.close()
 
 
+@traced("db.get_meals_by_patient")
 def get_meals_by_patient(patient_id: int):
     """
     Retrieves all meals associated with a specific patient.
@@ -77,6 +197,7 @@ def get_meals_by_patient(patient_id: int):
     session = SessionLocal()
     try:
         meals = session.query(Meal).filter(Meal.patient_id == patient_id).all()
+        set_attributes(rows=len(meals))
         print(f"{len(meals)} meals found for Patient ID {patient_id}")
         return meals
     except Exception as e:
@@ -86,6 +207,100 @@ def get_meals_by_patient(patient_id: int):
         session.close()
 
 
+@traced("db.get_meal_calorie_totals")
+def get_meal_calorie_totals(patient_id: int, start: datetime = None, end: datetime = None, limit: int = None):
+    """
+    Retrieves the meals of a patient with their detected and modified calorie totals, in a single query.
+
+    :param patient_id: The ID of the patient whose meals are to be retrieved
+    :param start: (Optional) Only keep meals consumed at or after this date
+    :param end: (Optional) Only keep meals consumed before this date
+    :param limit: (Optional) Only keep the most recent meals
+    :return: A list of rows (meal_id, date_start, name, image_path, total_detected_kcal, total_modified_kcal)
+        ordered by date, or an empty list if an error occurs
+    """
+    session = SessionLocal()
+    try:
+        # The totals are stored on the meal, no ingredient row is read
+        query = session.query(
+            Meal.meal_id,
+            Meal.date_start,
+            Meal.name,
+            Meal.image_path,
+            Meal.total_detected_kcal,
+            Meal.total_modified_kcal,
+        ).filter(Meal.patient_id == patient_id)
+        if start is not None:
+            query = query.filter(Meal.date_start >= start)
+        if end is not None:
+            query = query.filter(Meal.date_start < end)
+
+        rows = query.order_by(Meal.date_start.desc(), Meal.meal_id.desc()).limit(limit).all()
+        rows.reverse()
+        set_attributes(rows=len(rows))
+        return rows
+    except Exception as e:
+        print(f"Error retrieving meal calorie totals: {e}")
+        return []
+    finally:
+        session.close()
+
+
+def _encode_cursor(date_start: datetime, meal_id: int) -> str:
+    return f"{date_start.isoformat()}/{meal_id}"
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    date_start, meal_id = cursor.rsplit("/", 1)
+    return datetime.fromisoformat(date_start), int(meal_id)
+
+
+@traced("db.list_meals")
+def list_meals(patient_id: int, start: datetime = None, end: datetime = None, after_cursor: str = None, limit: int = 20):
+    """
+    Retrieves one page of the meals of a patient, most recent first.
+
+    Pages are cut on (date_start, meal_id), so a page costs one index range scan of
+    ix_meals_patient_id_date_start_meal_id however far back it is, and meals added in the
+    meantime do not shift the following pages.
+
+    :param patient_id: The ID of the patient whose meals are to be retrieved
+    :param start: (Optional) Only keep meals consumed at or after this date
+    :param end: (Optional) Only keep meals consumed before this date
+    :param after_cursor: (Optional) The next_cursor of the previous page
+    :param limit: Number of meals per page
+    :return: A tuple (rows, next_cursor); rows are (meal_id, date_start, name, image_path, total_detected_kcal,
+        total_modified_kcal), next_cursor is None on the last page. ([], None) if an error occurs
+    """
+    session = SessionLocal()
+    try:
+        query = session.query(
+            Meal.meal_id,
+            Meal.date_start,
+            Meal.name,
+            Meal.image_path,
+            Meal.total_detected_kcal,
+            Meal.total_modified_kcal,
+        ).filter(Meal.patient_id == patient_id)
+        if start is not None:
+            query = query.filter(Meal.date_start >= start)
+        if end is not None:
+            query = query.filter(Meal.date_start < end)
+        if after_cursor is not None:
+            query = query.filter(tuple_(Meal.date_start, Meal.meal_id) < _decode_cursor(after_cursor))
+
+        # One extra row tells whether another page follows
+        rows = query.order_by(Meal.date_start.desc(), Meal.meal_id.desc()).limit(limit + 1).all()
+        next_cursor = _encode_cursor(rows[limit - 1].date_start, rows[limit - 1].meal_id) if len(rows) > limit else None
+        set_attributes(rows=min(len(rows), limit))
+        return rows[:limit], next_cursor
+    except Exception as e:
+        print(f"Error listing meals: {e}")
+        return [], None
+    finally:
+        session.close()
+
+
 def update_meal(meal_id: int, date_start: datetime = None, image_path: str = None, name: str = None):
     """
     Updates meal details in the database.
@@ -105,6 +320,7 @@ def update_meal(meal_id: int, date_start: datetime = None, image_path: str = Non
 
         # Update fields if new values are provided
         if date_start:
+            move_meal_in_daily_intake(session, meal_id, meal.date_start, date_start)
             meal.date_start = date_start
         if image_path:
             meal.image_path = image_path
@@ -140,6 +356,11 @@ def delete_meal(meal_id: int):
             print("Meal not found.")
             return False
 
+        # Remove the meal and its modified ingredients from the daily intake
+        modified_ingredients = session.query(ModifiedIngredient).filter(ModifiedIngredient.meal_id == meal_id).all()
+        add_ingredients_to_daily_intake(session, meal_id, modified_ingredients, sign=-1)
+        add_to_daily_intake(session, meal.patient_id, meal.date_start.date(), meals=-1)
+
         # Delete all detected ingredients linked to this meal
         session.query(DetectedIngredient).filter(DetectedIngredient.meal_id == meal_id).delete()
         # Delete all modified ingredients linked to this meal
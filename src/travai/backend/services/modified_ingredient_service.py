@@ -1,13 +1,18 @@
 from sqlalchemy.orm import Session
 from travai.backend.database import SessionLocal
 from travai.backend.models import ModifiedIngredient, DetectedIngredient
+from travai.backend.services.daily_intake_service import add_ingredients_to_daily_intake
+from travai.backend.services.meal_service import add_to_meal_totals
+from travai.tracing import traced
 
-def create_modified_ingredient(detected_ingredient_id: int, meal_id: int, ingredient_name:str, quantity_grams: float, calculated_calories: float):
+@traced("db.create_modified_ingredient")
+def create_modified_ingredient(detected_ingredient_id: int, meal_id: int, ingredient_name:str, quantity_grams: float, calculated_calories: float, alim_code: int = None):
     """
     Creates a new modified ingredient and associates it with a detected ingredient.
 
     :param detected_ingredient_id: ID of the detected ingredient being modified
     :param quantity_grams: Updated quantity of the ingredient in grams
+    :param alim_code: (Optional) Code of the matched Ciqual food, defaults to the one of the detected ingredient
     :return: The created ModifiedIngredient object or None if an error occurs
     """
     session = SessionLocal()
@@ -25,11 +30,14 @@ def create_modified_ingredient(detected_ingredient_id: int, meal_id: int, ingred
             meal_id=meal_id,
             ingredient_name=ingredient_name,
             quantity_grams=quantity_grams,
-            calculated_calories=calculated_calories
+            calculated_calories=calculated_calories,
+            alim_code=alim_code if alim_code is not None else detected_ingredient.alim_code
         )
 
         # Add the modified ingredient to the database
         session.add(new_modified_ingredient)
+        add_to_meal_totals(session, meal_id, modified_kcal=calculated_calories)
+        add_ingredients_to_daily_intake(session, meal_id, [new_modified_ingredient])
         session.commit()
         session.refresh(new_modified_ingredient)  # Refresh instance with DB values
 
@@ -102,6 +110,7 @@ def get_modified_ingredients_by_meal_id(meal_id: int):
         session.close()
 
 
+@traced("db.update_modified_ingredient")
 def update_modified_ingredient(modified_ingredient_id: int, ingredient_name:str = None, quantity_grams: float = None, calculated_calories: float = None):
     """
     Updates details of a modified ingredient in the database.
@@ -117,13 +126,19 @@ def update_modified_ingredient(modified_ingredient_id: int, ingredient_name:str
             print("Modified ingredient not found.")
             return None
 
+        # The daily intake gets the old values removed and the new ones added
+        add_ingredients_to_daily_intake(session, modified_ingredient.meal_id, [modified_ingredient], sign=-1)
+
         # Update fields if new values are provided
         if quantity_grams is not None:
             modified_ingredient.quantity_grams = quantity_grams
         if calculated_calories is not None:
+            add_to_meal_totals(session, modified_ingredient.meal_id,
+                               modified_kcal=calculated_calories - (modified_ingredient.calculated_calories or 0))
             modified_ingredient.calculated_calories = calculated_calories
         if ingredient_name:
             modified_ingredient.ingredient_name = ingredient_name
+        add_ingredients_to_daily_intake(session, modified_ingredient.meal_id, [modified_ingredient])
 
         session.commit()
         session.refresh(modified_ingredient)
@@ -154,6 +169,8 @@ def delete_modified_ingredient(modified_ingredient_id: int):
             return False
 
         session.delete(modified_ingredient)
+        add_to_meal_totals(session, modified_ingredient.meal_id, modified_kcal=-(modified_ingredient.calculated_calories or 0))
+        add_ingredients_to_daily_intake(session, modified_ingredient.meal_id, [modified_ingredient], sign=-1)
         session.commit()
 
         print(f"Modified ingredient deleted (ID: {modified_ingredient.modified_ingredient_id})")
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+from travai.backend.database import SessionLocal
+from travai.backend.models import DetectedIngredient, ModifiedIngredient
+from travai.backend.nutrient_store import get_nutrient_store
+from travai.tracing import set_attributes, traced
+
+ENERGY_COLUMN = "Energie (kcal/100 g)"
+
+
+def nutrient_totals(meal_index: np.ndarray, food_names: list[str], quantities_grams: np.ndarray, n_meals: int,
+                    fallback_calories: np.ndarray = None, alim_codes: list = None) -> np.ndarray:
+    """
+    Sums the nutrients of many meals with a single (meals x foods) @ (foods x nutrients) product.
+
+    :param meal_index: For every ingredient row, the position of its meal in [0, n_meals)
+    :param food_names: For every ingredient row, its Ciqual name (alim_nom_en)
+    :param quantities_grams: For every ingredient row, the quantity eaten in grams
+    :param n_meals: Number of meals
+    :param fallback_calories: (Optional) For every ingredient row, the kcal to use when the food is not in Ciqual
+    :param alim_codes: (Optional) For every ingredient row, its Ciqual code, None to match it by name
+    :return: A float32 array of shape (n_meals, n_nutrients)
+    """
+    store = get_nutrient_store()
+    meal_index = np.asarray(meal_index, dtype=np.int64)
+    quantities_grams = np.asarray(quantities_grams, dtype=np.float32)
+    rows = store.rows_for_names(food_names) if alim_codes is None else store.rows_for_foods(alim_codes, food_names)
+
+    # Only the foods that actually appear are kept as matrix columns
+    known = rows >= 0
+    foods, food_index = np.unique(rows[known], return_inverse=True)
+    quantity_matrix = np.zeros((n_meals, len(foods)), dtype=np.float32)
+    np.add.at(quantity_matrix, (meal_index[known], food_index), quantities_grams[known] / 100)
+    totals = quantity_matrix @ np.nan_to_num(store.values[foods])
+
+    if fallback_calories is not None and (~known).any():
+        energy = store.column(ENERGY_COLUMN)
+        np.add.at(totals[:, energy], meal_index[~known], np.nan_to_num(np.asarray(fallback_calories, dtype=np.float32)[~known]))
+    return totals
+
+
+@traced("db.compute_meal_nutrients")
+def compute_meal_nutrients(meal_ids: list[int], source: str = "modified"):
+    """
+    Computes every Ciqual nutrient for a set of meals, from their detected or modified ingredients.
+
+    Ingredients are matched to Ciqual by their stored alim_code (by name for rows saved without one);
+    unmatched ingredients only contribute their stored calculated calories.
+
+    :param meal_ids: IDs of the meals
+    :param source: "detected" for the model output, "modified" for the user-corrected ingredients
+    :return: A DataFrame indexed by meal_id with one column per nutrient, or None if an error occurs
+    """
+    model = {"detected": DetectedIngredient, "modified": ModifiedIngredient}[source]
+    store = get_nutrient_store()
+    session = SessionLocal()
+    try:
+        rows = session.query(
+            model.meal_id, model.ingredient_name, model.alim_code, model.quantity_grams, model.calculated_calories
+        ).filter(model.meal_id.in_(meal_ids)).all()
+        set_attributes(meals=len(meal_ids), rows=len(rows))
+
+        position = {meal_id: i for i, meal_id in enumerate(meal_ids)}
+        totals = nutrient_totals(
+            meal_index=np.array([position[row.meal_id] for row in rows], dtype=np.int64),
+            food_names=[row.ingredient_name for row in rows],
+            quantities_grams=np.array([row.quantity_grams for row in rows], dtype=np.float32),
+            n_meals=len(meal_ids),
+            fallback_calories=np.array([row.calculated_calories or 0 for row in rows], dtype=np.float32),
+            alim_codes=[row.alim_code for row in rows],
+        )
+        return pd.DataFrame(totals, index=pd.Index(meal_ids, name="meal_id"), columns=store.columns)
+    except Exception as e:
+        print(f"Error computing meal nutrients: {e}")
+        return None
+    finally:
+        session.close()
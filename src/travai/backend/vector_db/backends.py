@@ -0,0 +1,200 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+
+import chromadb
+import numpy as np
+
+COLLECTION_NAME = "food_embeddings"
+# Chroma defaults to squared L2; cosine distances are comparable with the NumPy backend ones
+COLLECTION_METADATA = {"hnsw:space": "cosine"}
+DEFAULT_NUMPY_INDEX_DIR = os.getenv("TRAVAI_NUMPY_INDEX_DIR", "./numpy_index")
+
+
+@dataclass
+class FoodHit:
+    """
+    A single retrieval candidate.
+
+    Attributes:
+        alim_code (int): Ciqual food code.
+        name (str): English Ciqual name (alim_nom_en).
+        calories (str | float): Energy in kcal/100g, as stored in the index metadata.
+        distance (float): Distance to the query (lower is closer).
+    """
+    alim_code: int
+    name: str
+    calories: str | float
+    distance: float
+
+
+class RetrievalBackend(ABC):
+    """
+    Interface of the food retrieval backends used by query_food.
+
+    Every backend returns cosine distances (1 - cosine similarity), so distances and thresholds
+    do not depend on the backend.
+    """
+    name = "base"
+
+    @abstractmethod
+    def search(self, query_embeddings: np.ndarray, k: int = 5) -> list[list[FoodHit]]:
+        """
+        Finds the k closest Ciqual foods of every query embedding.
+
+        :param query_embeddings: Array of shape (n_queries, dim)
+        :param k: Number of candidates per query
+        :return: One list of FoodHit per query, closest first
+        """
+
+
+class ChromaBackend(RetrievalBackend):
+    """
+    Approximate search through the persistent Chroma collection (HNSW, cosine distance).
+
+    Collections created before the cosine space was set use squared L2: their distances are
+    recomputed as cosine distances from the returned embeddings.
+    """
+    name = "chroma"
+
+    def __init__(self, client: chromadb.PersistentClient, collection_name: str = COLLECTION_NAME):
+        self.collection = client.get_or_create_collection(collection_name, metadata=COLLECTION_METADATA)
+        self.cosine = (self.collection.metadata or {}).get("hnsw:space") == "cosine"
+
+    def search(self, query_embeddings: np.ndarray, k: int = 5) -> list[list[FoodHit]]:
+        if len(query_embeddings) == 0:
+            return []
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        results = self.collection.query(
+            query_embeddings=queries.tolist(),
+            n_results=k,
+            include=["metadatas", "distances"] if self.cosine else ["metadatas", "embeddings"],
+        )
+        if self.cosine:
+            query_distances = results["distances"]
+        else:
+            query_distances = [_cosine_distances(query, embeddings) for query, embeddings in zip(queries, results["embeddings"])]
+        hits = [
+            [
+                FoodHit(
+                    alim_code=meta["alim_code"],
+                    name=meta["alim_nom_en"],
+                    calories=meta["Energie_kcal_100g"],
+                    distance=float(distance),
+                )
+                for meta, distance in zip(metadatas, distances)
+            ]
+            for metadatas, distances in zip(results["metadatas"], query_distances)
+        ]
+        # The L2 order of unnormalized embeddings may differ from the cosine one
+        return hits if self.cosine else [sorted(row, key=lambda hit: hit.distance) for row in hits]
+
+
+def _cosine_distances(query: np.ndarray, embeddings) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, len(query))
+    norms = np.maximum(np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query), 1e-12)
+    return 1.0 - embeddings @ query / norms
+
+
+class NumpyBackend(RetrievalBackend):
+    """
+    Exact cosine search over a memory-mapped, L2-normalized (n_foods, dim) float32 matrix.
+
+    For the ~2.8k Ciqual rows one matrix product and an argpartition are cheaper than
+    opening Chroma, and the result is exact.
+    """
+    name = "numpy"
+
+    def __init__(self, index_dir: str = DEFAULT_NUMPY_INDEX_DIR):
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        with open(os.path.join(index_dir, "metadata.json"), encoding="utf-8") as f:
+            self.metadatas = json.load(f)
+
+    def search(self, query_embeddings: np.ndarray, k: int = 5) -> list[list[FoodHit]]:
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        if len(queries) == 0:
+            return []
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = queries @ self.embeddings.T
+
+        k = min(k, scores.shape[1])
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        return [
+            [
+                FoodHit(
+                    alim_code=self.metadatas[i]["alim_code"],
+                    name=self.metadatas[i]["alim_nom_en"],
+                    calories=self.metadatas[i]["Energie_kcal_100g"],
+                    distance=float(1.0 - score),
+                )
+                for i, score in zip(row, row_scores)
+            ]
+            for row, row_scores in zip(top, top_scores)
+        ]
+
+
+def build_numpy_index(embeddings: np.ndarray, metadatas: list[dict], index_dir: str = DEFAULT_NUMPY_INDEX_DIR) -> None:
+    """
+    Writes the files read by NumpyBackend.
+
+    :param embeddings: Array of shape (n_foods, dim); rows are normalized before saving
+    :param metadatas: One metadata dict per row (alim_code, alim_nom_en, Energie_kcal_100g, ...)
+    :param index_dir: Directory to write embeddings.npy and metadata.json to
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "embeddings.npy"), embeddings)
+    with open(os.path.join(index_dir, "metadata.json"), "w", encoding="utf-8") as f:
+        json.dump(metadatas, f, ensure_ascii=False)
+
+
+def export_numpy_index(client: chromadb.PersistentClient, index_dir: str = DEFAULT_NUMPY_INDEX_DIR,
+                       collection_name: str = COLLECTION_NAME) -> int:
+    """
+    Dumps the Chroma collection into a NumPy index, so both backends serve the same data.
+
+    :param client: Chroma client holding the collection
+    :param index_dir: Directory to write the NumPy index to
+    :param collection_name: Name of the collection to export
+    :return: The number of exported rows
+    """
+    collection = client.get_or_create_collection(collection_name, metadata=COLLECTION_METADATA)
+    data = collection.get(include=["embeddings", "metadatas"])
+    build_numpy_index(data["embeddings"], data["metadatas"], index_dir=index_dir)
+    return len(data["metadatas"])
+
+
+_numpy_backends: dict[str, NumpyBackend] = {}
+_lock = threading.Lock()
+
+
+def get_backend(client: chromadb.PersistentClient = None, name: str = None,
+                index_dir: str = DEFAULT_NUMPY_INDEX_DIR) -> RetrievalBackend:
+    """
+    Returns the retrieval backend selected by name or by $TRAVAI_RETRIEVAL_BACKEND ("chroma" by default).
+
+    :param client: Chroma client, required for the "chroma" backend
+    :param name: "chroma" or "numpy"
+    :param index_dir: Directory of the NumPy index, for the "numpy" backend
+    :return: A RetrievalBackend instance
+    """
+    name = name or os.getenv("TRAVAI_RETRIEVAL_BACKEND", "chroma")
+    if name == "chroma":
+        if client is None:
+            raise ValueError("The chroma backend needs a chromadb client.")
+        return ChromaBackend(client)
+    if name == "numpy":
+        # The matrix is memory-mapped once and shared by every session of the process
+        with _lock:
+            if index_dir not in _numpy_backends:
+                _numpy_backends[index_dir] = NumpyBackend(index_dir)
+            return _numpy_backends[index_dir]
+    raise ValueError(f"Unknown retrieval backend: {name}")
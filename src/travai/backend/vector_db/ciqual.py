@@ -0,0 +1,61 @@
+import os
+
+import pandas as pd
+
+CIQUAL_CSV_PATH = os.path.join(os.path.dirname(__file__), "Table-Ciqual-2020_processed_final.csv")
+
+
+def load_ciqual(path: str = CIQUAL_CSV_PATH) -> pd.DataFrame:
+    """
+    Loads the processed Ciqual table, with one row per alim_code.
+
+    The raw table lists a few foods twice (e.g. "Wheat bran" in two sub-groups, once without
+    nutrient values); the last, complete row is kept.
+
+    :param path: Path to the processed Ciqual CSV
+    :return: The Ciqual DataFrame
+    """
+    food_dataset = pd.read_csv(path, index_col=0)
+    return food_dataset.drop_duplicates(subset="alim_code", keep="last").reset_index(drop=True)
+
+
+NUTRIENT_COLUMNS = [
+    "Energie (kcal/100 g)",
+    "Eau (g/100 g)",
+    "Protéines (g/100 g)",
+    "Glucides (g/100 g)",
+    "Lipides (g/100 g)",
+    "Sucres (g/100 g)",
+    "Cholestérol (mg/100 g)",
+    "Sel chlorure de sodium (g/100 g)",
+    "Calcium (mg/100 g)",
+    "Fer (mg/100 g)",
+    "Magnésium (mg/100 g)",
+    "Vitamine D (µg/100 g)",
+    "Vitamine C (mg/100 g)",
+    "Vitamine B9 ou Folates totaux (µg/100 g)",
+    "Vitamine B12 (µg/100 g)",
+]
+
+
+def parse_nutrient_value(value) -> float:
+    """
+    Parses a Ciqual nutrient cell ("205", "70,3", "< 0,5", "traces", "-") into a float.
+
+    "traces" and "< x" bounds are read as 0 and x; missing values ("-", empty) become NaN.
+
+    :param value: Raw cell value
+    :return: The parsed value, or NaN when missing
+    """
+    if value is None:
+        return float("nan")
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().lower().replace(",", ".").lstrip("<").strip()
+    if text == "traces":
+        return 0.0
+    try:
+        return float(text)
+    except ValueError:
+        return float("nan")
+
@@ -0,0 +1,213 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from travai.backend.vector_db.embedding_model import DEFAULT_MODEL_NAME, get_model
+from travai.tracing import span
+
+DEFAULT_CACHE_PATH = os.getenv("TRAVAI_EMBEDDING_CACHE_PATH", "./embedding_cache.sqlite3")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes a food name into a cache key (lowercase, collapsed whitespace).
+
+    The embedding model is uncased, so two strings with the same key always embed identically.
+
+    :param text: Raw food name
+    :return: The normalized text
+    """
+    return " ".join(text.lower().split())
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: a bounded in-memory LRU in front of a SQLite store on disk.
+
+    Entries are keyed by (model_name, normalized text), so caches of several models can share
+    one file without seeing (or dropping) each other's vectors.
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, path: str | None = DEFAULT_CACHE_PATH,
+                 max_memory_items: int = 10_000, max_disk_items: int = 200_000):
+        """
+        :param model_name: Name of the model whose embeddings are cached
+        :param path: SQLite file for the persistent tier, or None for memory only
+        :param max_memory_items: Capacity of the in-memory LRU
+        :param max_disk_items: Capacity of the on-disk store; oldest entries are evicted first
+        """
+        self.model_name = model_name
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._init_disk()
+
+    def _init_disk(self) -> None:
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model_name TEXT NOT NULL, text TEXT NOT NULL, vector BLOB NOT NULL, "
+                "last_used REAL NOT NULL, PRIMARY KEY (model_name, text))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)")
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: list[str]) -> dict[str, np.ndarray]:
+        """
+        Looks up the embeddings of several normalized texts.
+
+        :param texts: Normalized texts to look up
+        :return: A dict mapping each cached text to its vector; missing texts are absent
+        """
+        found = {}
+        with self._lock:
+            pending = []
+            disk_found = 0
+            for key in dict.fromkeys(texts):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+                    self.memory_hits += 1
+                else:
+                    pending.append(key)
+
+            if pending and self._conn is not None:
+                placeholders = ",".join("?" * len(pending))
+                rows = self._conn.execute(
+                    f"SELECT text, vector FROM embeddings WHERE model_name = ? AND text IN ({placeholders})",
+                    (self.model_name, *pending),
+                ).fetchall()
+                if rows:
+                    with self._conn:
+                        self._conn.executemany(
+                            "UPDATE embeddings SET last_used = ? WHERE model_name = ? AND text = ?",
+                            [(time.time(), self.model_name, text) for text, _ in rows],
+                        )
+                for text, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    self._remember(text, vector)
+                    found[text] = vector
+                disk_found = len(rows)
+                self.disk_hits += disk_found
+
+            self.misses += len(pending) - disk_found
+        return found
+
+    def put_many(self, vectors: dict[str, np.ndarray]) -> None:
+        """
+        Stores embeddings in both tiers, evicting the least recently used entries when full.
+
+        :param vectors: A dict mapping normalized texts to their vectors
+        """
+        with self._lock:
+            for key, vector in vectors.items():
+                self._remember(key, np.asarray(vector, dtype=np.float32))
+            if self._conn is None:
+                return
+            now = time.time()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model_name, text, vector, last_used) VALUES (?, ?, ?, ?)",
+                    [
+                        (self.model_name, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                        for key, vector in vectors.items()
+                    ],
+                )
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE rowid IN ("
+                    "SELECT rowid FROM embeddings ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_items,),
+                )
+
+    def clear(self) -> None:
+        """
+        Drops every cached embedding of this model from both tiers and resets the counters.
+        """
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.disk_hits = self.misses = 0
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM embeddings WHERE model_name = ?", (self.model_name,))
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and tier sizes.
+
+        :return: A dict with memory_hits, disk_hits, misses, hit_rate and memory_items
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "model_name": self.model_name,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+
+_caches: dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(model_name: str = DEFAULT_MODEL_NAME) -> EmbeddingCache:
+    """
+    Returns the process-wide EmbeddingCache for model_name.
+
+    :param model_name: Name of the embedding model
+    :return: The shared EmbeddingCache instance
+    """
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name=model_name)
+        return _caches[model_name]
+
+
+def encode_with_cache(texts: list[str], model: SentenceTransformer = None, cache: EmbeddingCache = None) -> np.ndarray:
+    """
+    Embeds texts, encoding only the cache misses, in a single batch.
+
+    :param texts: Food names to embed
+    :param model: Model to encode misses with (defaults to the shared model of the cache)
+    :param cache: Cache to use (defaults to the shared cache of the default model)
+    :return: A float32 array of shape (len(texts), dim), in the order of texts
+    """
+    cache = cache or get_cache()
+    keys = [normalize_text(text) for text in texts]
+    with span("embedding.cache_lookup", texts=len(keys)) as lookup_span:
+        found = cache.get_many(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if lookup_span is not None:
+            lookup_span.set(misses=len(missing))
+    if missing:
+        with span("embedding.encode", texts=len(missing)):
+            model = model or get_model(cache.model_name)
+            encoded = np.asarray(model.encode(missing), dtype=np.float32)
+        new_vectors = dict(zip(missing, encoded))
+        cache.put_many(new_vectors)
+        found.update(new_vectors)
+
+    if not keys:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack([found[key] for key in keys])
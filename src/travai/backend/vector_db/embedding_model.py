@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+from sentence_transformers import SentenceTransformer
+
+from travai.tracing import span
+
+DEFAULT_MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+
+
+@dataclass
+class ModelLoadMetrics:
+    """
+    Load-time figures recorded the first time a model is requested in this process.
+
+    Attributes:
+        model_name (str): Name of the SentenceTransformer checkpoint.
+        device (str): Device the model was placed on.
+        num_threads (int | None): Torch intra-op thread count applied before loading.
+        load_seconds (float): Time spent building the model.
+        warmup_seconds (float): Time spent on the first (warmup) encode call.
+        parameter_bytes (int): Memory held by the model weights.
+        rss_delta_bytes (int | None): Growth of the process peak RSS during loading, if available.
+    """
+    model_name: str
+    device: str
+    num_threads: int | None
+    load_seconds: float
+    warmup_seconds: float
+    parameter_bytes: int
+    rss_delta_bytes: int | None
+
+
+_models: dict[tuple[str, str], SentenceTransformer] = {}
+_metrics: dict[tuple[str, str], ModelLoadMetrics] = {}
+_lock = threading.Lock()
+
+
+def _peak_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:  # Not available on Windows
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _default_device() -> str:
+    return os.getenv("TRAVAI_EMBEDDING_DEVICE", "cpu")
+
+
+def _default_num_threads() -> int | None:
+    value = os.getenv("TRAVAI_EMBEDDING_THREADS")
+    return int(value) if value else None
+
+
+def get_model(model_name: str = DEFAULT_MODEL_NAME, device: str = None, num_threads: int = None) -> SentenceTransformer:
+    """
+    Returns the process-wide SentenceTransformer instance for model_name, loading it on first use.
+
+    The first call loads the model, applies the device/thread settings and runs a warmup
+    encode so the first real query does not pay for lazy initialisation. Later calls, from
+    any thread, return the same instance.
+
+    :param model_name: SentenceTransformer checkpoint to load
+    :param device: Device to place the model on (defaults to $TRAVAI_EMBEDDING_DEVICE or "cpu")
+    :param num_threads: Torch intra-op threads (defaults to $TRAVAI_EMBEDDING_THREADS, else torch default)
+    :return: The shared SentenceTransformer instance
+    """
+    device = device or _default_device()
+    key = (model_name, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        # Another thread may have finished loading while we were waiting for the lock
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        num_threads = num_threads or _default_num_threads()
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+
+        with span("embedding.model_load", model=model_name, device=device):
+            rss_before = _peak_rss_bytes()
+            start = time.perf_counter()
+            model = SentenceTransformer(model_name, device=device)
+            load_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            model.encode(["warmup"])
+            warmup_seconds = time.perf_counter() - start
+            rss_after = _peak_rss_bytes()
+
+        metrics = ModelLoadMetrics(
+            model_name=model_name,
+            device=device,
+            num_threads=num_threads,
+            load_seconds=load_seconds,
+            warmup_seconds=warmup_seconds,
+            parameter_bytes=sum(p.numel() * p.element_size() for p in model.parameters()),
+            rss_delta_bytes=None if rss_before is None else rss_after - rss_before,
+        )
+        print(
+            f"Embedding model loaded: {model_name} on {device} "
+            f"in {load_seconds:.2f}s (warmup {warmup_seconds:.2f}s, "
+            f"{metrics.parameter_bytes / 1e6:.1f} MB of weights)"
+        )
+        _metrics[key] = metrics
+        _models[key] = model
+        return model
+
+
+def get_model_metrics() -> list[ModelLoadMetrics]:
+    """
+    Returns the load metrics of every model loaded so far in this process.
+
+    :return: A list of ModelLoadMetrics, one per (model, device) pair
+    """
+    return list(_metrics.values())
@@ -0,0 +1,133 @@
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+
+from travai.backend.vector_db.backends import FoodHit
+from travai.backend.vector_db.ciqual import load_ciqual, parse_nutrient_value
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def _singularize(token: str) -> str:
+    if len(token) <= 3:
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith(("oes", "ches", "shes", "sses", "xes", "zes")):
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def normalize_food_name(name: str) -> str:
+    """
+    Normalizes a food name so that trivially different spellings share one key.
+
+    Accents, case and punctuation are dropped, plurals are reduced to singular and tokens are
+    sorted, so "Carrots, raw", "raw carrot" and "Carrot (raw)" all map to "carrot raw".
+
+    :param name: Raw food name
+    :return: The normalized name
+    """
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii")
+    tokens = _NON_ALNUM.sub(" ", ascii_name.lower()).split()
+    return " ".join(sorted(_singularize(token) for token in tokens))
+
+
+def _has_energy(hit: FoodHit) -> bool:
+    return not math.isnan(parse_nutrient_value(hit.calories))
+
+
+def _trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Hash index of normalized Ciqual names, with an optional trigram index for near-exact matches.
+    """
+
+    def __init__(self, hits: list[FoodHit], use_trigrams: bool = False, trigram_threshold: float = 0.85):
+        """
+        :param hits: One FoodHit per Ciqual row (distance is ignored)
+        :param use_trigrams: Whether to fall back to trigram similarity when no exact key matches
+        :param trigram_threshold: Minimum Jaccard similarity of trigram sets for a trigram match
+        """
+        self.hits = hits
+        self.use_trigrams = use_trigrams
+        self.trigram_threshold = trigram_threshold
+        self.exact: dict[str, int] = {}
+        self.trigrams: dict[str, set[int]] = defaultdict(set)
+        self.keys: list[str] = []
+        for row, hit in enumerate(hits):
+            key = normalize_food_name(hit.name)
+            self.keys.append(key)
+            # Rows sharing a key: the first one with a known energy value wins
+            if key not in self.exact or (not _has_energy(hits[self.exact[key]]) and _has_energy(hit)):
+                self.exact[key] = row
+            if use_trigrams:
+                for trigram in _trigrams(key):
+                    self.trigrams[trigram].add(row)
+
+    def lookup(self, name: str) -> tuple[FoodHit | None, str | None]:
+        """
+        Looks a food name up without embedding it.
+
+        :param name: Food name returned by the VLM
+        :return: A tuple (hit, path) where path is "exact" or "trigram", or (None, None) if no match
+        """
+        key = normalize_food_name(name)
+        row = self.exact.get(key)
+        if row is not None:
+            return self._hit(row, 0.0), "exact"
+        if not self.use_trigrams or not key:
+            return None, None
+
+        query_trigrams = _trigrams(key)
+        shared = defaultdict(int)
+        for trigram in query_trigrams:
+            for candidate in self.trigrams.get(trigram, ()):
+                shared[candidate] += 1
+        best_row, best_score = None, 0.0
+        for candidate, count in shared.items():
+            score = count / (len(query_trigrams) + len(_trigrams(self.keys[candidate])) - count)
+            if score > best_score:
+                best_row, best_score = candidate, score
+        if best_row is not None and best_score >= self.trigram_threshold:
+            return self._hit(best_row, 1.0 - best_score), "trigram"
+        return None, None
+
+    def _hit(self, row: int, distance: float) -> FoodHit:
+        hit = self.hits[row]
+        return FoodHit(alim_code=hit.alim_code, name=hit.name, calories=hit.calories, distance=distance)
+
+
+_name_index = None
+_lock = threading.Lock()
+
+
+def get_name_index() -> NameIndex:
+    """
+    Returns the process-wide NameIndex built from the Ciqual table.
+
+    Trigram matching is enabled with TRAVAI_NAME_INDEX_TRIGRAMS=1.
+
+    :return: The shared NameIndex
+    """
+    global _name_index
+    with _lock:
+        if _name_index is None:
+            food_dataset = load_ciqual()
+            hits = [
+                FoodHit(alim_code=int(alim_code), name=name, calories=calories, distance=0.0)
+                for alim_code, name, calories in zip(
+                    food_dataset["alim_code"], food_dataset["alim_nom_en"], food_dataset["Energie (kcal/100 g)"]
+                )
+            ]
+            _name_index = NameIndex(hits, use_trigrams=os.getenv("TRAVAI_NAME_INDEX_TRIGRAMS", "0") == "1")
+        return _name_index
@@ -1,21 +1,198 @@
+import os
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
 import chromadb
+import numpy as np
 from sentence_transformers import SentenceTransformer
+from travai.backend.vector_db.embedding_model import get_model as get_shared_model
+from travai.backend.vector_db.embedding_cache import encode_with_cache
+from travai.backend.vector_db.backends import FoodHit, RetrievalBackend, get_backend
+from travai.backend.vector_db.name_index import get_name_index
+from travai.backend.vector_db.ciqual import NUTRIENT_COLUMNS
+from travai.backend.nutrient_store import get_nutrient_store
+from travai.singleflight import SingleFlight
+from travai.tracing import span
+
+
+@dataclass
+class FoodMatch:
+    """
+    The Ciqual food chosen for one queried name.
+
+    Attributes:
+        query (str): The name that was looked up.
+        hit (FoodHit): The selected Ciqual food.
+        path (str): Which stage served the lookup: "exact", "trigram" or "vector".
+        candidates (list[FoodHit]): Every candidate considered, closest first (hit is the first one).
+    """
+    query: str
+    hit: FoodHit
+    path: str
+    candidates: list[FoodHit]
+
+
+@dataclass
+class FoodCandidate:
+    """
+    A retrieval candidate with its parsed nutrient values.
+
+    Attributes:
+        alim_code (int): Ciqual food code.
+        name (str): English Ciqual name.
+        distance (float): Distance to the query (lower is closer).
+        nutrients (np.ndarray): float32 values per 100g, ordered as NUTRIENT_COLUMNS (NaN if missing).
+    """
+    alim_code: int
+    name: str
+    distance: float
+    nutrients: np.ndarray
+
+    @property
+    def calories(self) -> float:
+        return float(self.nutrients[0])
+
+    def nutrient_dict(self) -> dict[str, float]:
+        return dict(zip(NUTRIENT_COLUMNS, self.nutrients.tolist()))
+
+
+# Identical lookups running at the same time share one computation
+lookup_flight = SingleFlight("food_lookup")
+
+_lookup_paths = Counter()
+_lookup_paths_lock = threading.Lock()
 
 
 def get_model() -> SentenceTransformer:
-    return SentenceTransformer('paraphrase-MiniLM-L6-v2')
-
-def query_food(client: chromadb.PersistentClient, foods: list[str]):
-    model = get_model()
-    # Ensure persistent storage
-    # Create or retrieve collection
-    collection = client.get_or_create_collection("food_embeddings")
-
-    query_embedding = model.encode(foods, convert_to_tensor=True).tolist()
-    results = collection.query(
-        query_embeddings=query_embedding, # Chroma will embed this for you
-        n_results=5# how many results to return
-    )
-    names = [meta[0]["alim_nom_en"] for meta in results["metadatas"]]
-    calories = [cal[0]['Energie_kcal_100g'] for cal in results['metadatas']]
+    return get_shared_model()
+
+def get_lookup_stats() -> dict:
+    """
+    Returns how many lookups each stage has served in this process.
+
+    :return: A dict mapping "exact", "trigram" and "vector" to a count
+    """
+    with _lookup_paths_lock:
+        return {path: _lookup_paths[path] for path in ("exact", "trigram", "vector")}
+
+def match_foods(client: chromadb.PersistentClient, foods: list[str], backend: RetrievalBackend = None,
+                use_name_index: bool = True, k: int = 5) -> list[FoodMatch]:
+    """
+    Finds the closest Ciqual food of every name in foods.
+
+    Names matching a Ciqual name after normalization are served by the name index; only the
+    remaining ones are embedded and sent to the retrieval backend, in one batch.
+
+    :param client: Chroma client, used when the configured backend is "chroma"
+    :param foods: Food names to look up
+    :param backend: (Optional) Retrieval backend to use instead of the configured one
+    :param use_name_index: Whether to try the name index before vector search
+    :param k: Number of vector search candidates kept per food
+    :return: One FoodMatch per food, in order
+    """
+    backend_name = backend.name if backend is not None else os.getenv("TRAVAI_RETRIEVAL_BACKEND", "chroma")
+    key = (tuple(foods), backend_name, use_name_index, k)
+    with span("retrieval.match_foods", foods=len(foods), backend=backend_name):
+        return lookup_flight.do(key, lambda: _match_foods(client, foods, backend, use_name_index, k))
+
+def _match_foods(client: chromadb.PersistentClient, foods: list[str], backend: RetrievalBackend,
+                 use_name_index: bool, k: int) -> list[FoodMatch]:
+    matches: list[FoodMatch | None] = [None] * len(foods)
+    if use_name_index:
+        with span("retrieval.name_index") as index_span:
+            name_index = get_name_index()
+            for i, food in enumerate(foods):
+                hit, path = name_index.lookup(food)
+                if hit is not None:
+                    matches[i] = FoodMatch(query=food, hit=hit, path=path, candidates=[hit])
+            if index_span is not None:
+                index_span.set(hits=sum(match is not None for match in matches))
+
+    remaining = [i for i, match in enumerate(matches) if match is None]
+    if remaining:
+        backend = backend or get_backend(client)
+        # Only names never seen before are sent to the model, in a single batch
+        query_embedding = encode_with_cache([foods[i] for i in remaining])
+        with span("retrieval.search", backend=backend.name, queries=len(remaining), k=k):
+            hits = backend.search(query_embedding, k=k)
+        for i, candidates in zip(remaining, hits):
+            matches[i] = FoodMatch(query=foods[i], hit=candidates[0], path="vector", candidates=candidates)
+
+    with _lookup_paths_lock:
+        _lookup_paths.update(match.path for match in matches)
+    return matches
+
+def prefetch_foods(foods: list[str]) -> None:
+    """
+    Warms the embedding cache for names the name index cannot serve, so a later
+    match_foods/query_food on them skips the model.
+
+    :param foods: Food names that will be looked up soon
+    """
+    name_index = get_name_index()
+    pending = [food for food in foods if name_index.lookup(food)[0] is None]
+    if pending:
+        encode_with_cache(pending)
+
+def query_food_candidates(client: chromadb.PersistentClient, foods: list[str], k: int = 5,
+                          backend: RetrievalBackend = None, use_name_index: bool = True) -> list[list[FoodCandidate]]:
+    """
+    Batched retrieval returning, for every food, its top-k Ciqual candidates with nutrients.
+
+    Foods served by the name index get their exact match first, followed by the closest
+    vector search candidates up to k.
+
+    :param client: Chroma client, used when the configured backend is "chroma"
+    :param foods: Food names to look up
+    :param k: Number of candidates per food
+    :param backend: (Optional) Retrieval backend to use instead of the configured one
+    :param use_name_index: Whether to try the name index before vector search
+    :return: One list of FoodCandidate per food, closest first
+    """
+    store = get_nutrient_store()
+    matches = match_foods(client, foods, backend=backend, use_name_index=use_name_index, k=k)
+    matches = _fill_candidates(client, matches, backend, k)
+    # One vectorized lookup for every candidate of every food
+    nutrients = store.lookup([hit.alim_code for match in matches for hit in match.candidates])
+    candidates, offset = [], 0
+    for match in matches:
+        candidates.append([
+            FoodCandidate(alim_code=int(hit.alim_code), name=hit.name, distance=hit.distance, nutrients=values)
+            for hit, values in zip(match.candidates, nutrients[offset:offset + len(match.candidates)])
+        ])
+        offset += len(match.candidates)
+    return candidates
+
+def _fill_candidates(client: chromadb.PersistentClient, matches: list[FoodMatch], backend: RetrievalBackend,
+                     k: int) -> list[FoodMatch]:
+    # Name index matches hold a single candidate: complete them with vector search ones, in one batch
+    short = [i for i, match in enumerate(matches) if len(match.candidates) < k]
+    if not short:
+        return matches
+    backend = backend or get_backend(client)
+    query_embedding = encode_with_cache([matches[i].query for i in short])
+    with span("retrieval.search", backend=backend.name, queries=len(short), k=k):
+        hits = backend.search(query_embedding, k=k)
+    # match_foods results may be shared with other callers: build new matches instead of mutating them
+    filled = list(matches)
+    for i, vector_hits in zip(short, hits):
+        match = matches[i]
+        seen = {hit.alim_code for hit in match.candidates}
+        extra = [hit for hit in vector_hits if hit.alim_code not in seen][:k - len(match.candidates)]
+        filled[i] = FoodMatch(query=match.query, hit=match.hit, path=match.path, candidates=match.candidates + extra)
+    return filled
+
+def query_food(client: chromadb.PersistentClient, foods: list[str], backend: RetrievalBackend = None):
+    """
+    Finds the closest Ciqual food of every name in foods.
+
+    :param client: Chroma client, used when the configured backend is "chroma"
+    :param foods: Food names to look up
+    :param backend: (Optional) Retrieval backend to use instead of the configured one
+    :return: A tuple (names, calories) with one Ciqual name and kcal/100g value per food
+    """
+    matches = match_foods(client, foods, backend=backend)
+    names = [match.hit.name for match in matches]
+    calories = [match.hit.calories for match in matches]
     return names, calories
@@ -1,66 +1,126 @@
-import pandas as pd
-from sentence_transformers import SentenceTransformer
+import hashlib
+import json
+import os
+from datetime import datetime
+
 import chromadb
+import pandas as pd
+
+from travai.backend.vector_db.ciqual import load_ciqual
+from travai.backend.vector_db.embedding_model import DEFAULT_MODEL_NAME, get_model
+from travai.backend.vector_db.backends import COLLECTION_METADATA, COLLECTION_NAME, export_numpy_index
+
+CHROMA_PATH = "./chroma_db"
+MANIFEST_PATH = os.path.join(CHROMA_PATH, f"{COLLECTION_NAME}_manifest.json")
+BATCH_SIZE = 256
+
+
+def row_metadata(row: pd.Series) -> dict:
+    """
+    Builds the Chroma metadata stored with a Ciqual row.
+    """
+    metadata = {
+        "alim_grp_code": row["alim_grp_code"],  # Group code
+        "alim_ssgrp_code": row["alim_ssgrp_code"],  # Sub-group code
+        "alim_ssssgrp_code": row["alim_ssssgrp_code"],  # Sub-sub-group code
+        "alim_grp_nom_fr": row["alim_grp_nom_fr"],  # Group name in French
+        "alim_ssgrp_nom_fr": row["alim_ssgrp_nom_fr"],  # Sub-group name in French
+        "alim_code": row["alim_code"],  # Food code
+        "alim_nom_fr": row["alim_nom_fr"],  # Food name in French
+        "alim_nom_en": row["alim_nom_en"],  # Food name in English
+        "Energie_kcal_100g": row["Energie (kcal/100 g)"],  # Energy value (kcal per 100g)
+    }
+    # Chroma only accepts plain Python scalars
+    return {key: value.item() if hasattr(value, "item") else value for key, value in metadata.items()}
+
+
+def row_hash(row: pd.Series) -> str:
+    """
+    Hashes every column of a Ciqual row, so any edit to the row triggers a re-index.
+    """
+    payload = json.dumps([str(value) for value in row.tolist()], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH) -> None:
+    # Write then rename, so a crash never leaves a half-written manifest behind
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def sync_collection(client: chromadb.PersistentClient, food_dataset: pd.DataFrame,
+                    model_name: str = DEFAULT_MODEL_NAME, batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Brings the food_embeddings collection in line with food_dataset without dropping it.
+
+    Rows are identified by alim_code. Only rows that are new, whose content hash changed, or
+    that were embedded by another model are re-embedded and upserted, in batches of batch_size.
+    Ids present in the collection but not in the dataset are deleted. The collection stays
+    queryable throughout.
+
+    :param client: Chroma client holding the collection
+    :param food_dataset: Ciqual rows, one per alim_code
+    :param model_name: Embedding model to use
+    :param batch_size: Maximum number of rows per upsert/delete call
+    :return: A dict with the number of upserted, deleted and unchanged rows
+    """
+    collection = client.get_or_create_collection(COLLECTION_NAME, metadata=COLLECTION_METADATA)
+    manifest = load_manifest()
+    previous_hashes = manifest.get("row_hashes", {}) if manifest.get("model_name") == model_name else {}
+    existing_ids = set(collection.get(include=[])["ids"])
+
+    hashes = {str(row["alim_code"]): row_hash(row) for _, row in food_dataset.iterrows()}
+    changed = food_dataset[[
+        alim_id not in existing_ids or previous_hashes.get(alim_id) != digest
+        for alim_id, digest in hashes.items()
+    ]]
+    stale_ids = sorted(existing_ids - hashes.keys())
+
+    print(f"{len(changed)} rows to (re)index, {len(stale_ids)} to delete, {len(hashes) - len(changed)} unchanged")
+
+    if len(changed):
+        model = get_model(model_name)
+    for start in range(0, len(changed), batch_size):
+        batch = changed.iloc[start:start + batch_size]
+        documents = batch["alim_nom_en"].tolist()
+        collection.upsert(
+            ids=[str(alim_code) for alim_code in batch["alim_code"]],
+            embeddings=model.encode(documents).tolist(),
+            documents=documents,
+            metadatas=[row_metadata(row) for _, row in batch.iterrows()],
+        )
+    for start in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[start:start + batch_size])
+
+    save_manifest({
+        "collection": COLLECTION_NAME,
+        "model_name": model_name,
+        "dataset_hash": hashlib.sha256("".join(sorted(hashes.values())).encode("utf-8")).hexdigest(),
+        "row_count": len(hashes),
+        "updated_at": datetime.now().isoformat(),
+        "row_hashes": hashes,
+    })
+    return {"upserted": len(changed), "deleted": len(stale_ids), "unchanged": len(hashes) - len(changed)}
+
 
-food_dataset = pd.read_csv('src/travai/backend/vector_db/Table-Ciqual-2020_processed_final.csv')
-
-print("Data loaded 🍔")
-
-# Creating embeddings
-model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-embeddings = model.encode(food_dataset['alim_nom_en'].tolist(), convert_to_tensor=True)
-
-
-
-# Initialize Chroma client
-client = chromadb.PersistentClient(path="./chroma_db")
-
-# Delete the collection if it already exists
-try:
-    client.delete_collection('food_embeddings')
-    print(f"Deleted existing collection: {'food_embeddings'}")
-except:
-    pass
-
-
-collection = client.create_collection('food_embeddings')
-
-# Create IDs
-ids = [str(i) for i in range(len(food_dataset))]
-
-print("Adding data to ChromaDB...")
-
-# Insert data into Chroma
-collection.add(embeddings=embeddings.tolist(),
-               documents=food_dataset['alim_nom_en'].tolist(),
-               ids=ids,
-               metadatas=[
-                   {
-                       "alim_grp_code": grp_code,  # Group code
-                       "alim_ssgrp_code": ssgrp_code,  # Sub-group code
-                       "alim_ssssgrp_code": ssssgrp_code,  # Sub-sub-group code
-                       "alim_grp_nom_fr": grp_name_fr,  # Group name in French
-                       "alim_ssgrp_nom_fr": ssgrp_name_fr,  # Sub-group name in French
-                       "alim_code": alim_code,  # Food code
-                       "alim_nom_fr": alim_nom_fr,  # Food name in French
-                       "alim_nom_en": alim_nom_en,  # Food name in English
-                       "Energie_kcal_100g": energy_kcal  # Energy value (kcal per 100g)
-                   }
-                   for
-                   grp_code, ssgrp_code, ssssgrp_code, grp_name_fr, ssgrp_name_fr, alim_code, alim_nom_fr, alim_nom_en, energy_kcal
-                   in zip(
-                       food_dataset['alim_grp_code'],
-                       food_dataset['alim_ssgrp_code'],
-                       food_dataset['alim_ssssgrp_code'],
-                       food_dataset['alim_grp_nom_fr'],
-                       food_dataset['alim_ssgrp_nom_fr'],
-                       food_dataset['alim_code'],
-                       food_dataset['alim_nom_fr'],
-                       food_dataset['alim_nom_en'],
-                       food_dataset['Energie (kcal/100 g)']
-                   )
-               ]
-               )
-print("Data added to ChromaDB 🚀")
+if __name__ == "__main__":
+    food_dataset = load_ciqual()
+    print("Data loaded 🍔")
 
+    client = chromadb.PersistentClient(path=CHROMA_PATH)
+    print("Syncing data with ChromaDB...")
+    sync_collection(client, food_dataset)
+    print("ChromaDB collection up to date 🚀")
 
+    # Mirror the collection into the exact-search NumPy index (TRAVAI_RETRIEVAL_BACKEND=numpy)
+    n_rows = export_numpy_index(client)
+    print(f"NumPy index written ({n_rows} rows) 🧮")
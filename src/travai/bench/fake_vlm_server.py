@@ -0,0 +1,204 @@
+"""Local OpenAI-compatible stand-in for the Scaleway VLM endpoint.
+
+Serves POST /v1/chat/completions (the route behind ``client.beta.chat.completions.parse``
+and ``.stream``) with schema-valid DishSuggestion answers, a configurable latency
+distribution and error rate. Point the app at it with SCW_BASE_URL=http://127.0.0.1:8001/v1.
+
+Run: ``python -m travai.bench.fake_vlm_server --port 8001 --latency-median 2 --error-rate 0.05``
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from travai.model.schemas import Dish, DishSuggestion, Ingredient
+
+SAMPLE_DISHES = [
+    ("Spaghetti carbonara", [("Spaghetti, cooked", 200), ("Egg, raw", 50), ("Bacon, cooked", 40), ("Parmesan", 15)]),
+    ("Chicken and rice", [("Chicken breast, cooked", 150), ("White rice, cooked", 180), ("Olive oil", 10)]),
+    ("Greek salad", [("Tomato, raw", 120), ("Cucumber, raw", 80), ("Feta", 40), ("Olive oil", 10), ("Black olives", 20)]),
+    ("Avocado toast", [("Bread, wholemeal", 60), ("Avocado, pulp, raw", 80), ("Egg, poached", 50)]),
+]
+
+
+class FakeVLMConfig:
+    """Behaviour of the fake server
+
+    Attributes:
+        latency_median (float): Median response time in seconds (log-normal distribution).
+        latency_sigma (float): Sigma of the log-normal distribution, 0 for a fixed latency.
+        error_rate (float): Probability of answering with an error instead of a completion.
+        rate_limit_share (float): Share of the errors returned as 429 rather than 500.
+        stream_chunk_chars (int): Size of the content deltas when streaming.
+    """
+
+    def __init__(self, latency_median: float = 1.0, latency_sigma: float = 0.4, error_rate: float = 0.0,
+                 rate_limit_share: float = 0.5, stream_chunk_chars: int = 24, seed: int = None):
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.rate_limit_share = rate_limit_share
+        self.stream_chunk_chars = stream_chunk_chars
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def sample_latency(self) -> float:
+        with self.lock:
+            return self.latency_median * math.exp(self.random.gauss(0, self.latency_sigma))
+
+    def sample_error(self) -> int | None:
+        with self.lock:
+            self.requests += 1
+            if self.random.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            return 429 if self.random.random() < self.rate_limit_share else 500
+
+    def sample_answer(self) -> str:
+        with self.lock:
+            dishes = self.random.sample(SAMPLE_DISHES, k=self.random.randint(1, 2))
+        suggestion = DishSuggestion(possible_dishes=[
+            Dish(dish_name=name, ingredients=[
+                Ingredient(ingredient_name=ingredient, quantity_grams=grams) for ingredient, grams in ingredients
+            ])
+            for name, ingredients in dishes
+        ])
+        return suggestion.model_dump_json()
+
+
+def make_handler(config: FakeVLMConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict, headers: dict = None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"Unknown route {self.path}"}})
+                return
+
+            latency = config.sample_latency()
+            status = config.sample_error()
+            if status is not None:
+                time.sleep(latency / 2)
+                message = "Rate limit exceeded" if status == 429 else "Upstream model error"
+                self._send_json(status, {"error": {"message": message, "type": "fake_error"}},
+                                headers={"Retry-After": "0"} if status == 429 else None)
+                return
+
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = request.get("model", "fake-vlm")
+            content = config.sample_answer()
+            if not request.get("stream"):
+                time.sleep(latency)
+                self._send_json(200, {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 1000, "completion_tokens": len(content) // 4,
+                              "total_tokens": 1000 + len(content) // 4},
+                })
+                return
+
+            # Server-sent events, spreading the latency over the generated chunks
+            pieces = [content[i:i + config.stream_chunk_chars] for i in range(0, len(content), config.stream_chunk_chars)]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            deltas = [{"role": "assistant", "content": ""}] + [{"content": piece} for piece in pieces]
+            for i, delta in enumerate(deltas + [{}]):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": "stop" if i == len(deltas) else None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(latency / len(deltas))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+
+def start_fake_server(host: str = "127.0.0.1", port: int = 0, config: FakeVLMConfig = None):
+    """Starts the fake server in a background thread
+
+    Parameters
+    ----------
+    host : str
+        interface to bind
+    port : int
+        port to bind, 0 for any free port
+    config : FakeVLMConfig
+        latency and error behaviour
+
+    Returns
+    -------
+    tuple[ThreadingHTTPServer, str]
+        The server (call shutdown() to stop it) and its base URL, e.g. http://127.0.0.1:8001/v1
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(config or FakeVLMConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible VLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-median", type=float, default=1.0, help="median latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="log-normal sigma, 0 for fixed latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-share", type=float, default=0.5, help="share of errors returned as 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeVLMConfig(
+        latency_median=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        rate_limit_share=args.rate_limit_share,
+        seed=args.seed,
+    )
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake VLM server listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
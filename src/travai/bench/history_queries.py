@@ -0,0 +1,140 @@
+"""Benchmark of the history page queries, with and without the lookup indexes.
+
+Fills a throw-away SQLite database with synthetic patients, meals and ingredients using
+the application models, times the queries a history page rerun issues with only the
+primary key indexes (the initial migration), then creates the model indexes and times
+them again.
+
+``python -m travai.bench.history_queries --meals 100000 --patients 1000``
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from travai.backend.models import Base, DetectedIngredient, Doctor, Goal, Meal, ModifiedIngredient, Patient
+
+
+def lookup_indexes() -> list:
+    """Indexes declared by the models other than the primary key ones"""
+    return [
+        index
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+        if not all(column.primary_key for column in index.columns)
+    ]
+
+
+def populate(engine, meals: int, patients: int, ingredients_per_meal: int, seed: int = 0) -> None:
+    """Inserts doctors, patients (one goal each), meals and their detected and modified ingredients"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    with engine.begin() as connection:
+        connection.execute(insert(Doctor), [
+            {"first_name": "Doc", "last_name": str(i), "email": f"doctor{i}@example.com", "password": "x"}
+            for i in range(max(1, patients // 20))
+        ])
+        connection.execute(insert(Patient), [
+            {"first_name": "Pat", "last_name": str(i), "email": f"patient{i}@example.com", "password": "x",
+             "doctor_id": 1 + i % max(1, patients // 20)}
+            for i in range(patients)
+        ])
+        connection.execute(insert(Goal), [
+            {"patient_id": 1 + i, "date_start": start, "date_end": start + timedelta(days=365),
+             "calories_in_grams_per_day": 2000}
+            for i in range(patients)
+        ])
+        connection.execute(insert(Meal), [
+            {"patient_id": rng.randint(1, patients), "date_start": start + timedelta(minutes=rng.randint(0, 525600)),
+             "image_path": "meal.png", "name": f"Meal {i}"}
+            for i in range(meals)
+        ])
+        rows = [
+            {"meal_id": 1 + i // ingredients_per_meal, "ingredient_name": f"Food {rng.randint(0, 2000)}",
+             "quantity_grams": rng.uniform(10, 300), "calculated_calories": rng.uniform(10, 500)}
+            for i in range(meals * ingredients_per_meal)
+        ]
+        connection.execute(insert(DetectedIngredient), rows)
+        connection.execute(insert(ModifiedIngredient), [
+            dict(row, detected_ingredient_id=1 + i) for i, row in enumerate(rows)
+        ])
+
+
+def history_queries(session, email: str, expanded_meal: int) -> None:
+    """The queries of one history page rerun, as issued by the services"""
+    patient = session.query(Patient).filter(Patient.email == email).first()
+    meals = session.query(Meal).filter(Meal.patient_id == patient.patient_id).order_by(Meal.date_start).all()
+    meal_ids = [meal.meal_id for meal in meals]
+    session.query(
+        DetectedIngredient.meal_id, DetectedIngredient.ingredient_name, DetectedIngredient.quantity_grams
+    ).filter(DetectedIngredient.meal_id.in_(meal_ids)).all()
+    session.query(Goal).filter(Goal.patient_id == patient.patient_id).all()
+    if meal_ids:
+        session.query(DetectedIngredient).filter(DetectedIngredient.meal_id == meal_ids[expanded_meal % len(meal_ids)]).all()
+        session.query(ModifiedIngredient).filter(ModifiedIngredient.meal_id == meal_ids[expanded_meal % len(meal_ids)]).all()
+
+
+def time_history(engine, patients: int, repeat: int, seed: int = 1) -> list[float]:
+    """Times repeat history page reruns of random patients, in milliseconds"""
+    rng = random.Random(seed)
+    session_factory = sessionmaker(bind=engine)
+    durations = []
+    for _ in range(repeat):
+        session = session_factory()
+        try:
+            start = time.perf_counter()
+            history_queries(session, f"patient{rng.randrange(patients)}@example.com", rng.randrange(100))
+            durations.append((time.perf_counter() - start) * 1000)
+        finally:
+            session.close()
+    return durations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="History page queries with and without lookup indexes")
+    parser.add_argument("--meals", type=int, default=100_000)
+    parser.add_argument("--patients", type=int, default=1_000)
+    parser.add_argument("--ingredients-per-meal", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50, help="history page reruns timed per configuration")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'history_bench.db')}")
+        Base.metadata.create_all(engine)
+        indexes = lookup_indexes()
+        for index in indexes:
+            index.drop(engine)
+
+        start = time.perf_counter()
+        populate(engine, args.meals, args.patients, args.ingredients_per_meal)
+        print(f"Inserted {args.meals} meals x {args.ingredients_per_meal} ingredients "
+              f"for {args.patients} patients in {time.perf_counter() - start:.1f}s")
+
+        results = {}
+        results["primary keys only"] = time_history(engine, args.patients, args.repeat)
+
+        start = time.perf_counter()
+        for index in indexes:
+            index.create(engine)
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+        print(f"Created {len(indexes)} indexes in {time.perf_counter() - start:.1f}s")
+        results["lookup indexes"] = time_history(engine, args.patients, args.repeat)
+        engine.dispose()
+
+    print()
+    print(f"{'configuration':<20}{'median ms':>12}{'p95 ms':>10}{'max ms':>10}")
+    for name, durations in results.items():
+        ordered = sorted(durations)
+        print(f"{name:<20}{statistics.median(ordered):>12.2f}{ordered[int(0.95 * (len(ordered) - 1))]:>10.2f}"
+              f"{ordered[-1]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Load generator for the meal analysis pipeline.
+
+Drives N concurrent simulated users through the same stages as the analysis page
+(image preprocessing, streamed VLM answer, ingredient retrieval, saving the meal to a
+temporary SQLite database) and reports p50/p95/p99 latency and throughput per stage.
+
+Against the local stand-in server (started in-process):
+``python -m travai.bench.load_test --users 16 --requests 10 --spawn-server --latency-median 1.5``
+
+Against any OpenAI-compatible endpoint: set SCW_BASE_URL / SCW_SECRET_KEY and omit --spawn-server.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from travai.bench.fake_vlm_server import FakeVLMConfig, start_fake_server
+
+DEFAULT_IMAGE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "app", "carbonara.jpg")
+PROMPT = "Describe the list of ingredients required to make this dish using the classes Ingredient and Dish"
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of values (q in [0, 100])"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+class StageRecorder:
+    """Thread-safe collector of per-stage durations"""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.durations[stage].append(seconds)
+
+    def fail(self, stage: str) -> None:
+        with self._lock:
+            self.errors[stage] += 1
+
+    def report(self, wall_seconds: float) -> str:
+        lines = [
+            f"{'stage':<12}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'req/s':>9}",
+        ]
+        for stage in list(self.durations) + [s for s in self.errors if s not in self.durations]:
+            values = self.durations.get(stage, [])
+            lines.append(
+                f"{stage:<12}{len(values):>7}{self.errors.get(stage, 0):>8}"
+                f"{percentile(values, 50) * 1000:>10.1f}{percentile(values, 95) * 1000:>10.1f}"
+                f"{percentile(values, 99) * 1000:>10.1f}{(max(values) if values else float('nan')) * 1000:>10.1f}"
+                f"{len(values) / wall_seconds:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+def run_pipeline(image_bytes: bytes, model_name: str, recorder: StageRecorder, retrieval: bool,
+                 allow_coalescing: bool, patient_id: int = None) -> None:
+    """Runs one analysis through every stage, recording each stage duration
+
+    The VLM answer is streamed as on the analysis page: "first_item" is the time to the first
+    complete ingredient, "vlm" the time to the whole suggestion. With a patient_id, the meal
+    is then saved with persist_meal_analysis ("persist").
+    """
+    from travai.model.client import get_client
+    from travai.model.inference import preprocess_image, stream_dish_suggestion
+
+    total_start = time.perf_counter()
+    stage = "preprocess"
+    try:
+        start = time.perf_counter()
+        base64_image, mime_type = preprocess_image(image_bytes)
+        recorder.record(stage, time.perf_counter() - start)
+
+        stage = "vlm"
+        # A unique prompt suffix keeps identical images from being coalesced into one call
+        prompt = PROMPT if allow_coalescing else f"{PROMPT} (request {uuid.uuid4().hex[:8]})"
+        start = time.perf_counter()
+        suggestion, first_item = None, None
+        for kind, _, item in stream_dish_suggestion(
+            client=get_client(),
+            model_name=model_name,
+            prompt=prompt,
+            base64_image=base64_image,
+            mime_type=mime_type,
+        ):
+            if kind == "ingredient" and first_item is None:
+                first_item = time.perf_counter() - start
+                recorder.record("first_item", first_item)
+            elif kind == "suggestion":
+                suggestion = item
+        if suggestion is None:
+            raise ValueError("The model answer was incomplete")
+        recorder.record(stage, time.perf_counter() - start)
+        ingredients = suggestion.possible_dishes[0].ingredients
+
+        matches = None
+        if retrieval:
+            from travai.backend.vector_db.query import match_foods
+
+            stage = "retrieval"
+            start = time.perf_counter()
+            matches = match_foods(client=_get_chroma_client(), foods=[ingredient.ingredient_name for ingredient in ingredients])
+            recorder.record(stage, time.perf_counter() - start)
+
+        if patient_id is not None:
+            from travai.backend.services.meal_service import persist_meal_analysis
+
+            stage = "persist"
+            start = time.perf_counter()
+            saved = persist_meal_analysis(
+                patient_id=patient_id,
+                dish=suggestion.possible_dishes[0].dish_name,
+                ingredients=[
+                    {
+                        "ingredient_name": match.hit.name if match else ingredient.ingredient_name,
+                        "alim_code": match.hit.alim_code if match else None,
+                        "quantity_grams": ingredient.quantity_grams,
+                        "calculated_calories": 0,
+                    }
+                    for ingredient, match in zip(ingredients, matches or [None] * len(ingredients))
+                ],
+                image_path="load_test.jpg",
+            )
+            if saved is None:
+                raise RuntimeError("persist_meal_analysis failed")
+            recorder.record(stage, time.perf_counter() - start)
+
+        recorder.record("total", time.perf_counter() - total_start)
+    except Exception as e:
+        print(f"Stage {stage} failed: {e}")
+        recorder.fail(stage)
+        recorder.fail("total")
+
+
+_chroma_client = None
+_chroma_lock = threading.Lock()
+
+
+def _get_chroma_client():
+    global _chroma_client
+    with _chroma_lock:
+        if _chroma_client is None:
+            import chromadb
+            _chroma_client = chromadb.PersistentClient(path="./chroma_db/")
+        return _chroma_client
+
+
+def run_load_test(users: int, requests_per_user: int, image_bytes: bytes, model_name: str = "pixtral-12b-2409",
+                  retrieval: bool = True, allow_coalescing: bool = False, patient_ids: list[int] = None) -> StageRecorder:
+    """Runs users concurrent simulated users, each performing requests_per_user analyses back to back
+
+    With patient_ids (one per user), every analysis is also saved to the database of SessionLocal.
+
+    Returns
+    -------
+    StageRecorder
+        The recorded stage durations
+    """
+    recorder = StageRecorder()
+
+    def user(patient_id: int | None) -> None:
+        for _ in range(requests_per_user):
+            run_pipeline(image_bytes, model_name, recorder, retrieval, allow_coalescing, patient_id)
+
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        for future in [pool.submit(user, patient_ids[i] if patient_ids else None) for i in range(users)]:
+            future.result()
+    return recorder
+
+
+def create_patients(path: str, users: int) -> list[int]:
+    """Points SessionLocal at a new SQLite database at path and creates one patient per user
+
+    Returns
+    -------
+    list[int]
+        The patient ids
+    """
+    from travai.backend.database import Base, SessionLocal, create_app_engine
+    from travai.backend.models import Patient
+
+    engine = create_app_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    SessionLocal.configure(bind=engine)
+    session = SessionLocal()
+    try:
+        patients = [
+            Patient(first_name="Load", last_name=f"Test {i}", email=f"load{i}@example.com", password="load")
+            for i in range(users)
+        ]
+        session.add_all(patients)
+        session.commit()
+        return [patient.patient_id for patient in patients]
+    finally:
+        session.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test of the meal analysis pipeline")
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--requests", type=int, default=5, help="analyses per user")
+    parser.add_argument("--image", default=DEFAULT_IMAGE_PATH)
+    parser.add_argument("--model", default="pixtral-12b-2409")
+    parser.add_argument("--no-retrieval", action="store_true", help="skip the ingredient retrieval stage")
+    parser.add_argument("--allow-coalescing", action="store_true",
+                        help="send identical requests, letting single-flight coalescing merge them")
+    parser.add_argument("--spawn-server", action="store_true", help="start the fake VLM server in-process")
+    parser.add_argument("--latency-median", type=float, default=1.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.4)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--no-db", action="store_true", help="skip saving the meals to a temporary database")
+    args = parser.parse_args()
+
+    if args.spawn_server:
+        server, base_url = start_fake_server(config=FakeVLMConfig(
+            latency_median=args.latency_median, latency_sigma=args.latency_sigma, error_rate=args.error_rate,
+        ))
+        os.environ["SCW_BASE_URL"] = base_url
+        os.environ.setdefault("SCW_SECRET_KEY", "fake-key")
+        print(f"Fake VLM server started on {base_url}")
+
+    with open(args.image, "rb") as f:
+        image_bytes = f.read()
+
+    with tempfile.TemporaryDirectory() as directory:
+        patient_ids = None if args.no_db else create_patients(os.path.join(directory, "load_test.db"), args.users)
+
+        start = time.perf_counter()
+        recorder = run_load_test(
+            users=args.users,
+            requests_per_user=args.requests,
+            image_bytes=image_bytes,
+            model_name=args.model,
+            retrieval=not args.no_retrieval,
+            allow_coalescing=args.allow_coalescing,
+            patient_ids=patient_ids,
+        )
+        wall_seconds = time.perf_counter() - start
+
+    print()
+    print(f"{args.users} users x {args.requests} requests in {wall_seconds:.1f}s")
+    print(recorder.report(wall_seconds))
+
+    from travai.model.resilience import get_vlm_breaker, get_vlm_hedger
+    print(f"circuit breaker: {get_vlm_breaker().stats()}")
+    print(f"hedging: {get_vlm_hedger().stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+DEFAULT_BASE_URL = "https://api.scaleway.ai/d4e5eb30-b84e-4d48-af57-57b11c4e8755/v1"
+
+_client = None
+_client_lock = threading.Lock()
+
+_slots = None
+_slots_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "in_flight": 0,
+    "waiting": 0,
+    "calls": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+}
+
+
+def _http_settings() -> tuple[httpx.Timeout, httpx.Limits]:
+    timeout = httpx.Timeout(
+        float(os.getenv("TRAVAI_VLM_TIMEOUT", 60)),
+        connect=float(os.getenv("TRAVAI_VLM_CONNECT_TIMEOUT", 5)),
+    )
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("TRAVAI_VLM_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(os.getenv("TRAVAI_VLM_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=30,
+    )
+    return timeout, limits
+
+
+def get_client() -> OpenAI:
+    """Returns the process-wide OpenAI client using SCW_SECRET_KEY present in the .env file
+
+    The client is created once and reused by every Streamlit session, so they share one
+    keep-alive connection pool. Timeouts, pool size and retries come from the environment:
+    TRAVAI_VLM_TIMEOUT, TRAVAI_VLM_CONNECT_TIMEOUT, TRAVAI_VLM_MAX_CONNECTIONS,
+    TRAVAI_VLM_MAX_KEEPALIVE and TRAVAI_VLM_MAX_RETRIES. Requests failing with 429, 5xx or
+    a connection error are retried with jittered exponential backoff (honouring Retry-After).
+    SCW_BASE_URL overrides the endpoint, e.g. to target a local stand-in server.
+
+    Returns
+    -------
+    OpenAI
+        The OpenAI client
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            timeout, limits = _http_settings()
+            _client = OpenAI(
+                base_url=os.getenv("SCW_BASE_URL", DEFAULT_BASE_URL),
+                api_key=os.getenv(
+                    "SCW_SECRET_KEY",
+                ),  # Replace SCW_SECRET_KEY with your IAM API key
+                timeout=timeout,
+                max_retries=int(os.getenv("TRAVAI_VLM_MAX_RETRIES", 3)),
+                http_client=httpx.Client(timeout=timeout, limits=limits),
+            )
+        return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    """Returns a new AsyncOpenAI client configured like get_client
+
+    Async clients hold a connection pool bound to the running event loop, so each batch
+    creates its own instead of sharing a process-wide one.
+
+    Returns
+    -------
+    AsyncOpenAI
+        The async OpenAI client
+    """
+    timeout, limits = _http_settings()
+    return AsyncOpenAI(
+        base_url=os.getenv("SCW_BASE_URL", DEFAULT_BASE_URL),
+        api_key=os.getenv("SCW_SECRET_KEY"),
+        timeout=timeout,
+        max_retries=int(os.getenv("TRAVAI_VLM_MAX_RETRIES", 3)),
+        http_client=httpx.AsyncClient(timeout=timeout, limits=limits),
+    )
+
+
+def _get_slots() -> threading.BoundedSemaphore:
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(int(os.getenv("TRAVAI_VLM_MAX_CONCURRENCY", 8)))
+        return _slots
+
+
+def _record_acquired(waited: float) -> None:
+    with _stats_lock:
+        _stats["waiting"] -= 1
+        _stats["in_flight"] += 1
+        _stats["calls"] += 1
+        _stats["total_wait_seconds"] += waited
+        _stats["max_wait_seconds"] = max(_stats["max_wait_seconds"], waited)
+
+
+def _release(slots: threading.BoundedSemaphore) -> None:
+    with _stats_lock:
+        _stats["in_flight"] -= 1
+    slots.release()
+
+
+@contextmanager
+def vlm_slot():
+    """Holds one of the TRAVAI_VLM_MAX_CONCURRENCY (default 8) process-wide VLM call slots
+
+    Callers block until a slot is free; the time spent waiting is recorded.
+    """
+    slots = _get_slots()
+    with _stats_lock:
+        _stats["waiting"] += 1
+    start = time.perf_counter()
+    slots.acquire()
+    _record_acquired(time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        _release(slots)
+
+
+@asynccontextmanager
+async def avlm_slot(poll_seconds: float = 0.01):
+    """Async counterpart of vlm_slot, sharing the same process-wide slots
+
+    Waits without blocking the event loop, by polling the slots every poll_seconds, so a
+    cancelled waiter never ends up holding a slot.
+    """
+    slots = _get_slots()
+    with _stats_lock:
+        _stats["waiting"] += 1
+    start = time.perf_counter()
+    try:
+        while not slots.acquire(blocking=False):
+            await asyncio.sleep(poll_seconds)
+    except BaseException:
+        with _stats_lock:
+            _stats["waiting"] -= 1
+        raise
+    _record_acquired(time.perf_counter() - start)
+    try:
+        yield
+    finally:
+        _release(slots)
+
+
+def get_vlm_stats() -> dict:
+    """Returns the VLM concurrency counters
+
+    Returns
+    -------
+    dict
+        in_flight, waiting, calls, total_wait_seconds, max_wait_seconds and mean_wait_seconds
+    """
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["mean_wait_seconds"] = stats["total_wait_seconds"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
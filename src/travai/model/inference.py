@@ -1,8 +1,20 @@
-from openai import OpenAI
+from openai import APIConnectionError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
 import os
+import io
+import time
+import asyncio
 import base64
+import hashlib
+from dataclasses import dataclass
 from pydantic import BaseModel
 import typing as t
+from travai.model.response_cache import ResponseCache, request_fingerprint
+from travai.singleflight import SingleFlight
+from travai.tracing import end_span, span, start_span
+from travai.model.client import avlm_slot, get_async_client, get_client, vlm_slot
+from travai.model.resilience import CircuitOpenError, get_vlm_breaker, get_vlm_hedger
+from travai.model.schemas import Dish, DishSuggestion, Ingredient
+from travai.model.streaming import IncrementalJSONObjects
 
 
 class ImageModel(BaseModel):
@@ -12,22 +24,6 @@ class ImageModel(BaseModel):
     represented_character: t.Literal["man", "woman", "other"]
 
 
-def get_client():
-    """Returns the OpenAI client using SCW_SECRET_KEY and SCW_DEFAULT_PROJECT_ID present in the .env file
-
-    Returns
-    -------
-    OpenAI
-        The OpenAI client
-    """
-    return OpenAI(
-        base_url="https://api.scaleway.ai/d4e5eb30-b84e-4d48-af57-57b11c4e8755/v1",
-        api_key=os.getenv(
-            "SCW_SECRET_KEY",
-        ),  # Replace SCW_SECRET_KEY with your IAM API key
-    )
-
-
 def b64_from_path(image_path: str) -> str:
     """Encodes an image file to base64 string
 
@@ -46,12 +42,127 @@ def b64_from_path(image_path: str) -> str:
     return base64_string
 
 
+def preprocess_image(
+    image_bytes: bytes,
+    max_side: int = None,
+    image_format: str = None,
+    quality: int = None,
+) -> tuple[str, str]:
+    """Prepares an uploaded photo for the VLM: EXIF orientation, downscaling and recompression
+
+    Parameters
+    ----------
+    image_bytes : bytes
+        The image as uploaded (any format Pillow can read)
+    max_side : int
+        longest side in pixels after resizing, defaults to $TRAVAI_IMAGE_MAX_SIDE or 1024
+    image_format : str
+        "JPEG" or "WEBP", defaults to $TRAVAI_IMAGE_FORMAT or "JPEG"
+    quality : int
+        encoder quality, defaults to $TRAVAI_IMAGE_QUALITY or 85
+
+    Returns
+    -------
+    tuple[str, str]
+        The b64-encoded image and its MIME type
+    """
+    from PIL import Image, ImageOps
+
+    max_side = max_side or int(os.getenv("TRAVAI_IMAGE_MAX_SIDE", 1024))
+    image_format = (image_format or os.getenv("TRAVAI_IMAGE_FORMAT", "JPEG")).upper()
+    quality = quality or int(os.getenv("TRAVAI_IMAGE_QUALITY", 85))
+
+    with span("image.preprocess", bytes_in=len(image_bytes)) as current_span, Image.open(io.BytesIO(image_bytes)) as image:
+        original_format, original_size = image.format, image.size
+        orientation = image.getexif().get(0x0112, 1)
+        # Phone photos are often stored sideways with an EXIF rotation flag
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+        if image_format == "JPEG" and image.mode != "RGB":
+            # JPEG has no alpha channel: flatten transparent areas onto white
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            rgba = image.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            image = background
+        buffer = io.BytesIO()
+        image.save(buffer, format=image_format, quality=quality)
+
+        processed = buffer.getvalue()
+        if (orientation == 1 and max(original_size) <= max_side and original_format in ("JPEG", "PNG", "WEBP")
+                and len(processed) >= len(image_bytes)):
+            # The upload already fits and is smaller: re-encoding would only add bytes and artifacts
+            image_format, processed = original_format, image_bytes
+            image_size = original_size
+        else:
+            image_size = image.size
+        if current_span is not None:
+            current_span.set(bytes_out=len(processed), width=image_size[0], height=image_size[1], format=image_format)
+    return base64.b64encode(processed).decode("utf-8"), f"image/{image_format.lower()}"
+
+
+def image_mime_type(image_bytes: bytes) -> str:
+    """Detects the MIME type of an image from its content
+
+    Parameters
+    ----------
+    image_bytes : bytes
+        The image
+
+    Returns
+    -------
+    str
+        e.g. "image/jpeg", "image/png" when Pillow cannot identify the format
+    """
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            return Image.MIME.get(image.format, "image/png")
+    except UnidentifiedImageError:
+        return "image/png"
+
+
+# Identical requests in flight at the same time (double clicks, several sessions sending
+# the same photo) share one remote call
+vlm_flight = SingleFlight("vlm")
+
+
+def _flight_key(model_name: str, prompt: str, base64_image: str, response_format: BaseModel, mime_type: str) -> tuple:
+    image_digest = hashlib.sha256(base64_image.encode("ascii")).hexdigest()
+    return image_digest, mime_type, request_fingerprint(model_name, prompt, response_format)
+
+
+def _is_endpoint_failure(error: BaseException) -> bool:
+    # Timeouts, connection errors, 429 and 5xx mean the endpoint is struggling; a bad request does not
+    return isinstance(error, (APIConnectionError, InternalServerError, RateLimitError))
+
+
+def _build_messages(prompt: str, base64_image: str, mime_type: str) -> list[dict]:
+    return [
+        {"role": "system", "content": "You are a helpful assistant"},
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{mime_type};base64,{base64_image}",
+                    },
+                },
+            ],
+        },
+    ]
+
+
 def get_structured_answer(
     client: OpenAI,
     model_name: str,
     prompt: str,
     base64_image: str,
     response_format: BaseModel,
+    cache: ResponseCache = None,
+    mime_type: str = "image/png",
 ) -> str:
     """Generates answer with client using model_name, a prompt and the base64 representation of the image
 
@@ -67,35 +178,384 @@ def get_structured_answer(
         b64-encoded image
     response_format: BaseModel
         the BaseModel-inheriting class to use for structured outputs generation.
+    cache: ResponseCache
+        optional cache consulted before, and filled after, the remote call
+    mime_type: str
+        MIME type of the b64-encoded image
 
     Returns
     -------
     str
         The BaseModel instance as str
+
+    Raises
+    ------
+    CircuitOpenError
+        Without calling the endpoint, while recent calls mostly failed (see travai.model.resilience)
     """
-    return client.beta.chat.completions.parse(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant"},
-            {
-                "role": "user",
-                "content": [
-                    {"type": "text", "text": prompt},
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/png;base64,{base64_image}",
-                        },
-                    },
-                ],
-            },
-        ],
-        max_tokens=None,
-        temperature=1.0,
-        top_p=1,
-        presence_penalty=0,
-        response_format=response_format,
-    ).choices[0].message.content
+    def call() -> str:
+        if cache is not None:
+            image_bytes = base64.b64decode(base64_image)
+            with span("vlm.cache_lookup") as cache_span:
+                cached = cache.get(image_bytes, model_name, prompt, response_format)
+                if cache_span is not None:
+                    cache_span.set(hit=cached is not None)
+            if cached is not None:
+                return cached
+
+        def parse() -> str:
+            return client.beta.chat.completions.parse(
+                model=model_name,
+                messages=_build_messages(prompt, base64_image, mime_type),
+                max_tokens=None,
+                temperature=1.0,
+                top_p=1,
+                presence_penalty=0,
+                response_format=response_format,
+            ).choices[0].message.content
+
+        def remote_call() -> str:
+            # One slot per attempt: a hedged duplicate counts against the concurrency cap too.
+            # The breaker is consulted once the slot is held, so a half-open probe never waits in the queue
+            with vlm_slot():
+                return get_vlm_breaker().call(parse, is_failure=_is_endpoint_failure)
+
+        hedger = get_vlm_hedger()
+        with span("vlm.call", model=model_name, payload_bytes=len(base64_image)) as call_span:
+            hedges_before = hedger.hedges_sent
+            answer = hedger.call(remote_call)
+            if call_span is not None:
+                call_span.set(response_chars=len(answer or ""), hedged=hedger.hedges_sent > hedges_before)
+
+        if cache is not None:
+            cache.put(image_bytes, model_name, prompt, response_format, answer)
+        return answer
+
+    return vlm_flight.do(_flight_key(model_name, prompt, base64_image, response_format, mime_type), call)
+
+
+def stream_structured_answer(
+    client: OpenAI,
+    model_name: str,
+    prompt: str,
+    base64_image: str,
+    response_format: BaseModel,
+    cache: ResponseCache = None,
+    mime_type: str = "image/png",
+):
+    """Streaming variant of get_structured_answer yielding each JSON object as soon as it is closed
+
+    Takes the same parameters as get_structured_answer. A cached answer is replayed through
+    the same parser, so callers see the same sequence either way.
+
+    Yields
+    ------
+    tuple[tuple, dict]
+        (path, object) pairs, e.g. (("possible_dishes", 0, "ingredients", 1), {...}); the last
+        pair has the path () and holds the whole answer
+    """
+    parser = IncrementalJSONObjects()
+    if cache is not None:
+        image_bytes = base64.b64decode(base64_image)
+        cached = cache.get(image_bytes, model_name, prompt, response_format)
+        if cached is not None:
+            yield from parser.feed(cached)
+            return
+
+    # A concurrent identical request is already running: wait for it and replay its answer
+    key = _flight_key(model_name, prompt, base64_image, response_format, mime_type)
+    call, leader = vlm_flight.begin(key)
+    if not leader:
+        yield from parser.feed(vlm_flight.wait(call))
+        return
+
+    breaker = get_vlm_breaker()
+    recorded = False
+    # The span is not made current: between two yields this generator runs in the consumer's
+    # context, whose own spans must not nest under it
+    stream_span = start_span("vlm.stream", model=model_name, payload_bytes=len(base64_image))
+    consumer_ns = 0
+    try:
+        with vlm_slot():
+            # Reserved once a slot is free, so a half-open probe is not held while queueing
+            breaker.allow()
+            with client.beta.chat.completions.stream(
+                model=model_name,
+                messages=_build_messages(prompt, base64_image, mime_type),
+                max_tokens=None,
+                temperature=1.0,
+                top_p=1,
+                presence_penalty=0,
+                response_format=response_format,
+            ) as stream:
+                for event in stream:
+                    if event.type == "content.delta":
+                        if not recorded:
+                            # The endpoint is answering: report it now rather than after the
+                            # consumer has read the whole stream, which would keep a probe busy
+                            breaker.record(success=True)
+                            recorded = True
+                        if stream_span is not None and "first_token_ms" not in stream_span.attributes:
+                            stream_span.set(first_token_ms=round(stream_span.duration_ms, 1))
+                        for item in parser.feed(event.delta):
+                            suspended = time.perf_counter_ns()
+                            yield item
+                            consumer_ns += time.perf_counter_ns() - suspended
+        if stream_span is not None:
+            # consumer_ms: time the caller spent between two items (UI work), part of the duration
+            stream_span.set(response_chars=len(parser.text), consumer_ms=round(consumer_ns / 1e6, 1))
+    except CircuitOpenError as e:
+        end_span(stream_span, error=e)
+        vlm_flight.finish(key, call, error=e)
+        raise
+    except BaseException as e:
+        if stream_span is not None:
+            stream_span.set(consumer_ms=round(consumer_ns / 1e6, 1))
+        end_span(stream_span, error=e)
+        if not recorded:
+            breaker.record(success=not _is_endpoint_failure(e))
+        vlm_flight.finish(key, call, error=RuntimeError(f"Shared VLM stream failed: {e!r}"))
+        raise
+    end_span(stream_span)
+    if not recorded:
+        breaker.record(success=True)
+    vlm_flight.finish(key, call, result=parser.text)
+
+    if cache is not None:
+        cache.put(image_bytes, model_name, prompt, response_format, parser.text)
+
+
+def stream_dish_suggestion(
+    client: OpenAI,
+    model_name: str,
+    prompt: str,
+    base64_image: str,
+    cache: ResponseCache = None,
+    mime_type: str = "image/png",
+):
+    """Streams a DishSuggestion, delivering every ingredient and dish as soon as it is complete
+
+    Yields
+    ------
+    tuple[str, int | None, BaseModel]
+        ("ingredient", dish_index, Ingredient), ("dish", dish_index, Dish) and finally
+        ("suggestion", None, DishSuggestion)
+    """
+    for path, obj in stream_structured_answer(
+        client=client,
+        model_name=model_name,
+        prompt=prompt,
+        base64_image=base64_image,
+        response_format=DishSuggestion,
+        cache=cache,
+        mime_type=mime_type,
+    ):
+        if len(path) == 4 and path[0] == "possible_dishes" and path[2] == "ingredients":
+            yield "ingredient", path[1], Ingredient.model_validate(obj)
+        elif len(path) == 2 and path[0] == "possible_dishes":
+            yield "dish", path[1], Dish.model_validate(obj)
+        elif path == ():
+            yield "suggestion", None, DishSuggestion.model_validate(obj)
+
+
+async def aget_structured_answer(
+    client: AsyncOpenAI,
+    model_name: str,
+    prompt: str,
+    base64_image: str,
+    response_format: BaseModel,
+    cache: ResponseCache = None,
+    mime_type: str = "image/png",
+) -> str:
+    """Async counterpart of get_structured_answer, taking an AsyncOpenAI client
+
+    Returns
+    -------
+    str
+        The BaseModel instance as str
+    """
+    if cache is not None:
+        # The cache is a SQLite file: keep its I/O off the event loop
+        image_bytes = base64.b64decode(base64_image)
+        cached = await asyncio.to_thread(cache.get, image_bytes, model_name, prompt, response_format)
+        if cached is not None:
+            return cached
+
+    breaker = get_vlm_breaker()
+    try:
+        # Shares the process-wide concurrency cap with the sync calls
+        async with avlm_slot():
+            breaker.allow()
+            completion = await client.beta.chat.completions.parse(
+                model=model_name,
+                messages=_build_messages(prompt, base64_image, mime_type),
+                max_tokens=None,
+                temperature=1.0,
+                top_p=1,
+                presence_penalty=0,
+                response_format=response_format,
+            )
+    except CircuitOpenError:
+        raise
+    except BaseException as e:
+        # A batch timeout cancels the call: a hung endpoint counts as failing
+        breaker.record(success=not (_is_endpoint_failure(e) or isinstance(e, asyncio.CancelledError)))
+        raise
+    breaker.record(success=True)
+    answer = completion.choices[0].message.content
+
+    if cache is not None:
+        await asyncio.to_thread(cache.put, image_bytes, model_name, prompt, response_format, answer)
+    return answer
+
+
+@dataclass
+class AnalysisResult:
+    """Outcome of one image of a batch
+
+    Attributes:
+        index (int): Position of the image in the input list.
+        answer (str | None): The model answer, None if the analysis failed.
+        error (Exception | None): The exception raised (including asyncio.TimeoutError), if any.
+        seconds (float): Time spent on this image, queueing excluded.
+    """
+    index: int
+    answer: str | None
+    error: Exception | None
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def iter_analyses(
+    images: list[bytes],
+    model_name: str,
+    prompt: str,
+    response_format: BaseModel,
+    client: AsyncOpenAI = None,
+    concurrency: int = 4,
+    timeout: float = None,
+    preprocess: bool = True,
+    cache: ResponseCache = None,
+):
+    """Analyzes many images with at most `concurrency` requests in flight, yielding results as they complete
+
+    A failing or timed-out image yields an AnalysisResult carrying the error instead of
+    stopping the batch.
+
+    Parameters
+    ----------
+    images : list[bytes]
+        the raw images
+    model_name : str
+        model handle
+    prompt : str
+        text prompt used for every image
+    response_format: BaseModel
+        the BaseModel-inheriting class to use for structured outputs generation.
+    client : AsyncOpenAI
+        the async client, a new one from get_async_client by default
+    concurrency : int
+        maximum number of images processed at once
+    timeout : float
+        per-image timeout in seconds, None for no timeout
+    preprocess : bool
+        whether to run preprocess_image on each image first
+    cache : ResponseCache
+        optional response cache
+
+    Yields
+    ------
+    AnalysisResult
+        One result per image, in completion order
+    """
+    owns_client = client is None
+    client = client or get_async_client()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze(index: int, image_bytes: bytes) -> AnalysisResult:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if preprocess:
+                    base64_image, mime_type = await asyncio.to_thread(preprocess_image, image_bytes)
+                else:
+                    base64_image, mime_type = base64.b64encode(image_bytes).decode("utf-8"), image_mime_type(image_bytes)
+                answer = await asyncio.wait_for(
+                    aget_structured_answer(
+                        client=client,
+                        model_name=model_name,
+                        prompt=prompt,
+                        base64_image=base64_image,
+                        response_format=response_format,
+                        cache=cache,
+                        mime_type=mime_type,
+                    ),
+                    timeout=timeout,
+                )
+                return AnalysisResult(index=index, answer=answer, error=None, seconds=time.perf_counter() - start)
+            except Exception as e:
+                return AnalysisResult(index=index, answer=None, error=e, seconds=time.perf_counter() - start)
+
+    tasks = [asyncio.create_task(analyze(i, image_bytes)) for i, image_bytes in enumerate(images)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        if owns_client:
+            await client.close()
+
+
+async def analyze_many(
+    images: list[bytes],
+    model_name: str,
+    prompt: str,
+    response_format: BaseModel,
+    client: AsyncOpenAI = None,
+    concurrency: int = 4,
+    timeout: float = None,
+    ordered: bool = True,
+    preprocess: bool = True,
+    cache: ResponseCache = None,
+) -> list[AnalysisResult]:
+    """Analyzes many images with bounded concurrency and reports per-image failures
+
+    Takes the same parameters as iter_analyses, plus `ordered`.
+
+    Parameters
+    ----------
+    ordered : bool
+        return results in input order (True) or in completion order (False)
+
+    Returns
+    -------
+    list[AnalysisResult]
+        One result per image; check `ok`/`error` for partial failures
+    """
+    results = [
+        result
+        async for result in iter_analyses(
+            images,
+            model_name=model_name,
+            prompt=prompt,
+            response_format=response_format,
+            client=client,
+            concurrency=concurrency,
+            timeout=timeout,
+            preprocess=preprocess,
+            cache=cache,
+        )
+    ]
+    failures = sum(not result.ok for result in results)
+    if failures:
+        print(f"{failures}/{len(results)} image analyses failed")
+    if ordered:
+        results.sort(key=lambda result: result.index)
+    return results
 
 
 def main() -> None:
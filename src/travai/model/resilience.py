@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the endpoint while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fails fast once the recent error rate of an endpoint gets too high
+
+    The breaker is "closed" while the endpoint behaves: calls go through and their outcome
+    is kept in a rolling window. When at least min_calls of the last window calls are known
+    and failure_rate of them failed, it "opens": calls raise CircuitOpenError immediately for
+    reset_seconds. It then goes "half_open" and lets a single probe through; the probe's
+    success closes the breaker, its failure opens it again. A probe whose outcome is not
+    recorded within probe_timeout seconds (e.g. an abandoned stream) no longer blocks the
+    next one.
+    """
+
+    def __init__(self, name: str, window: int = 20, min_calls: int = 5, failure_rate: float = 0.5,
+                 reset_seconds: float = 30.0, probe_timeout: float = 120.0):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.reset_seconds = reset_seconds
+        self.probe_timeout = probe_timeout
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.times_opened = 0
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str) -> "CircuitBreaker":
+        """Builds a breaker from TRAVAI_VLM_BREAKER_WINDOW, _MIN_CALLS, _FAILURE_RATE, _RESET_SECONDS and _PROBE_TIMEOUT"""
+        return cls(
+            name,
+            window=int(os.getenv("TRAVAI_VLM_BREAKER_WINDOW", 20)),
+            min_calls=int(os.getenv("TRAVAI_VLM_BREAKER_MIN_CALLS", 5)),
+            failure_rate=float(os.getenv("TRAVAI_VLM_BREAKER_FAILURE_RATE", 0.5)),
+            reset_seconds=float(os.getenv("TRAVAI_VLM_BREAKER_RESET_SECONDS", 30)),
+            probe_timeout=float(os.getenv("TRAVAI_VLM_BREAKER_PROBE_TIMEOUT", 120)),
+        )
+
+    def allow(self) -> None:
+        """Reserves the right to call the endpoint
+
+        Raises
+        ------
+        CircuitOpenError
+            While the breaker is open, or half open with a probe already running
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open" and self._probing and now - self._probe_started >= self.probe_timeout:
+                # The probe never reported back: let another one through
+                self._probing = False
+            if self.state == "closed" or (self.state == "half_open" and not self._probing):
+                self._probing = self.state == "half_open"
+                self._probe_started = now
+                self.calls += 1
+                return
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+        raise CircuitOpenError(f"{self.name} circuit is open, retry in {retry_in:.0f}s")
+
+    def record(self, success: bool) -> None:
+        """Records the outcome of a call let through by allow"""
+        with self._lock:
+            if not success:
+                self.failures += 1
+            if self.state == "half_open":
+                self._probing = False
+                if success:
+                    self.state = "closed"
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+            self._outcomes.append(success)
+            failed = self._outcomes.count(False)
+            if len(self._outcomes) >= self.min_calls and failed >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+
+    def call(self, fn: Callable[[], Any], is_failure: Callable[[BaseException], bool] = lambda e: True) -> Any:
+        """Runs fn through the breaker
+
+        Parameters
+        ----------
+        fn : Callable
+            zero-argument function calling the endpoint
+        is_failure : Callable
+            tells whether an exception raised by fn means the endpoint is unhealthy
+            (client errors such as a bad request should not open the circuit)
+
+        Returns
+        -------
+        Any
+            The result of fn
+        """
+        self.allow()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.record(success=not is_failure(e))
+            raise
+        self.record(success=True)
+        return result
+
+    def stats(self) -> dict:
+        """Returns the breaker state and counters"""
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "calls": self.calls,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+
+
+class Hedger:
+    """Sends a duplicate request when the first one is slower than usual; the first answer wins
+
+    The hedge delay is the given percentile of the latencies of recent successful calls, so
+    only the slowest ~5% of calls get a duplicate. Until min_samples latencies are known,
+    no request is hedged. The losing request is left to finish in the background (its answer
+    is dropped), so hedging trades some extra endpoint load for a shorter tail.
+    """
+
+    def __init__(self, name: str, enabled: bool = False, percentile: float = 95, min_samples: int = 20,
+                 min_delay: float = 0.5, window: int = 200, max_workers: int = 16):
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedges_won = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str) -> "Hedger":
+        """Builds a hedger from TRAVAI_VLM_HEDGE (1 to enable), TRAVAI_VLM_HEDGE_PERCENTILE and TRAVAI_VLM_HEDGE_MIN_DELAY"""
+        return cls(
+            name,
+            enabled=os.getenv("TRAVAI_VLM_HEDGE", "0") == "1",
+            percentile=float(os.getenv("TRAVAI_VLM_HEDGE_PERCENTILE", 95)),
+            min_delay=float(os.getenv("TRAVAI_VLM_HEDGE_MIN_DELAY", 0.5)),
+        )
+
+    def delay(self) -> float | None:
+        """Returns the current hedge delay in seconds, None while too few latencies are known"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[rank])
+
+    def _record_latency(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def _submit(self, fn: Callable[[], Any]) -> Future:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix=f"{self.name}-hedge")
+
+        def timed() -> Any:
+            start = time.perf_counter()
+            result = fn()
+            self._record_latency(time.perf_counter() - start)
+            return result
+
+        return self._executor.submit(timed)
+
+    def call(self, fn: Callable[[], Any]) -> Any:
+        """Runs fn, starting a second fn if the first has not answered after the hedge delay
+
+        Returns
+        -------
+        Any
+            The first successful result; if every attempt fails, the first error is raised
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.delay() if self.enabled else None
+        if delay is None:
+            start = time.perf_counter()
+            result = fn()
+            self._record_latency(time.perf_counter() - start)
+            return result
+
+        primary = self._submit(fn)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        with self._lock:
+            self.hedges_sent += 1
+        hedge = self._submit(fn)
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+                first_error = first_error or future.exception()
+        raise first_error
+
+    def stats(self) -> dict:
+        """Returns the hedging counters and the current delay"""
+        delay = self.delay()
+        with self._lock:
+            return {
+                "name": self.name,
+                "enabled": self.enabled,
+                "calls": self.calls,
+                "hedges_sent": self.hedges_sent,
+                "hedges_won": self.hedges_won,
+                "delay_seconds": delay,
+            }
+
+
+_breaker = None
+_hedger = None
+_instances_lock = threading.Lock()
+
+
+def get_vlm_breaker() -> CircuitBreaker:
+    """Returns the process-wide circuit breaker guarding the VLM endpoint"""
+    global _breaker
+    with _instances_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker.from_env("vlm")
+        return _breaker
+
+
+def get_vlm_hedger() -> Hedger:
+    """Returns the process-wide hedger of VLM calls (disabled unless TRAVAI_VLM_HEDGE=1)"""
+    global _hedger
+    with _instances_lock:
+        if _hedger is None:
+            _hedger = Hedger.from_env("vlm")
+        return _hedger
@@ -0,0 +1,233 @@
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from pydantic import BaseModel
+
+DEFAULT_RESPONSE_CACHE_PATH = os.getenv("TRAVAI_RESPONSE_CACHE_PATH", "./vlm_response_cache.sqlite3")
+
+
+def perceptual_hash(image_bytes: bytes) -> int:
+    """Computes a 64-bit difference hash (dHash) of an image
+
+    Re-encoded, resized or slightly recompressed versions of the same photo get hashes
+    a few bits apart.
+
+    Parameters
+    ----------
+    image_bytes : bytes
+        The encoded image
+
+    Returns
+    -------
+    int
+        The 64-bit hash
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        pixels = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | int(pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    # Stored in a signed SQLite INTEGER
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _perceptual_hash_or_none(image_bytes: bytes) -> int | None:
+    # Undecodable images still get cached, under their exact hash only
+    try:
+        return perceptual_hash(image_bytes)
+    except Exception as e:
+        print(f"Perceptual hash unavailable, using the exact image hash only: {e}")
+        return None
+
+
+def request_fingerprint(model_name: str, prompt: str, response_format: type[BaseModel]) -> str:
+    """Hashes everything but the image that determines a VLM answer
+
+    Parameters
+    ----------
+    model_name : str
+        model handle
+    prompt : str
+        text prompt used for the model
+    response_format : type[BaseModel]
+        the structured output class
+
+    Returns
+    -------
+    str
+        The hex digest
+    """
+    payload = json.dumps(
+        {"model": model_name, "prompt": prompt, "schema": response_format.model_json_schema()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Persistent cache of VLM answers keyed by (image hash, model, prompt, response schema)
+
+    Entries expire after ttl_seconds and the least recently used ones are evicted past
+    max_entries. With perceptual=True, a miss on the exact image hash falls back to the
+    closest cached image whose perceptual hash is within max_hamming_distance bits.
+    """
+
+    def __init__(self, path: str = DEFAULT_RESPONSE_CACHE_PATH, ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 10_000, perceptual: bool = False, max_hamming_distance: int = 4):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.perceptual = perceptual
+        self.max_hamming_distance = max_hamming_distance
+        self.hits = 0
+        self.perceptual_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "request_key TEXT NOT NULL, image_hash TEXT NOT NULL, phash INTEGER, response TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (request_key, image_hash))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+
+    def get(self, image_bytes: bytes, model_name: str, prompt: str, response_format: type[BaseModel]) -> str | None:
+        """Returns the cached answer for this request, or None
+
+        Parameters
+        ----------
+        image_bytes : bytes
+            The raw image sent to the model
+        model_name : str
+            model handle
+        prompt : str
+            text prompt used for the model
+        response_format : type[BaseModel]
+            the structured output class
+
+        Returns
+        -------
+        str | None
+            The cached answer
+        """
+        request_key = request_fingerprint(model_name, prompt, response_format)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT image_hash, response FROM responses WHERE request_key = ? AND image_hash = ? AND created_at >= ?",
+                (request_key, image_hash, now - self.ttl_seconds),
+            ).fetchone()
+        # Decoding the image is the slow part: other threads keep using the cache meanwhile
+        phash = _perceptual_hash_or_none(image_bytes) if row is None and self.perceptual else None
+        with self._lock:
+            if phash is not None:
+                row = self._closest(request_key, phash, now)
+                if row is not None:
+                    self.perceptual_hits += 1
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE responses SET last_used = ? WHERE request_key = ? AND image_hash = ?",
+                    (now, request_key, row[0]),
+                )
+            return row[1]
+
+    def _closest(self, request_key: str, phash: int, now: float):
+        best, best_distance = None, self.max_hamming_distance + 1
+        for image_hash, response, other in self._conn.execute(
+            "SELECT image_hash, response, phash FROM responses "
+            "WHERE request_key = ? AND phash IS NOT NULL AND created_at >= ?",
+            (request_key, now - self.ttl_seconds),
+        ):
+            distance = bin((phash ^ other) & 0xFFFFFFFFFFFFFFFF).count("1")
+            if distance < best_distance:
+                best, best_distance = (image_hash, response), distance
+        return best
+
+    def put(self, image_bytes: bytes, model_name: str, prompt: str, response_format: type[BaseModel],
+            response: str) -> None:
+        """Stores an answer, then drops expired entries and evicts the least recently used ones
+
+        Parameters
+        ----------
+        image_bytes : bytes
+            The raw image sent to the model
+        model_name : str
+            model handle
+        prompt : str
+            text prompt used for the model
+        response_format : type[BaseModel]
+            the structured output class
+        response : str
+            The model answer
+        """
+        request_key = request_fingerprint(model_name, prompt, response_format)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        phash = _perceptual_hash_or_none(image_bytes) if self.perceptual else None
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (request_key, image_hash, phash, response, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (request_key, image_hash, phash, response, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE rowid IN ("
+                "SELECT rowid FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters
+
+        Returns
+        -------
+        dict
+            hits (including perceptual_hits), perceptual_hits, misses and hit_rate
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "perceptual_hits": self.perceptual_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Returns the process-wide ResponseCache
+
+    Perceptual matching is enabled with TRAVAI_RESPONSE_CACHE_PERCEPTUAL=1 and the TTL is
+    set with TRAVAI_RESPONSE_CACHE_TTL (seconds).
+
+    Returns
+    -------
+    ResponseCache
+        The shared cache
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                ttl_seconds=float(os.getenv("TRAVAI_RESPONSE_CACHE_TTL", 7 * 24 * 3600)),
+                perceptual=os.getenv("TRAVAI_RESPONSE_CACHE_PERCEPTUAL", "0") == "1",
+            )
+        return _cache
@@ -0,0 +1,36 @@
+from pydantic import BaseModel
+
+
+class Ingredient(BaseModel):
+    """
+    Represents an ingredient used in a dish.
+
+    Attributes:
+        ingredient_name (str): The name of the ingredient.
+        quantity_grams (float): The quantity of the ingredient in grams.
+    """
+    ingredient_name: str
+    quantity_grams: float
+
+
+class Dish(BaseModel):
+    """
+    Represents a dish composed of multiple ingredients.
+
+    Attributes:
+        dish_name (Optional[str]): The name of the dish (can be None).
+        ingredients (List[Ingredient]): A list of ingredients required to prepare the dish.
+            Must contain at least one ingredient.
+    """
+    dish_name: str
+    ingredients: list[Ingredient]
+
+
+class DishSuggestion(BaseModel):
+    """
+    Represents a suggestion of possible dishes.
+
+    Attributes:
+        possible_dishes (List[Dish]): A list of suggested dishes.
+    """
+    possible_dishes: list[Dish]
@@ -0,0 +1,74 @@
+import json
+
+
+class IncrementalJSONObjects:
+    """Incremental scanner returning every JSON object of a document as soon as it is closed
+
+    Text is fed chunk by chunk as the model generates it. Each completed object is returned
+    with its path in the document, e.g. ("possible_dishes", 0, "ingredients", 2) for the third
+    ingredient of the first dish; the root object has the path ().
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._stack: list[dict] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, chunk: str) -> list[tuple[tuple, dict]]:
+        """Consumes a chunk of the document
+
+        Parameters
+        ----------
+        chunk : str
+            The next piece of generated text
+
+        Returns
+        -------
+        list[tuple[tuple, dict]]
+            The (path, object) pairs completed by this chunk, in closing order
+        """
+        self._text += chunk
+        completed = []
+        while self._pos < len(self._text):
+            pos, char = self._pos, self._text[self._pos]
+            self._pos += 1
+            top = self._stack[-1] if self._stack else None
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if top is not None and top["kind"] == "{" and top["expect_key"]:
+                        top["key"] = json.loads(self._text[self._string_start:pos + 1])
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char in "{[":
+                path = () if top is None else top["path"] + ((top["key"] if top["kind"] == "{" else top["index"]),)
+                self._stack.append({"kind": char, "start": pos, "path": path, "expect_key": char == "{",
+                                    "key": None, "index": 0})
+            elif char in "}]":
+                frame = self._stack.pop()
+                if frame["kind"] == "{":
+                    completed.append((frame["path"], json.loads(self._text[frame["start"]:pos + 1])))
+            elif char == "," and top is not None:
+                if top["kind"] == "[":
+                    top["index"] += 1
+                else:
+                    top["expect_key"] = True
+            elif char == ":" and top is not None:
+                top["expect_key"] = False
+        return completed
+
+    @property
+    def text(self) -> str:
+        """The whole text fed so far"""
+        return self._text
@@ -0,0 +1,103 @@
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls sharing a key: the first caller runs the function, the others
+    wait for it and receive the same result (or exception).
+
+    Only calls that overlap in time are merged; once a call has finished, the next caller
+    with the same key runs the function again.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: Label used in the stats
+        """
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self._in_flight: dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key: Hashable) -> tuple[_Call, bool]:
+        """
+        Registers interest in key.
+
+        :param key: Identity of the computation
+        :return: A tuple (call, leader); the leader must compute the result and pass it to
+            finish, the others pass call to wait
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                return call, False
+            call = _Call()
+            self._in_flight[key] = call
+            self.executions += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any = None, error: BaseException = None) -> None:
+        """
+        Publishes the leader's result (or error) to the waiting callers.
+        """
+        call.result = result
+        call.error = error
+        with self._lock:
+            del self._in_flight[key]
+        call.done.set()
+
+    @staticmethod
+    def wait(call: _Call) -> Any:
+        """
+        Blocks until the leader finishes, then returns its result or raises its error.
+        """
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Runs fn, unless a call with the same key is already in flight, in which case its result is shared.
+
+        :param key: Identity of the computation
+        :param fn: Zero-argument function computing the result
+        :return: The result of fn (possibly computed by another thread)
+        """
+        call, leader = self.begin(key)
+        if not leader:
+            return self.wait(call)
+        try:
+            result = fn()
+        except BaseException as e:
+            self.finish(key, call, error=e)
+            raise
+        self.finish(key, call, result=result)
+        return result
+
+    def stats(self) -> dict:
+        """
+        :return: A dict with the number of calls, actual executions and coalesced calls
+        """
+        with self._lock:
+            return {
+                "name": self.name,
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
@@ -0,0 +1,221 @@
+import contextvars
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+
+@dataclass
+class Span:
+    """
+    One timed step of a trace.
+
+    Attributes:
+        name (str): Step name, e.g. "vlm.call" or "retrieval.search".
+        trace_id (str): 32-hex-digit id shared by every span of the trace.
+        span_id (str): 16-hex-digit id of this span.
+        parent_span_id (str | None): Id of the enclosing span, if any.
+        start_ns (int): Start time, in nanoseconds since the epoch.
+        end_ns (int | None): End time, None while the span is open.
+        attributes (dict): Payload sizes, row counts and other details.
+        status (str): "ok" or "error".
+    """
+    name: str
+    trace_id: str
+    span_id: str
+    parent_span_id: str | None
+    start_ns: int
+    end_ns: int | None = None
+    attributes: dict = field(default_factory=dict)
+    status: str = "ok"
+    _trace: "Trace" = field(default=None, repr=False, compare=False)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def set(self, **attributes) -> None:
+        """
+        Adds attributes to the span.
+        """
+        self.attributes.update(attributes)
+
+    def to_otel(self) -> dict:
+        """
+        :return: The span in the OpenTelemetry JSON span layout
+        """
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "attributes": [{"key": key, "value": {"stringValue": str(value)}} for key, value in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "error" else "STATUS_CODE_OK"},
+        }
+
+
+class Trace:
+    """
+    The spans recorded for one analysis.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = secrets.token_hex(16)
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> list[dict]:
+        """
+        :return: One row per span (name, duration_ms and attributes), in start order
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start_ns)
+        return [
+            {"span": span.name, "duration_ms": round(span.duration_ms, 2), "status": span.status, **span.attributes}
+            for span in spans
+        ]
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar("travai_trace", default=None)
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar("travai_span", default=None)
+_export_lock = threading.Lock()
+
+
+def _export(spans: list[Span]) -> None:
+    path = os.getenv("TRAVAI_TRACE_FILE")
+    if not path:
+        return
+    with _export_lock, open(path, "a", encoding="utf-8") as f:
+        for span in spans:
+            f.write(json.dumps(span.to_otel()) + "\n")
+
+
+@contextmanager
+def trace(name: str):
+    """
+    Starts a trace: every span opened inside (in this thread or asyncio task) is attached to it.
+
+    When $TRAVAI_TRACE_FILE is set, the spans are appended to it as OpenTelemetry-style JSON
+    lines once the trace ends.
+
+    :param name: Name of the root span
+    :return: A context manager yielding the Trace
+    """
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        with span(name):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        _export(current.spans)
+
+
+def start_span(name: str, **attributes) -> Span | None:
+    """
+    Opens a span of the current trace without making it the parent of the spans opened meanwhile.
+
+    Meant for generators, which run in their consumer's context between two yields: close it
+    with end_span, from any context.
+
+    :param name: Step name
+    :param attributes: Initial attributes (payload bytes, row counts, ...)
+    :return: The Span, or None outside a trace
+    """
+    current = _current_trace.get()
+    if current is None:
+        return None
+    parent = _current_span.get()
+    return Span(
+        name=name,
+        trace_id=current.trace_id,
+        span_id=secrets.token_hex(8),
+        parent_span_id=parent.span_id if parent is not None else None,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+        _trace=current,
+    )
+
+
+def end_span(span: Span | None, error: BaseException = None) -> None:
+    """
+    Closes a span opened by start_span and records it in its trace.
+
+    :param span: The span (None outside a trace)
+    :param error: (Optional) The exception that ended the step
+    """
+    if span is None or span.end_ns is not None:
+        return
+    if error is not None:
+        span.status = "error"
+        span.set(error=repr(error))
+    span.end_ns = time.time_ns()
+    span._trace.add(span)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times a step of the current trace. Outside a trace this only costs a context variable lookup.
+
+    :param name: Step name
+    :param attributes: Initial attributes (payload bytes, row counts, ...)
+    :return: A context manager yielding the Span (or None outside a trace), for adding attributes
+    """
+    new_span = start_span(name, **attributes)
+    if new_span is None:
+        yield None
+        return
+    token = _current_span.set(new_span)
+    error = None
+    try:
+        yield new_span
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        end_span(new_span, error=error)
+
+
+def set_attributes(**attributes) -> None:
+    """
+    Adds attributes to the innermost open span, if any.
+    """
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attributes)
+
+
+def traced(name: str):
+    """
+    Decorator wrapping every call of a function (or coroutine function) in a span.
+
+    :param name: Span name
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,203 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from travai.backend import nutrient_store
+from travai.backend.async_database import AsyncSessionLocal, create_app_async_engine
+from travai.backend.async_services import (
+    detected_ingredient_service, doctor_service, goal_service, ingredient_service, meal_service,
+    modified_ingredient_service, patient_service,
+)
+from travai.backend.database import Base, SessionLocal, create_app_engine
+from travai.backend.models import DailyIntake
+from travai.backend.services.daily_intake_service import MACRO_COLUMNS, rebuild_daily_intake
+
+DAY = datetime(2025, 3, 10, 12, 30)
+
+
+@pytest.fixture(scope="session")
+def store(tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp("nutrient_store"))
+    nutrient_store.build_nutrient_store(store_dir=store_dir)
+    return nutrient_store.NutrientStore(store_dir)
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch, store):
+    """Points the sync and async sessions at a new SQLite database, and the services at the test store"""
+    path = tmp_path / "travai.db"
+    engine = create_app_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    async_engine = create_app_async_engine(f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setitem(SessionLocal.kw, "bind", engine)
+    monkeypatch.setitem(AsyncSessionLocal.kw, "bind", async_engine)
+    monkeypatch.setitem(nutrient_store._stores, nutrient_store.DEFAULT_NUTRIENT_STORE_DIR, store)
+    yield
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def new_patient(email: str = "ada@example.com"):
+    return asyncio.run(patient_service.create_patient("Ada", "Lovelace", email, "secret"))
+
+
+def daily_intake_rows(patient_id: int) -> list[dict]:
+    session = SessionLocal()
+    try:
+        days = session.query(DailyIntake).filter(DailyIntake.patient_id == patient_id).order_by(DailyIntake.date).all()
+        return [{"date": day.date, "meals": day.meals, "kcal": day.kcal, **{c: getattr(day, c) for c in MACRO_COLUMNS}} for day in days]
+    finally:
+        session.close()
+
+
+def test_doctor_and_patient_crud():
+    async def scenario():
+        doctor = await doctor_service.create_doctor("Grace", "Hopper", "grace@example.com", "pw")
+        assert await doctor_service.create_doctor("Grace", "Hopper", "grace@example.com", "pw") is None
+        patient = await patient_service.create_patient("Ada", "Lovelace", "ada@example.com", "secret", doctor.doctor_id)
+        assert (await patient_service.get_patient_by_email("ada@example.com")).patient_id == patient.patient_id
+
+        assert (await patient_service.update_patient("ada@example.com", first_name="Augusta")).first_name == "Augusta"
+        assert (await doctor_service.update_doctor("grace@example.com", last_name="Murray")).last_name == "Murray"
+        assert await patient_service.update_patient("ada@example.com", doctor_id=999) is None
+
+        user, role = await patient_service.authenticate_user("grace@example.com", "pw")
+        assert (role, user.doctor_id) == ("doctor", doctor.doctor_id)
+        user, role = await patient_service.authenticate_user("ada@example.com", "secret")
+        assert (role, user.patient_id) == ("patient", patient.patient_id)
+        assert await patient_service.authenticate_user("ada@example.com", "wrong") is None
+
+        assert await patient_service.delete_patient("ada@example.com")
+        assert await patient_service.get_patient_by_email("ada@example.com") is None
+        assert await doctor_service.delete_doctor("grace@example.com")
+        assert await doctor_service.get_doctor_by_email("grace@example.com") is None
+
+    asyncio.run(scenario())
+
+
+def test_goal_and_ingredient_crud():
+    patient = new_patient()
+
+    async def scenario():
+        goal = await goal_service.create_goal(patient.patient_id, DAY, DAY + timedelta(days=30), 2000)
+        assert (await goal_service.update_goal(goal.goal_id, calories_in_grams_per_day=1800)).calories_in_grams_per_day == 1800
+        assert [g.goal_id for g in await goal_service.get_goals_by_patient(patient.patient_id)] == [goal.goal_id]
+        assert await goal_service.delete_goal(goal.goal_id)
+        assert await goal_service.get_goal_by_id(goal.goal_id) is None
+
+        ingredient = await ingredient_service.create_ingredient("Carrot, raw", 36)
+        assert (await ingredient_service.get_ingredient_by_name("Carrot, raw")).ingredient_id == ingredient.ingredient_id
+        assert (await ingredient_service.update_ingredient(ingredient.ingredient_id, calories_per_100g=40)).calories_per_100g == 40
+        assert len(await ingredient_service.get_all_ingredients()) == 1
+        assert await ingredient_service.delete_ingredient(ingredient.ingredient_id)
+        assert await ingredient_service.get_ingredient_by_id(ingredient.ingredient_id) is None
+
+    asyncio.run(scenario())
+
+
+def test_meal_and_ingredient_crud_keep_totals(store):
+    patient = new_patient()
+
+    async def scenario():
+        meal = await meal_service.create_meal(patient.patient_id, DAY, "meal.jpg", "Salad")
+        detected = await detected_ingredient_service.create_detected_ingredient(
+            meal.meal_id, store.names[2], 150, 60, alim_code=int(store.alim_codes[2]),
+        )
+        modified = await modified_ingredient_service.create_modified_ingredient(
+            detected.detected_ingredient_id, meal.meal_id, store.names[2], 150, 60,
+        )
+        assert modified.alim_code == detected.alim_code
+
+        updated = await modified_ingredient_service.update_modified_ingredient(modified.modified_ingredient_id, quantity_grams=200, calculated_calories=80)
+        assert (updated.quantity_grams, updated.calculated_calories) == (200, 80)
+        assert [m.modified_ingredient_id for m in await modified_ingredient_service.get_modified_ingredients_by_meal_id(meal.meal_id)] == [modified.modified_ingredient_id]
+        assert (await detected_ingredient_service.update_detected_ingredient(detected.detected_ingredient_id, quantity_grams=120)).quantity_grams == 120
+
+        meal = await meal_service.get_meal_by_id(meal.meal_id)
+        assert (meal.total_detected_kcal, meal.total_modified_kcal) == (60, 80)
+
+        # Deleting the detected ingredient takes its modified copy along
+        assert await detected_ingredient_service.delete_detected_ingredient(detected.detected_ingredient_id)
+        assert await modified_ingredient_service.get_modified_ingredient_by_id(modified.modified_ingredient_id) is None
+        meal = await meal_service.get_meal_by_id(meal.meal_id)
+        assert (meal.total_detected_kcal, meal.total_modified_kcal) == (0, 0)
+
+        assert (await meal_service.update_meal(meal.meal_id, name="Green salad")).name == "Green salad"
+        assert await meal_service.delete_meal(meal.meal_id)
+        assert await meal_service.get_meal_by_id(meal.meal_id) is None
+
+    asyncio.run(scenario())
+    assert daily_intake_rows(patient.patient_id) == []
+
+
+def test_persist_meal_analysis(store):
+    patient = new_patient()
+    ingredients = [
+        {"ingredient_name": store.names[i], "alim_code": int(store.alim_codes[i]), "quantity_grams": 100 + i, "calculated_calories": 10 * i}
+        for i in range(3)
+    ]
+
+    async def scenario():
+        ids = await meal_service.persist_meal_analysis(patient.patient_id, "Salad", ingredients, "meal.jpg", date_start=DAY)
+        assert await meal_service.persist_meal_analysis(999, "Salad", ingredients, "meal.jpg") is None
+        detected = await detected_ingredient_service.get_detected_ingredients_by_meal(ids["meal_id"])
+        modified = await modified_ingredient_service.get_modified_ingredients_by_meal_id(ids["meal_id"])
+        meal = await meal_service.get_meal_by_id(ids["meal_id"])
+        return ids, detected, modified, meal
+
+    ids, detected, modified, meal = asyncio.run(scenario())
+    assert [row.detected_ingredient_id for row in detected] == ids["detected_ingredient_ids"]
+    assert [row.modified_ingredient_id for row in modified] == ids["modified_ingredient_ids"]
+    assert [row.alim_code for row in modified] == [ingredient["alim_code"] for ingredient in ingredients]
+    assert [row.detected_ingredient_id for row in modified] == ids["detected_ingredient_ids"]
+    assert (meal.total_detected_kcal, meal.total_modified_kcal) == (30, 30)
+    assert daily_intake_rows(patient.patient_id)[0]["meals"] == 1
+
+
+def test_list_meals_pages():
+    patient = new_patient()
+
+    async def scenario():
+        # Two meals share a date_start, the meal_id breaks the tie
+        for i, date_start in enumerate([DAY, DAY, DAY + timedelta(hours=1), DAY + timedelta(days=1), DAY + timedelta(days=2)]):
+            await meal_service.create_meal(patient.patient_id, date_start, "meal.jpg", f"Meal {i}")
+
+        pages, cursor = [], None
+        while True:
+            rows, cursor = await meal_service.list_meals(patient.patient_id, after_cursor=cursor, limit=2)
+            pages.append([row.name for row in rows])
+            if cursor is None:
+                return pages
+
+    assert asyncio.run(scenario()) == [["Meal 4", "Meal 3"], ["Meal 2", "Meal 1"], ["Meal 0"]]
+
+
+def test_daily_intake_matches_rebuild(store):
+    patient = new_patient()
+    ingredients = [
+        {"ingredient_name": store.names[i], "alim_code": int(store.alim_codes[i]), "quantity_grams": 50 * (i + 1), "calculated_calories": 20 * (i + 1)}
+        for i in range(4)
+    ]
+
+    async def scenario():
+        first = await meal_service.persist_meal_analysis(patient.patient_id, "Lunch", ingredients, "a.jpg", date_start=DAY)
+        second = await meal_service.persist_meal_analysis(patient.patient_id, "Dinner", ingredients[:2], "b.jpg", date_start=DAY)
+        third = await meal_service.persist_meal_analysis(patient.patient_id, "Breakfast", ingredients[1:], "c.jpg", date_start=DAY + timedelta(days=1))
+
+        # Renamed and resized ingredients keep the macros of their Ciqual code
+        await modified_ingredient_service.update_modified_ingredient(first["modified_ingredient_ids"][0], ingredient_name="My avocado", quantity_grams=80)
+        await detected_ingredient_service.delete_detected_ingredient(first["detected_ingredient_ids"][1])
+        await modified_ingredient_service.delete_modified_ingredient(third["modified_ingredient_ids"][0])
+        await meal_service.update_meal(second["meal_id"], date_start=DAY + timedelta(days=2))
+        await meal_service.delete_meal(third["meal_id"])
+
+    asyncio.run(scenario())
+    maintained = daily_intake_rows(patient.patient_id)
+    assert [day["meals"] for day in maintained] == [1, 1]
+    assert all(day["proteins_g"] > 0 for day in maintained)
+
+    assert rebuild_daily_intake(patient.patient_id) == 2
+    rebuilt = daily_intake_rows(patient.patient_id)
+    for day, expected in zip(maintained, rebuilt):
+        assert day == pytest.approx(expected, rel=1e-5, abs=1e-6)
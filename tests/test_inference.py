@@ -0,0 +1,179 @@
+import asyncio
+import base64
+import io
+import threading
+from pathlib import Path
+
+import pytest
+from openai import AsyncOpenAI, OpenAI
+from PIL import Image
+
+from travai.bench.fake_vlm_server import FakeVLMConfig, start_fake_server
+from travai.model import client as vlm_client
+from travai.model import resilience
+from travai.model.inference import analyze_many, get_structured_answer, image_mime_type, preprocess_image
+from travai.model.response_cache import ResponseCache
+from travai.model.schemas import DishSuggestion
+
+CARBONARA = Path(__file__).resolve().parents[1] / "src" / "travai" / "app" / "carbonara.jpg"
+PROMPT = "Describe the list of ingredients required to make this dish"
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    # Failures recorded by one test must not open the process-wide breaker for the next
+    monkeypatch.setattr(resilience, "_breaker", None)
+
+
+@pytest.fixture
+def slot_peaks(monkeypatch):
+    """Records the number of VLM calls in flight each time a slot is taken"""
+    peaks = []
+    original_acquired = vlm_client._record_acquired
+
+    def record_acquired(waited):
+        original_acquired(waited)
+        peaks.append(vlm_client.get_vlm_stats()["in_flight"])
+
+    monkeypatch.setattr(vlm_client, "_record_acquired", record_acquired)
+    return peaks
+
+
+@pytest.fixture
+def fake_vlm():
+    config = FakeVLMConfig(latency_median=0.05, latency_sigma=0, seed=0)
+    server, base_url = start_fake_server(config=config)
+    yield config, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def png_bytes(color: str) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def run_batch(base_url: str, images: list[bytes], **kwargs):
+    async def batch():
+        client = AsyncOpenAI(base_url=base_url, api_key="test", max_retries=0)
+        try:
+            return await analyze_many(images, model_name="fake-vlm", prompt=PROMPT, response_format=DishSuggestion,
+                                      client=client, **kwargs)
+        finally:
+            await client.close()
+
+    return asyncio.run(batch())
+
+
+def test_image_mime_type():
+    assert image_mime_type(CARBONARA.read_bytes()) == "image/jpeg"
+    assert image_mime_type(png_bytes("red")) == "image/png"
+    assert image_mime_type(b"not an image") == "image/png"
+
+
+def palette_png(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("P", size, 3).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("image_bytes", [
+    palette_png((6000, 4000)),  # Tiny file, huge picture: must still be downscaled
+    palette_png((640, 480)),  # Fits and is smaller than any re-encoding: kept as uploaded
+    CARBONARA.read_bytes(),
+], ids=["huge palette png", "small palette png", "carbonara jpeg"])
+def test_preprocess_image_never_exceeds_max_side(image_bytes):
+    base64_image, mime_type = preprocess_image(image_bytes, max_side=1024)
+    processed = base64.b64decode(base64_image)
+    with Image.open(io.BytesIO(processed)) as image:
+        assert max(image.size) <= 1024
+        assert mime_type == Image.MIME[image.format]
+
+
+def test_preprocess_image_keeps_a_small_upload():
+    image_bytes = palette_png((640, 480))
+    assert base64.b64decode(preprocess_image(image_bytes, max_side=1024)[0]) == image_bytes
+
+
+def test_analyze_many_returns_one_answer_per_image(fake_vlm):
+    config, base_url = fake_vlm
+    images = [CARBONARA.read_bytes(), png_bytes("red"), png_bytes("blue")]
+
+    results = run_batch(base_url, images, preprocess=False, concurrency=2)
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert all(result.ok for result in results)
+    for result in results:
+        assert DishSuggestion.model_validate_json(result.answer).possible_dishes
+    assert config.requests == 3
+
+
+def test_analyze_many_reports_failures_without_stopping(fake_vlm):
+    config, base_url = fake_vlm
+    config.error_rate = 1.0
+
+    results = run_batch(base_url, [png_bytes("red"), png_bytes("blue")], preprocess=False)
+
+    assert [result.ok for result in results] == [False, False]
+
+
+def test_analyze_many_reads_the_cache(fake_vlm, tmp_path):
+    config, base_url = fake_vlm
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"))
+    images = [png_bytes("red")]
+
+    first = run_batch(base_url, images, preprocess=False, cache=cache)
+    second = run_batch(base_url, images, preprocess=False, cache=cache)
+
+    assert second[0].answer == first[0].answer
+    assert config.requests == 1
+
+
+def test_analyze_many_respects_the_process_wide_cap(fake_vlm, monkeypatch, slot_peaks):
+    config, base_url = fake_vlm
+    monkeypatch.setattr(vlm_client, "_slots", threading.BoundedSemaphore(1))
+
+    results = run_batch(base_url, [png_bytes(color) for color in ("red", "green", "blue")], preprocess=False, concurrency=3)
+
+    assert all(result.ok for result in results)
+    assert slot_peaks and max(slot_peaks) == 1
+
+
+def test_hedged_duplicate_takes_its_own_slot(fake_vlm, monkeypatch, slot_peaks):
+    config, base_url = fake_vlm
+    config.latency_median = 0.3
+    monkeypatch.setattr(vlm_client, "_slots", threading.BoundedSemaphore(2))
+    hedger = resilience.Hedger("test", enabled=True, min_samples=1, min_delay=0.05)
+    hedger._record_latency(0.05)
+    monkeypatch.setattr(resilience, "_hedger", hedger)
+
+    answer = get_structured_answer(
+        client=OpenAI(base_url=base_url, api_key="test", max_retries=0), model_name="fake-vlm", prompt=PROMPT,
+        base64_image=base64.b64encode(png_bytes("red")).decode("ascii"), response_format=DishSuggestion,
+    )
+
+    assert DishSuggestion.model_validate_json(answer).possible_dishes
+    assert hedger.hedges_sent == 1
+    assert max(slot_peaks) == 2
+
+
+def test_breaker_is_consulted_once_the_slot_is_held(fake_vlm, monkeypatch):
+    config, base_url = fake_vlm
+    breaker = resilience.CircuitBreaker("test")
+    in_flight_at_allow = []
+    original_allow = breaker.allow
+
+    def allow():
+        in_flight_at_allow.append(vlm_client.get_vlm_stats()["in_flight"])
+        original_allow()
+
+    monkeypatch.setattr(breaker, "allow", allow)
+    monkeypatch.setattr(resilience, "_breaker", breaker)
+
+    get_structured_answer(
+        client=OpenAI(base_url=base_url, api_key="test", max_retries=0), model_name="fake-vlm", prompt=PROMPT,
+        base64_image=base64.b64encode(png_bytes("red")).decode("ascii"), response_format=DishSuggestion,
+    )
+
+    assert in_flight_at_allow == [1]
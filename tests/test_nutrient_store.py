@@ -0,0 +1,25 @@
+import shutil
+
+from travai.backend import nutrient_store
+from travai.backend.vector_db.ciqual import CIQUAL_CSV_PATH
+
+
+def test_store_is_rebuilt_when_the_csv_changes(tmp_path):
+    csv_path = str(tmp_path / "ciqual.csv")
+    store_dir = str(tmp_path / "store")
+    shutil.copy(CIQUAL_CSV_PATH, csv_path)
+    assert nutrient_store.is_stale(store_dir, csv_path)
+
+    n_foods = nutrient_store.build_nutrient_store(csv_path, store_dir)
+    assert not nutrient_store.is_stale(store_dir, csv_path)
+
+    # Drop the last food of the table
+    with open(csv_path, encoding="utf-8") as f:
+        lines = f.readlines()
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.writelines(lines[:-1])
+    assert nutrient_store.is_stale(store_dir, csv_path)
+
+    nutrient_store.build_nutrient_store(csv_path, store_dir)
+    assert not nutrient_store.is_stale(store_dir, csv_path)
+    assert len(nutrient_store.NutrientStore(store_dir).names) == n_foods - 1
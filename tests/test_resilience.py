@@ -0,0 +1,40 @@
+import time
+
+import pytest
+
+from travai.model.resilience import CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(**kwargs) -> CircuitBreaker:
+    breaker = CircuitBreaker("test", window=4, min_calls=2, failure_rate=0.5, **kwargs)
+    for _ in range(2):
+        breaker.allow()
+        breaker.record(success=False)
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_breaker_rejects_while_open_and_closes_after_a_successful_probe():
+    breaker = open_breaker(reset_seconds=0.05)
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()  # a single probe at a time
+    breaker.record(success=True)
+
+    assert breaker.state == "closed"
+
+
+def test_abandoned_probe_is_released_after_the_probe_timeout():
+    breaker = open_breaker(reset_seconds=0, probe_timeout=0.05)
+    breaker.allow()  # the probe never records its outcome
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()
+
+    assert breaker.state == "half_open"
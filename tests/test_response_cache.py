@@ -0,0 +1,35 @@
+import io
+
+from PIL import Image
+
+from travai.model.response_cache import ResponseCache
+from travai.model.schemas import DishSuggestion
+
+PROMPT = "Describe the list of ingredients required to make this dish"
+
+
+def jpeg_bytes(quality: int) -> bytes:
+    image = Image.new("RGB", (64, 64))
+    image.paste((200, 40, 40), (0, 0, 32, 64))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def test_perceptual_hit_on_recompressed_image(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), perceptual=True)
+    cache.put(jpeg_bytes(95), "model", PROMPT, DishSuggestion, "answer")
+
+    assert cache.get(jpeg_bytes(60), "model", PROMPT, DishSuggestion) == "answer"
+    assert cache.stats()["perceptual_hits"] == 1
+
+
+def test_undecodable_image_falls_back_to_exact_key(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "responses.sqlite"), perceptual=True)
+    garbage = b"not an image"
+
+    assert cache.get(garbage, "model", PROMPT, DishSuggestion) is None
+    cache.put(garbage, "model", PROMPT, DishSuggestion, "answer")
+    assert cache.get(garbage, "model", PROMPT, DishSuggestion) == "answer"
+    assert cache.get(b"another one", "model", PROMPT, DishSuggestion) is None
+    assert cache.stats() == {"hits": 1, "perceptual_hits": 0, "misses": 2, "hit_rate": 1 / 3}